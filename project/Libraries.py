@@ -1,42 +1,88 @@
 # --- Standard library ---
 import os
 import warnings
+import importlib
 
 # --- Third-party libraries: Data analysis ---
-import ta
 import numpy as np
 import pandas as pd
-import scipy as sp
-
-# --- Third-party libraries: Visualization ---
-import seaborn as sns
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
-from IPython.display import display
-
-# --- Third-party libraries: Machine Learning / Optimization ---
-import optuna
-from sklearn.model_selection import TimeSeriesSplit
 
 # --- Type hints ---
 from typing import List
 
+
+class _LazyModule:
+    """
+    Stand-in for a module (or one of its attributes) that is imported on first use.
+
+    `from libraries import *` copies the stand-in into every module, so the heavy
+    stacks (plotting, optimization, scipy, ta) are only imported by the processes
+    that actually touch them; the compute path (backtest, indicators, metrics) then
+    needs only NumPy and pandas. `setup` runs once on the imported object.
+    """
+
+    def __init__(self, module: str, attr: str = None, setup=None):
+        self._spec = (module, attr, setup)
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            module, attr, setup = self._spec
+            target = importlib.import_module(module)
+            if attr is not None:
+                target = getattr(target, attr)
+            if setup is not None:
+                setup(target)
+            self._target = target
+        return self._target
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        module, attr, _ = self._spec
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<lazy {module}{'.' + attr if attr else ''} ({state})>"
+
+
+def _setup_pyplot(plt) -> None:
+    plt.rcParams['figure.facecolor'] = 'lightgrey'
+    plt.rcParams['figure.figsize'] = (12, 6)
+    plt.rcParams['axes.grid'] = True
+    plt.rcParams['grid.alpha'] = 0.5
+    plt.rcParams['grid.linestyle'] = '--'
+    plt.rcParams['axes.titleweight'] = 'bold'
+    plt.rcParams['axes.titlesize'] = 16
+    plt.rcParams['axes.labelsize'] = 12
+    plt.rcParams['legend.frameon'] = True
+    plt.rcParams['legend.facecolor'] = 'white'
+    plt.rcParams['legend.edgecolor'] = 'black'
+
+
+def _setup_optuna(optuna) -> None:
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+
+
+# --- Third-party libraries: Data analysis (lazy) ---
+ta = _LazyModule("ta")
+sp = _LazyModule("scipy")
+
+# --- Third-party libraries: Visualization (lazy) ---
+sns = _LazyModule("seaborn")
+plt = _LazyModule("matplotlib.pyplot", setup=_setup_pyplot)
+mtick = _LazyModule("matplotlib.ticker")
+display = _LazyModule("IPython.display", "display")
+
+# --- Third-party libraries: Machine Learning / Optimization (lazy) ---
+optuna = _LazyModule("optuna", setup=_setup_optuna)
+TimeSeriesSplit = _LazyModule("sklearn.model_selection", "TimeSeriesSplit")
+
 warnings.filterwarnings("ignore", category=RuntimeWarning)
-optuna.logging.set_verbosity(optuna.logging.ERROR)
 
 np.random.seed(42)
 
-plt.rcParams['figure.facecolor'] = 'lightgrey'
-plt.rcParams['figure.figsize'] = (12, 6)
-plt.rcParams['axes.grid'] = True
-plt.rcParams['grid.alpha'] = 0.5
-plt.rcParams['grid.linestyle'] = '--'
-plt.rcParams['axes.titleweight'] = 'bold'
-plt.rcParams['axes.titlesize'] = 16
-plt.rcParams['axes.labelsize'] = 12
-plt.rcParams['legend.frameon'] = True
-plt.rcParams['legend.facecolor'] = 'white'
-plt.rcParams['legend.edgecolor'] = 'black'
-
 
 colors = ["cornflowerblue", "indianred", "darkseagreen", "plum", "dimgray"]
@@ -1,12 +1,20 @@
 from libraries import *
-from backtesting import backtest
-from functions import OptunaOpt, BacktestingCapCOM
+from backtesting import backtest, backtest_batch
+from hyperparams import hyperparams
+from cache import indicator_cache
+from precompute import precompute_indicators
+from parallel import optimize_processes
+from objective import make_objective, report_step
+from profiling import profile_table
+from functions import OptunaOpt, BacktestingCapCOM, open_study, remaining_trials, top_params
 from sklearn.model_selection import TimeSeriesSplit
 
 
 def optimize(trial, train: pd.DataFrame) -> float:
     """
     Performs a simple K-fold like optimization on chunks of the training data.
+    The running mean is reported to Optuna after each chunk so the study's
+    pruner can stop the trial early.
 
     Parameters
     ----------
@@ -20,7 +28,7 @@ def optimize(trial, train: pd.DataFrame) -> float:
     float
         Average Calmar ratio across data splits.
     """
-    data = train.copy()
+    data = train
     n_splits = OptunaOpt.n_splits
     len_data = len(data)
     calmars = []
@@ -29,10 +37,11 @@ def optimize(trial, train: pd.DataFrame) -> float:
         size = len_data // n_splits
         start_idx = i * size
         end_idx = (i + 1) * size
-        chunk = data.iloc[start_idx:end_idx].reset_index(drop=True)
+        chunk = data.iloc[start_idx:end_idx]
 
-        port_value, metrics_dict, _ = backtest(chunk, trial)
+        port_value, metrics_dict, _ = backtest(chunk, trial, keep_curve=False)
         calmars.append(metrics_dict.get('Calmar', 0.0))
+        report_step(trial, sum(calmars) / len(calmars), i)
 
     return sum(calmars) / n_splits
 
@@ -40,6 +49,8 @@ def optimize(trial, train: pd.DataFrame) -> float:
 def CV(trial, data: pd.DataFrame, n_splits: int, metric: str) -> float:
     """
     Cross-validation for a time series dataset using backtest metrics.
+    The running mean is reported to Optuna after each fold so the study's
+    pruner can stop the trial early.
 
     Parameters
     ----------
@@ -60,10 +71,11 @@ def CV(trial, data: pd.DataFrame, n_splits: int, metric: str) -> float:
     splits = TimeSeriesSplit(n_splits=n_splits)
     scores = []
 
-    for _, test_idx in splits.split(data):
-        test_data = data.iloc[test_idx].copy().reset_index(drop=True)
-        _, metrics_dict, _ = backtest(test_data, trial)
+    for i, (_, test_idx) in enumerate(splits.split(data)):
+        test_data = data.iloc[test_idx]
+        _, metrics_dict, _ = backtest(test_data, trial, keep_curve=False)
         scores.append(metrics_dict.get(metric, 0.0))
+        report_step(trial, np.mean(scores), i)
 
     return np.mean(scores)
 
@@ -71,7 +83,8 @@ def CV(trial, data: pd.DataFrame, n_splits: int, metric: str) -> float:
 def optimize_hyperparams(data: pd.DataFrame,
                          backtest_config: BacktestingCapCOM,
                          optuna_config: OptunaOpt,
-                         metric: str) -> optuna.study.Study:
+                         metric: str,
+                         warm_start: list[dict] = None) -> optuna.study.Study:
     """
     Performs hyperparameter optimization using Optuna.
 
@@ -80,26 +93,101 @@ def optimize_hyperparams(data: pd.DataFrame,
     data : pd.DataFrame
         Training dataset.
     backtest_config : BacktestingCapCOM
-        Backtesting configuration.
+        Backtesting configuration (its `periods_per_year` annualizes the metrics, in
+        this process and in the process workers alike).
     optuna_config : OptunaOpt
         Optuna configuration (number of trials, direction, etc.).
     metric : str
         Metric to optimize (e.g., 'Calmar').
+    warm_start : list of dict, optional
+        Parameter sets enqueued as the first trials of a new study (e.g., `top_params`
+        of a previous study).
 
     Returns
     -------
     optuna.study.Study
         Optuna study object with optimization results.
+
+    Raises
+    ------
+    ValueError
+        If `optuna_config.batch_size > 1` is combined with the process executor.
+
+    Notes
+    -----
+    With `optuna_config.storage` the study is persisted (SQLite URL or journal file)
+    under `optuna_config.study_name`; rerunning resumes it until `n_trials` trials
+    have finished, and a new study is seeded from `optuna_config.seed_study`
+    (see `functions.open_study`).
+    With `optuna_config.executor == 'process'` the search runs on worker processes
+    (see `parallel.optimize_processes`; worker k samples with seed `seed + k`).
+    With `optuna_config.batch_size > 1` trials are asked in populations of that
+    size and evaluated together with `backtest_batch` (`n_jobs` and the pruner
+    are not used). Otherwise intermediate values are reported during each
+    backtest and `optuna_config.pruner` abandons clearly bad trials.
+    With `optuna_config.precompute` the indicator grid of `data` is loaded (or built)
+    first, so every trial reads its indicator series from the memmap.
+    The indicator cache statistics of this study (lookups made during the call) are
+    stored in the study user attr 'indicator_cache'.
+    With `optuna_config.profile` the per-stage profile of every trial is aggregated
+    into the study user attr 'profile' (see `profiling.profile_table`; not
+    recorded for `batch_size > 1`).
+    For the full metric surface over a parameter lattice instead of sampled trials,
+    see `grid.evaluate_grid`.
+    With `optuna_config.trade_ledger` the trades of all trials are written to
+    Parquet in one write at the end (path in the study user attr 'trade_ledger';
+    not recorded for `batch_size > 1`); the process executor writes one part file
+    per worker into it, so it must be a directory there.
+    """
+    if optuna_config.executor == "process" and optuna_config.batch_size > 1:
+        raise ValueError("batch_size > 1 evaluates trials in-process with backtest_batch; "
+                         "use executor='thread' or batch_size=1")
+
+    cache_start = indicator_cache.info()
+    if optuna_config.executor == "process":
+        study = optimize_processes(data, optuna_config, metric, warm_start=warm_start,
+                                   periods_per_year=backtest_config.periods_per_year)
+        if optuna_config.trade_ledger is not None:
+            study.set_user_attr("trade_ledger", optuna_config.trade_ledger)
+        return _attach_profile(study, optuna_config)
+
+    if optuna_config.precompute:
+        precompute_indicators(data, optuna_config.precompute_dir)
+
+    study = open_study(optuna_config, warm_start=warm_start)
+    n_trials = remaining_trials(study, optuna_config.n_trials)
+
+    if optuna_config.batch_size > 1:
+        remaining = n_trials
+        while remaining > 0:
+            trials = [study.ask()
+                      for _ in range(min(optuna_config.batch_size, remaining))]
+            results = backtest_batch(data, [hyperparams(t) for t in trials],
+                                     periods_per_year=backtest_config.periods_per_year)
+            for trial, (_, metrics_dict, _) in zip(trials, results):
+                study.tell(trial, metrics_dict.get(metric, 0.0))
+            remaining -= len(trials)
+    else:
+        objective = make_objective(data, metric, optuna_config,
+                                   backtest_config.periods_per_year)
+        study.optimize(
+            objective,
+            n_trials=n_trials,
+            n_jobs=optuna_config.n_jobs,
+            show_progress_bar=optuna_config.show_progress_bar
+        )
+        if objective.ledger is not None:
+            study.set_user_attr("trade_ledger", objective.ledger.write_parquet(
+                optuna_config.trade_ledger))
+
+    study.set_user_attr("indicator_cache", indicator_cache.info(since=cache_start))
+    return _attach_profile(study, optuna_config)
+
+
+def _attach_profile(study: optuna.study.Study, optuna_config: OptunaOpt) -> optuna.study.Study:
+    """
+    Stores the aggregated stage profile of the trials in the study user attr 'profile'.
     """
-    def objective(trial) -> float:
-        port_value, metrics_dict, _ = backtest(data.copy(), trial)
-        return metrics_dict.get(metric, 0.0)
-
-    study = optuna.create_study(direction=optuna_config.direction)
-    study.optimize(
-        objective,
-        n_trials=optuna_config.n_trials,
-        n_jobs=optuna_config.n_jobs,
-        show_progress_bar=optuna_config.show_progress_bar
-    )
+    if optuna_config.profile:
+        study.set_user_attr("profile", profile_table(study).to_dict(orient="index"))
     return study
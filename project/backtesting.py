@@ -1,130 +1,727 @@
 from libraries import *
-from metrics import Metrics
+import time
+from types import SimpleNamespace
+from metrics import Metrics, StreamingMetrics
 from hyperparams import hyperparams
 from indicators import Indicadores
-from functions import Position, BacktestingCapCOM, get_portfolio_value
+from quantiles import causal_quantile
+import kernels
+from functions import PositionBook, BacktestingCapCOM, get_portfolio_value
+from profiling import Profiler, stage
+from ledger import TradeLedger
 
 
-def backtest(data: pd.DataFrame, trial_or_params, initial_cash: float = None) -> tuple[list, dict, float]:
+def backtest(data: pd.DataFrame, trial_or_params, initial_cash: float = None,
+             engine: str = None, keep_curve: bool = True,
+             stream: StreamingMetrics = None, profiler: Profiler = None,
+             ledger: TradeLedger = None, periods_per_year: float = None) -> tuple[list, dict, float]:
     """
     Executes a backtest using RSI, Momentum, and Volatility strategies with volatility as a filter.
+
+    The bar loop runs on one of two engines that produce identical results:
+    "loop" walks the signal DataFrame row by row, "numpy" runs the same
+    single-position state machine over plain arrays. When `engine` is None
+    the default from `BacktestingCapCOM.engine` is used.
+
+    With `keep_curve=False` the portfolio value curve is not retained: metrics
+    are accumulated by `StreamingMetrics` while the loop runs and `port_value`
+    is returned as None. A preconfigured accumulator can be passed as `stream`
+    (implies `keep_curve=False`).
+
+    The volatility filter uses the whole-sample quantile by default; a
+    'volatility_mode' of 'expanding' or 'rolling' in the params (or in
+    `BacktestingCapCOM`) makes it causal (see `Indicadores.get_volatility`).
+
+    The input frame is not copied or modified: signals are computed from read-only
+    views of `Close` and the cached indicators into preallocated boolean buffers,
+    and the indicator warm-up (the rows a `dropna` would remove) is skipped with an
+    offset into those arrays (a mask only if invalid rows are not a prefix).
+
+    A `profiling.Profiler` passed as `profiler` records the stages 'prepare',
+    'signals', 'warmup', 'loop' (with 'portfolio_value' inside the loop engine),
+    'metrics' and 'ledger'. Without it the stages cost a no-op context each.
+
+    A `ledger.TradeLedger` passed as `ledger` receives the closed trades
+    (entry/exit bar positions in `data`, timestamps from its 'Date' column,
+    prices, shares, commission and pnl) as one columnar block.
+
+    `periods_per_year` annualizes the ratios (default: `BacktestingCapCOM.periods_per_year`,
+    hourly 24/7 bars; see `metrics.infer_periods_per_year`). A `stream` passed in
+    keeps its own setting.
+    """
+    with stage(profiler, "prepare"):
+        # --- Parameters ---
+        params = trial_or_params if isinstance(
+            trial_or_params, dict) else hyperparams(trial_or_params)
+
+        # --- Capital ---
+        cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
+
+        # --- Read-only view of the prices (`data` is never modified) ---
+        close = _readonly(data['Close'].to_numpy(dtype=float))
+
+    with stage(profiler, "signals"):
+        # --- Signals (2/3 + low-vol filter) and bars kept after the warm-up ---
+        buy, sell, valid = _signals(data, params, _base_valid(data))
+
+    with stage(profiler, "warmup"):
+        bars = _traded_bars(valid)  # positions in `data` of the traded rows
+
+    # --- Backtest Loop ---
+    with stage(profiler, "loop"):
+        if stream is None and not keep_curve:
+            stream = StreamingMetrics(periods_per_year=periods_per_year)
+        engine = BacktestingCapCOM.engine if engine is None else engine
+        if engine == "loop":
+            historic = pd.DataFrame({"Close": close[bars], "buy_signal": buy[bars],
+                                     "sell_signal": sell[bars]})
+            port_value, closed_positions, cash = _run_loop(historic, params, cash, profiler)
+            if stream is not None:
+                stream.update(port_value)
+                port_value = None
+        elif engine == "numpy":
+            port_value, closed_positions, cash = _run_numpy(
+                close[bars], buy[bars], sell[bars], params, cash, stream)
+        else:
+            raise ValueError(f"Unknown backtest engine: {engine!r}")
+
+    # --- Metrics ---
+    with stage(profiler, "metrics"):
+        if stream is None:
+            metrics_obj = _curve_metrics(port_value, periods_per_year)
+            initial_value, final_value = port_value[0], port_value[-1]
+        else:
+            metrics_obj = stream
+            initial_value, final_value = stream.initial_value, stream.final_value
+        metrics_dict = build_metrics_dict(metrics_obj, initial_value, final_value,
+                                          Metrics.win_rate(closed_positions), cash)
+
+    if ledger is not None:
+        with stage(profiler, "ledger"):
+            dates = data["Date"].to_numpy() if "Date" in data.columns else None
+            ledger.append(closed_positions, BacktestingCapCOM.COM,
+                          np.arange(len(data))[bars], dates)
+
+    return port_value, metrics_dict, cash
+
+
+def backtest_batch(data: pd.DataFrame, params_list: list, initial_cash: float = None,
+                   periods_per_year: float = None) -> list[tuple[list, dict, float]]:
     """
-    data = data.copy().reset_index(drop=True)
+    Executes the same strategy as `backtest` for many parameter sets in one pass over the price data.
 
-    # --- Parameters ---
+    The `Close` array is shared, each distinct RSI/Momentum/Volatility window is computed
+    once (through `indicator_cache`), and the buy/sell signals of all parameter sets are
+    stacked into (params x bars) matrices that are stepped in lockstep by `_run_batch`.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Price data containing a 'Close' column.
+    params_list : list
+        Hyperparameter dicts or Optuna trials (one per strategy).
+    initial_cash : float, optional
+        Starting cash for every strategy (default: `BacktestingCapCOM.initial_capital`).
+    periods_per_year : float, optional
+        Bars per year used to annualize the ratios (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    list of tuple
+        One `(port_value, metrics_dict, cash)` tuple per parameter set: the same equity
+        curve and cash as `backtest`, with metrics equal up to floating-point rounding.
+    """
+    params_list = [p if isinstance(p, dict) else hyperparams(p)
+                   for p in params_list]
+    cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
+
+    close = _readonly(data['Close'].to_numpy(dtype=float))
+    n_params, n_bars = len(params_list), len(data)
+
+    # Rows with missing data (indicator warm-up is added per strategy)
+    base_valid = _base_valid(data)
+
+    # Indicator series of repeated windows come from `indicator_cache`;
+    # signals are written straight into the rows of the (params x bars) matrices
+    buy = np.empty((n_params, n_bars), dtype=bool)
+    sell = np.empty((n_params, n_bars), dtype=bool)
+    valid = np.empty((n_params, n_bars), dtype=bool)
+    for k, params in enumerate(params_list):
+        _signals(data, params, base_valid, out=(buy[k], sell[k], valid[k]))
+
+    # --- Backtest Loop ---
+    values, win_rates, final_cash = _run_batch(
+        close, buy, sell, valid, params_list, cash)
+
+    metrics = _batch_metrics(values, cash, win_rates, final_cash, periods_per_year)
+    results = []
+    for k in range(n_params):
+        port_value = [cash] + values[k, valid[k]].tolist()
+        results.append((port_value, metrics[k], final_cash[k]))
+
+    return results
+
+
+def backtest_panel(panel: pd.DataFrame, trial_or_params, initial_cash: float = None,
+                   periods_per_year: float = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Executes the strategy with one parameter set on every symbol of a price panel,
+    stepping all symbols in lockstep with `_run_batch` (one row per symbol).
+
+    Each symbol trades only the bars where it has a price, with indicators computed
+    on its own history, so every column gives the same result as `backtest` on
+    `pd.DataFrame({'Close': panel[symbol].dropna()})`.
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        Close prices, one column per symbol and one row per bar (NaN where a symbol has no price).
+    trial_or_params : optuna.trial.Trial or dict
+        Optuna trial or hyperparameter dict.
+    initial_cash : float, optional
+        Starting cash of each symbol (default: `BacktestingCapCOM.initial_capital`).
+    periods_per_year : float, optional
+        Bars per year used to annualize the ratios (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    tuple
+        values (DataFrame of portfolio values per symbol aligned with `panel`, NaN on
+        bars the symbol did not trade) and a dict mapping each symbol to its
+        `(port_value, metrics_dict, cash)` tuple.
+    """
     params = trial_or_params if isinstance(
         trial_or_params, dict) else hyperparams(trial_or_params)
+    cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
 
-    rsi_window = params["rsi_window"]
-    rsi_lower = params["rsi_lower"]
-    rsi_upper = params["rsi_upper"]
-    momentum_window = params["momentum_window"]
-    momentum_threshold = params["momentum_threshold"]
-    volatility_window = params["volatility_window"]
-    volatility_quantile = params["volatility_quantile"]
-    stop_loss = params["stop_loss"]
-    take_profit = params["take_profit"]
-    capital_pct_exp = params["capital_pct_exp"]
+    close = panel.to_numpy(dtype=float).T  # (symbols x bars)
+    n_symbols, n_bars = close.shape
 
-    # --- Commission & Capital ---
-    COM = BacktestingCapCOM.COM
+    buy = np.zeros((n_symbols, n_bars), dtype=bool)
+    sell = np.zeros((n_symbols, n_bars), dtype=bool)
+    valid = np.zeros((n_symbols, n_bars), dtype=bool)
+    for k in range(n_symbols):
+        listed = ~np.isnan(close[k])
+        history = pd.DataFrame({'Close': close[k, listed]})
+        buy[k, listed], sell[k, listed], valid[k, listed] = _signals(
+            history, params, np.ones(len(history), dtype=bool))
+
+    values, win_rates, final_cash = _run_batch(
+        close, buy, sell, valid, [params] * n_symbols, cash)
+
+    metrics = _batch_metrics(values, cash, win_rates, final_cash, periods_per_year)
+    results = {}
+    for k, symbol in enumerate(panel.columns):
+        port_value = [cash] + values[k, valid[k]].tolist()
+        results[symbol] = (port_value, metrics[k], final_cash[k])
+
+    return pd.DataFrame(values.T, index=panel.index, columns=panel.columns), results
+
+
+def backtest_paths(paths: np.ndarray, trial_or_params, initial_cash: float = None,
+                   periods_per_year: float = None) -> pd.DataFrame:
+    """
+    Executes the strategy with one parameter set on many price paths (e.g. simulated
+    scenarios), stepping all paths in lockstep with `_run_batch`.
+
+    The indicators of all paths come from one `kernels` call per indicator and the
+    portfolio values are reduced to metrics with `Metrics.batch`, so only one row
+    of numbers per path is kept. Each row gives the same result as `backtest` on
+    `pd.DataFrame({'Close': path})` (ratios up to floating-point summation order).
+
+    Parameters
+    ----------
+    paths : np.ndarray
+        Close prices, shape (paths x bars) (a 1-D array is one path).
+    trial_or_params : optuna.trial.Trial or dict
+        Optuna trial or hyperparameter dict.
+    initial_cash : float, optional
+        Starting cash of each path (default: `BacktestingCapCOM.initial_capital`).
+    periods_per_year : float, optional
+        Bars per year used to annualize the ratios (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per path: 'Calmar', 'Sharpe', 'Sortino', 'Maximum Drawdown', 'Win Rate',
+        'Total Return (%)' and 'Final Capital'.
+    """
+    params = trial_or_params if isinstance(
+        trial_or_params, dict) else hyperparams(trial_or_params)
     cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
 
-    # --- Signals ---
-    buy_rsi, sell_rsi = Indicadores.get_rsi(
-        data, rsi_window, rsi_upper, rsi_lower)
-    buy_momentum, sell_momentum = Indicadores.get_momentum(
-        data, momentum_window, momentum_threshold)
+    paths = np.atleast_2d(np.asarray(paths, dtype=float))
+    buy, sell, valid = _path_signals(paths, params)
+    values, win_rates, final_cash = _run_batch(
+        paths, buy, sell, valid, [params] * len(paths), cash)
+
+    ratios, last = _batch_ratios(values, cash, periods_per_year)
+    return pd.DataFrame({**ratios, "Win Rate": win_rates,
+                         "Total Return (%)": (last - cash) / cash * 100,
+                         "Final Capital": final_cash})
+
+
+def volatility_mode(params: dict) -> tuple[str, int]:
+    """
+    Volatility-filter mode and rolling-quantile window of a strategy
+    (params keys, falling back to `BacktestingCapCOM`).
+    """
+    return (params.get("volatility_mode", BacktestingCapCOM.volatility_mode),
+            params.get("volatility_quantile_window", BacktestingCapCOM.volatility_quantile_window))
+
+
+def _readonly(values: np.ndarray) -> np.ndarray:
+    """
+    Read-only view of an array (guards the caller's data against in-place writes).
+    """
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+def _base_valid(data: pd.DataFrame) -> np.ndarray:
+    """
+    Bars without missing values in `data`, i.e. the rows a `dropna` of the input
+    keeps (columns 'RSI'/'Momentum' left by older versions are ignored).
+    """
+    valid = np.ones(len(data), dtype=bool)
+    for name in data.columns:
+        if name not in ('RSI', 'Momentum'):
+            valid &= data[name].notna().to_numpy()
+    return valid
+
+
+def _traded_bars(valid: np.ndarray):
+    """
+    Index of the bars a strategy trades: a slice past the warm-up when the invalid
+    bars form a prefix (so arrays indexed with it are views), else their positions.
+    """
+    start = int(np.argmax(valid)) if valid.any() else len(valid)
+    if valid[start:].all():
+        return slice(start, len(valid))
+    return np.flatnonzero(valid)
+
+
+def _signals(data: pd.DataFrame, params: dict, base_valid: np.ndarray,
+             out: tuple = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Buy/sell signals of one strategy as boolean arrays over all bars of `data`,
+    plus the mask of bars kept after the warm-up (`base_valid` and the
+    RSI/Momentum warm-up).
+
+    Indicators are read-only arrays from `indicator_cache`; the signals are
+    computed with NumPy ufuncs into `out` (three boolean arrays, e.g. rows of the
+    batch matrices) or into new buffers, without intermediate temporaries.
+
+    Returns
+    -------
+    tuple
+        buy, sell, valid
+    """
+    rsi = Indicadores.rsi(data, params["rsi_window"]).to_numpy()
+    momentum = Indicadores.momentum(data, params["momentum_window"]).to_numpy()
+    low_vol = Indicadores.get_volatility(
+        data, params["volatility_window"], params["volatility_quantile"],
+        *volatility_mode(params)).to_numpy()
+    return _vote_signals(rsi, momentum, low_vol, params, base_valid, out)
+
+
+def _path_signals(paths: np.ndarray, params: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    `_signals` of one strategy on every row of a (paths x bars) price matrix, with the
+    RSI/ROC of all paths from one `kernels` call and the rolling std and volatility
+    threshold of all paths from one pandas call (no `indicator_cache` round trips).
+
+    Returns
+    -------
+    tuple
+        buy, sell, valid as (paths x bars) boolean arrays
+    """
+    n_bars = paths.shape[1]
+    rsi = kernels.rsi(paths, min(params["rsi_window"], n_bars - 1))[0]
+    momentum = kernels.roc(paths, min(params["momentum_window"], n_bars - 1))[0]
+
+    # Same volatility filter as `Indicadores.get_volatility`, one column per path
+    vol = pd.DataFrame(paths.T).rolling(params["volatility_window"]).std()
+    mode, quantile_window = volatility_mode(params)
+    if mode == 'full':
+        threshold = vol.quantile(params["volatility_quantile"]).to_numpy()[:, None]
+    else:
+        threshold = np.array([causal_quantile(v, params["volatility_quantile"], mode,
+                                              quantile_window) for v in vol.to_numpy().T])
+    low_vol = vol.to_numpy().T < threshold
 
-    # --- Volatility filter ---
-    vol = data['Close'].rolling(volatility_window).std()
-    vol_threshold = vol.quantile(volatility_quantile)
-    low_vol = vol < vol_threshold  # mercado estable
+    return _vote_signals(rsi, momentum, low_vol, params, np.ones(paths.shape, dtype=bool))
 
-    # --- Combine signals (2/3 + low-vol filter) ---
-    historic = data.copy()
-    historic["buy_signal"] = ((buy_rsi + 2 * buy_momentum) >= 2) & low_vol
-    historic["sell_signal"] = ((sell_rsi + 2 * sell_momentum) >= 2) & low_vol
-    historic = historic.dropna().reset_index(drop=True)
+
+def _vote_signals(rsi: np.ndarray, momentum: np.ndarray, low_vol: np.ndarray, params: dict,
+                  base_valid: np.ndarray, out: tuple = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Buy/sell votes and kept bars of `_signals` from the indicator arrays
+    (any shape, e.g. one row per path).
+    """
+    shape = rsi.shape
+    buy, sell, valid = out if out is not None else (
+        np.empty(shape, dtype=bool), np.empty(shape, dtype=bool), np.empty(shape, dtype=bool))
+
+    # --- Signals (2/3 + low-vol filter) ---
+    vote, votes = np.empty(shape, dtype=bool), np.empty(shape, dtype=np.int8)
+    np.less(rsi, params["rsi_lower"], out=vote)
+    np.greater(momentum, params["momentum_threshold"], out=buy)
+    _combine_votes(vote, buy, votes, low_vol)
+    np.greater(rsi, params["rsi_upper"], out=vote)
+    np.less(momentum, -params["momentum_threshold"], out=sell)
+    _combine_votes(vote, sell, votes, low_vol)
+
+    # --- Bars kept: no missing data and indicators past their warm-up ---
+    np.isnan(rsi, out=vote)
+    np.logical_not(vote, out=vote)
+    np.logical_and(base_valid, vote, out=valid)
+    np.isnan(momentum, out=vote)
+    np.logical_not(vote, out=vote)
+    np.logical_and(valid, vote, out=valid)
+    return buy, sell, valid
+
+
+def _combine_votes(rsi_vote: np.ndarray, signal: np.ndarray, votes: np.ndarray,
+                   low_vol: np.ndarray) -> None:
+    """
+    In place: `signal = (rsi_vote + 2 * signal >= 2) & low_vol`, where `signal`
+    holds the momentum vote on entry and `votes` is an int8 scratch buffer.
+    """
+    np.add(rsi_vote, signal, out=votes, dtype=np.int8)
+    np.add(votes, signal, out=votes)
+    np.greater_equal(votes, 2, out=signal)
+    np.logical_and(signal, low_vol, out=signal)
+
+
+def _run_loop(historic: pd.DataFrame, params: dict, cash: float,
+              profiler: Profiler = None) -> tuple[list, np.ndarray, float]:
+    """
+    Reference engine: walks the signal DataFrame with `iterrows` and keeps
+    open positions in a `PositionBook` (SL/TP checks and valuation are
+    vectorized over the open positions). With a `profiler`, the time spent in
+    `get_portfolio_value` is recorded as stage 'portfolio_value'.
+
+    Returns
+    -------
+    tuple
+        port_value, closed_positions (structured array), cash
+    """
+    stop_loss = params["stop_loss"]
+    take_profit = params["take_profit"]
+    capital_pct_exp = params["capital_pct_exp"]
+    COM = BacktestingCapCOM.COM
 
     # --- Tracking ---
-    active_long_positions, active_short_positions, port_value = [], [], [cash]
-    closed_positions = []
+    book, port_value = PositionBook(), [cash]
+    portfolio_seconds = 0.0
 
-    # --- Backtest Loop ---
     for i, row in historic.iterrows():
         price = row.Close
         n_shares = (cash * capital_pct_exp) / price
 
-        # --- Close LONG positions ---
-        for pos in active_long_positions.copy():
-            if price >= pos.tp or price <= pos.sl:
-                cash += price * pos.n_shares * (1 - COM)
-                pos.profit = (price - pos.price) * pos.n_shares
-                closed_positions.append(pos)
-                active_long_positions.remove(pos)
-
-        # --- Close SHORT positions ---
-        for pos in active_short_positions.copy():
-            if price <= pos.tp or price >= pos.sl:
-                pnl = (pos.price - price) * pos.n_shares * (1 - COM)
-                cash += (pos.price * pos.n_shares) * (1 + COM) + pnl
-                pos.profit = pnl
-                closed_positions.append(pos)
-                active_short_positions.remove(pos)
+        # --- Close positions on SL/TP ---
+        if book.n_open:
+            cash = book.close(book.exits(price), price, cash, COM, i)
 
         # --- Open LONG positions ---
-        if row.buy_signal and not active_long_positions and not active_short_positions:
+        if row.buy_signal and book.n_open == 0:
             if cash > price * n_shares * (1 + COM):
                 cash -= price * n_shares * (1 + COM)
-                active_long_positions.append(Position(
-                    price=price, n_shares=n_shares,
-                    sl=price * (1 - stop_loss), tp=price * (1 + take_profit)
-                ))
+                book.open_position(1, price, n_shares,
+                                   sl=price * (1 - stop_loss), tp=price * (1 + take_profit), bar=i)
 
         # --- Open SHORT positions ---
-        if row.sell_signal and not active_short_positions and not active_long_positions:
+        if row.sell_signal and book.n_open == 0:
             if cash > price * n_shares * (1 + COM):
                 cash -= price * n_shares * (1 + COM)
-                active_short_positions.append(Position(
-                    price=price, n_shares=n_shares,
-                    sl=price * (1 + stop_loss), tp=price * (1 - take_profit)
-                ))
+                book.open_position(-1, price, n_shares,
+                                   sl=price * (1 + stop_loss), tp=price * (1 - take_profit), bar=i)
 
         # --- Portfolio value ---
-        port_value.append(get_portfolio_value(
-            cash, active_long_positions, active_short_positions, price, n_shares
-        ))
+        if profiler is not None:
+            start = time.perf_counter()
+        port_value.append(get_portfolio_value(cash, book, price))
+        if profiler is not None:
+            portfolio_seconds += time.perf_counter() - start
+
+    if profiler is not None:
+        profiler.add("portfolio_value", portfolio_seconds, len(historic))
 
     # --- Close remaining positions ---
-    for pos in active_long_positions:
-        cash += price * pos.n_shares * (1 - COM)
-        pos.profit = (price - pos.price) * pos.n_shares
-        closed_positions.append(pos)
+    if book.n_open:
+        cash = book.close_all(price, cash, COM, len(historic) - 1)
 
-    for pos in active_short_positions:
-        pnl = (pos.price - price) * pos.n_shares * (1 - COM)
-        cash += (pos.price * pos.n_shares) * (1 + COM) + pnl
-        pos.profit = pnl
-        closed_positions.append(pos)
+    return port_value, book.closed_positions, cash
 
-    # --- Metrics ---
+
+def _run_numpy(close: np.ndarray, buy_signal: np.ndarray, sell_signal: np.ndarray,
+               params: dict, cash: float, stream: StreamingMetrics = None) -> tuple[list, list, float]:
+    """
+    Array engine: the strategy never holds more than one position, so the
+    open position is kept as plain scalars (side, entry, shares, sl, tp)
+    and only closed trades go to a `PositionBook`. Arithmetic mirrors `_run_loop`
+    operation by operation so both engines return bit-identical results.
+
+    Parameters
+    ----------
+    close : np.ndarray
+        Close prices of the bars to trade.
+    buy_signal, sell_signal : np.ndarray
+        Boolean entry signals aligned with `close`.
+    params : dict
+        Strategy hyperparameters.
+    cash : float
+        Starting cash.
+    stream : StreamingMetrics, optional
+        When given, portfolio values are flushed into it every `stream.chunk_size`
+        bars instead of being kept, and port_value is returned as None.
+
+    Returns
+    -------
+    tuple
+        port_value, closed_positions (structured array), cash
+    """
+    stop_loss = params["stop_loss"]
+    take_profit = params["take_profit"]
+    capital_pct_exp = params["capital_pct_exp"]
+    COM = BacktestingCapCOM.COM
+
+    # --- State: side (0 flat, 1 long, -1 short) and open position ---
+    side, entry, shares, sl, tp, entry_bar = 0, 0.0, 0.0, 0.0, 0.0, -1
+    port_value, book = [cash], PositionBook()
+    price = None
+
+    for i, (price, buy, sell) in enumerate(zip(close.tolist(), buy_signal.tolist(),
+                                               sell_signal.tolist())):
+        n_shares = (cash * capital_pct_exp) / price
+
+        # --- Close position on SL/TP ---
+        if side == 1 and (price >= tp or price <= sl):
+            cash += price * shares * (1 - COM)
+            book.record_closed(1, entry, shares, sl, tp, price, (price - entry) * shares,
+                               entry_bar, i)
+            side = 0
+        elif side == -1 and (price <= tp or price >= sl):
+            pnl = (entry - price) * shares * (1 - COM)
+            cash += (entry * shares) * (1 + COM) + pnl
+            book.record_closed(-1, entry, shares, sl, tp, price, pnl, entry_bar, i)
+            side = 0
+
+        # --- Open position ---
+        if side == 0 and (buy or sell) and cash > price * n_shares * (1 + COM):
+            cash -= price * n_shares * (1 + COM)
+            entry, shares, entry_bar = price, n_shares, i
+            if buy:
+                side, sl, tp = 1, price * (1 - stop_loss), price * (1 + take_profit)
+            else:
+                side, sl, tp = -1, price * (1 + stop_loss), price * (1 - take_profit)
+
+        # --- Portfolio value ---
+        if side == 1:
+            port_value.append(cash + price * shares)
+        elif side == -1:
+            port_value.append(cash + ((entry * shares) + (entry - price) * shares))
+        else:
+            port_value.append(cash)
+
+        if stream is not None and len(port_value) >= stream.chunk_size:
+            stream.update(port_value)
+            port_value.clear()
+
+    if stream is not None:
+        stream.update(port_value)
+        port_value = None
+
+    # --- Close remaining position ---
+    if side == 1:
+        cash += price * shares * (1 - COM)
+        book.record_closed(1, entry, shares, sl, tp, price, (price - entry) * shares,
+                           entry_bar, len(close) - 1)
+    elif side == -1:
+        pnl = (entry - price) * shares * (1 - COM)
+        cash += (entry * shares) * (1 + COM) + pnl
+        book.record_closed(-1, entry, shares, sl, tp, price, pnl,
+                           entry_bar, len(close) - 1)
+
+    return port_value, book.closed_positions, cash
+
+
+def _run_batch(close: np.ndarray, buy: np.ndarray, sell: np.ndarray, valid: np.ndarray,
+               params_list: list[dict], cash: float) -> tuple[np.ndarray, list, list]:
+    """
+    Lockstep engine: steps every strategy through each bar at once, keeping the
+    single-position state of all strategies in arrays (one slot per strategy).
+    Strategies only trade on the bars where `valid` is True, which reproduces the
+    per-strategy `dropna` of `backtest`. The arithmetic mirrors `_run_numpy`
+    element by element, so each row matches a standalone backtest exactly.
+
+    Parameters
+    ----------
+    close : np.ndarray
+        Close prices shared by all strategies (bars,), or one price row per
+        strategy (params x bars), e.g. one symbol per row.
+    buy, sell, valid : np.ndarray
+        Boolean (params x bars) entry signals and tradable-bar masks.
+    params_list : list of dict
+        Strategy hyperparameters, one dict per row.
+    cash : float
+        Starting cash of every strategy.
+
+    Returns
+    -------
+    tuple
+        values (params x bars portfolio values, NaN on skipped bars), win_rates, final_cash
+    """
+    COM = BacktestingCapCOM.COM
+    n_params, n_bars = buy.shape
+
+    stop_loss = np.array([p["stop_loss"] for p in params_list], dtype=float)
+    take_profit = np.array([p["take_profit"] for p in params_list], dtype=float)
+    capital_pct_exp = np.array([p["capital_pct_exp"] for p in params_list], dtype=float)
+
+    # --- State: side (0 flat, 1 long, -1 short) and open position per strategy ---
+    cash = np.full(n_params, float(cash))
+    side = np.zeros(n_params, dtype=np.int8)
+    entry, shares = np.zeros(n_params), np.zeros(n_params)
+    sl, tp = np.zeros(n_params), np.zeros(n_params)
+    last_price = np.full(n_params, np.nan)
+    n_closed = np.zeros(n_params, dtype=int)
+    n_wins = np.zeros(n_params, dtype=int)
+    values = np.full((n_params, n_bars), np.nan)
+    prices = np.broadcast_to(close, (n_params, n_bars))
+
+    for i in range(n_bars):
+        active = valid[:, i]
+        if not active.any():
+            continue
+        price = prices[:, i]
+        n_shares = (cash * capital_pct_exp) / price
+
+        # --- Close LONG positions on SL/TP ---
+        exit_long = active & (side == 1) & ((price >= tp) | (price <= sl))
+        if exit_long.any():
+            cash[exit_long] += price[exit_long] * shares[exit_long] * (1 - COM)
+            profit = (price[exit_long] - entry[exit_long]) * shares[exit_long]
+            n_wins[exit_long] += profit > 0
+            n_closed[exit_long] += 1
+            side[exit_long] = 0
+
+        # --- Close SHORT positions on SL/TP ---
+        exit_short = active & (side == -1) & ((price <= tp) | (price >= sl))
+        if exit_short.any():
+            pnl = (entry[exit_short] - price[exit_short]) * shares[exit_short] * (1 - COM)
+            cash[exit_short] += (entry[exit_short] * shares[exit_short]) * (1 + COM) + pnl
+            n_wins[exit_short] += pnl > 0
+            n_closed[exit_short] += 1
+            side[exit_short] = 0
+
+        # --- Open positions ---
+        cost = price * n_shares * (1 + COM)
+        enter = active & (side == 0) & (buy[:, i] | sell[:, i]) & (cash > cost)
+        if enter.any():
+            cash[enter] -= cost[enter]
+            entry[enter] = price[enter]
+            shares[enter] = n_shares[enter]
+            go_long = enter & buy[:, i]
+            go_short = enter & ~buy[:, i]
+            side[go_long] = 1
+            sl[go_long] = price[go_long] * (1 - stop_loss[go_long])
+            tp[go_long] = price[go_long] * (1 + take_profit[go_long])
+            side[go_short] = -1
+            sl[go_short] = price[go_short] * (1 + stop_loss[go_short])
+            tp[go_short] = price[go_short] * (1 - take_profit[go_short])
+
+        # --- Portfolio value ---
+        value = np.where(side == 1, cash + price * shares,
+                         np.where(side == -1, cash + ((entry * shares) + (entry - price) * shares), cash))
+        values[active, i] = value[active]
+        last_price[active] = price[active]
+
+    # --- Close remaining positions ---
+    is_long, is_short = side == 1, side == -1
+    if is_long.any():
+        cash[is_long] += last_price[is_long] * shares[is_long] * (1 - COM)
+        n_wins[is_long] += (last_price[is_long] - entry[is_long]) * shares[is_long] > 0
+        n_closed[is_long] += 1
+    if is_short.any():
+        pnl = (entry[is_short] - last_price[is_short]) * shares[is_short] * (1 - COM)
+        cash[is_short] += (entry[is_short] * shares[is_short]) * (1 + COM) + pnl
+        n_wins[is_short] += pnl > 0
+        n_closed[is_short] += 1
+
+    # Same definition as `Metrics.win_rate`: winning trades / closed trades
+    win_rates = [float(n_wins[k] / n_closed[k]) if n_closed[k] else 0.0
+                 for k in range(n_params)]
+
+    return values, win_rates, cash.tolist()
+
+
+def _curve_metrics(port_value: list, periods_per_year: float = None) -> Metrics:
+    """
+    Builds `Metrics` over a portfolio value curve (zero values are dropped).
+    """
     port_series = pd.Series(port_value).replace(0, np.nan).dropna()
-    metrics_obj = Metrics(port_series)
+    return Metrics(port_series, periods_per_year)
+
+
+def _batch_ratios(values: np.ndarray, cash: float,
+                  periods_per_year: float = None) -> tuple[dict, np.ndarray]:
+    """
+    `Metrics.batch` ratios of the rows of a `_run_batch` value matrix (each curve
+    starts at `cash`; bars a row did not trade are NaN) and the last traded value
+    of each row (the initial cash if it never traded).
+    """
+    n_rows = values.shape[0]
+    curves = np.empty((n_rows, values.shape[1] + 1))
+    curves[:, 0] = cash
+    curves[:, 1:] = values
+    traded = ~np.isnan(curves)
+    last = curves[np.arange(n_rows), curves.shape[1] - 1 - np.argmax(traded[:, ::-1], axis=1)]
+    return Metrics.batch(curves, periods_per_year), last
 
-    final_value = port_value[-1]
-    initial_value = port_value[0]
+
+def _batch_metrics(values: np.ndarray, cash: float, win_rates: list,
+                   final_cash: list, periods_per_year: float = None) -> list[dict]:
+    """
+    Metrics dictionaries of the rows of a `_run_batch` value matrix, with the ratios
+    of all curves computed in one `Metrics.batch` pass (bars a row did not trade are NaN).
+    """
+    ratios, last = _batch_ratios(values, cash, periods_per_year)
+    return [build_metrics_dict(SimpleNamespace(calmar=float(ratios["Calmar"][k]),
+                                               sharpe=float(ratios["Sharpe"][k]),
+                                               sortino=float(ratios["Sortino"][k]),
+                                               max_drawdown=float(ratios["Maximum Drawdown"][k])),
+                               cash, float(last[k]), win_rates[k], final_cash[k])
+            for k in range(len(values))]
+
+
+def build_metrics_dict(metrics_obj, initial_value: float, final_value: float,
+                       win_rate: float, cash: float) -> dict:
+    """
+    Builds the metrics dictionary returned by `backtest`.
+
+    Parameters
+    ----------
+    metrics_obj : Metrics or StreamingMetrics
+        Ratios over the portfolio value curve.
+    initial_value, final_value : float
+        First and last portfolio values.
+    win_rate : float
+        Proportion of winning closed positions.
+    cash : float
+        Final cash.
+    """
     profit = final_value - initial_value
 
-    metrics_dict = {
+    return {
         "Calmar": metrics_obj.calmar,
         "Sharpe": metrics_obj.sharpe,
         "Sortino": metrics_obj.sortino,
         "Maximum Drawdown": metrics_obj.max_drawdown,
-        "Win Rate": Metrics.win_rate(closed_positions),
+        "Win Rate": win_rate,
         "Total Return (%)": (final_value - initial_value) / initial_value * 100,
         "Profit ($)": f"${profit:,.2f}",
         "Final Capital ($)": f"${cash:,.2f}"
     }
-
-    return port_value, metrics_dict, cash
@@ -0,0 +1,388 @@
+"""
+Performance benchmarks of the backtest, indicators, metrics and optimizer.
+
+Runs on synthetic GBM price series, writes the results to a JSON baseline and
+compares a new run against it, flagging regressions beyond a threshold.
+
+Usage:
+    python benchmark.py run --bars 10000 100000 1000000 --out benchmark_baseline.json
+    python benchmark.py compare --baseline benchmark_baseline.json --threshold 0.10
+    python benchmark.py imports
+"""
+
+from libraries import *
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from backtesting import backtest
+from cache import indicator_cache
+from hyperparams import search_space, window_range
+from indicators import Indicadores
+import kernels
+from metrics import Metrics
+from quantiles import causal_quantile
+from optimizer import optimize_hyperparams
+from functions import BacktestingCapCOM, OptunaOpt
+
+default_baseline = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+# Modules of the compute path and the stacks they must not import
+compute_modules = ("backtesting", "indicators", "metrics")
+heavy_modules = ("matplotlib", "seaborn", "IPython", "optuna", "sklearn", "scipy", "ta")
+
+
+def make_prices(n_bars: int, seed: int = 0, s0: float = 30_000.0, sigma: float = 0.01) -> pd.DataFrame:
+    """
+    Synthetic hourly OHLCV data following a geometric Brownian motion.
+
+    Parameters
+    ----------
+    n_bars : int
+        Number of bars.
+    seed : int
+        Random seed.
+    s0 : float
+        Starting price.
+    sigma : float
+        Standard deviation of the log return per bar.
+
+    Returns
+    -------
+    pd.DataFrame
+        Date, Open, High, Low, Close and Volume columns.
+    """
+    rng = np.random.default_rng(seed)
+    close = s0 * np.exp(np.cumsum(rng.normal(0.0, sigma, n_bars)))
+    open_ = np.concatenate([[s0], close[:-1]])
+    spread = np.abs(rng.normal(0.0, sigma / 2, n_bars))
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01", periods=n_bars, freq="h"),
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + spread),
+        "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close,
+        "Volume": rng.lognormal(3.0, 1.0, n_bars),
+    })
+
+
+def default_params() -> dict:
+    """
+    Mid-point of every hyperparameter range of the search space.
+    """
+    return {name: (low + high) // 2 if kind == "int" else (low + high) / 2
+            for name, (kind, low, high) in search_space.items()}
+
+
+def _best_time(fn, repeat: int, min_time: float = 0.05) -> float:
+    """
+    Best mean wall time per call of `fn` over `repeat` runs. Each run loops
+    until it lasts about `min_time` seconds so sub-millisecond timings are
+    not dominated by timer noise; an untimed warm-up call sets the loop count.
+    The indicator cache is cleared before every call.
+    """
+    indicator_cache.clear()
+    start = time.perf_counter()
+    fn()
+    loops = max(1, int(min_time / max(time.perf_counter() - start, 1e-9)))
+
+    times = []
+    for _ in range(repeat):
+        elapsed = 0.0
+        for _ in range(loops):
+            indicator_cache.clear()
+            start = time.perf_counter()
+            fn()
+            elapsed += time.perf_counter() - start
+        times.append(elapsed / loops)
+    return min(times)
+
+
+def _result(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def bench_backtest(data: pd.DataFrame, params: dict, engines: list = ("numpy",),
+                   repeat: int = 5) -> dict:
+    """
+    Bars per second of `backtest` (indicators included, cold cache) per engine.
+    """
+    results = {}
+    for engine in engines:
+        seconds = _best_time(lambda: backtest(data, params, engine=engine), repeat)
+        results[f"backtest[{engine}]"] = _result(len(data) / seconds, "bars/s", True)
+    return results
+
+
+def bench_indicators(data: pd.DataFrame, params: dict, repeat: int = 5) -> dict:
+    """
+    Seconds per indicator series (RSI, ROC, rolling std) at the default windows.
+    """
+    windows = {"rsi": params["rsi_window"], "roc": params["momentum_window"],
+               "std": params["volatility_window"]}
+    return {f"indicator[{name}]": _result(
+                _best_time(lambda: Indicadores.compute(name, data["Close"], window), repeat),
+                "s", False)
+            for name, window in windows.items()}
+
+
+def bench_kernels(data: pd.DataFrame, repeat: int = 5) -> dict:
+    """
+    Seconds per window of the multi-window RSI/ROC kernels (all windows of the search
+    space in one call) against one `ta` indicator object per window.
+    """
+    close = data["Close"]
+    results = {}
+    for name, param in (("rsi", "rsi_window"), ("roc", "momentum_window")):
+        windows = list(window_range(param))
+        if name == "rsi":
+            reference = lambda: [ta.momentum.RSIIndicator(close, window=w).rsi() for w in windows]
+        else:
+            reference = lambda: [ta.momentum.ROCIndicator(close, window=w).roc() for w in windows]
+        kernel = getattr(kernels, name)
+        results[f"kernel[{name}]"] = _result(
+            _best_time(lambda: kernel(close, windows), repeat) / len(windows), "s/window", False)
+        results[f"kernel[ta_{name}]"] = _result(
+            _best_time(reference, repeat) / len(windows), "s/window", False)
+    return results
+
+
+def bench_metrics(data: pd.DataFrame, repeat: int = 5) -> dict:
+    """
+    Seconds to build `Metrics` on a curve of the data's length and to evaluate each ratio.
+    """
+    curve = data["Close"]
+    results = {"metrics[init]": _result(_best_time(lambda: Metrics(curve), repeat), "s", False)}
+    for name in ("sharpe", "sortino", "max_drawdown", "calmar"):
+        results[f"metrics[{name}]"] = _result(
+            _best_time(lambda: getattr(Metrics(curve), name), repeat), "s", False)
+    return results
+
+
+def bench_quantile(data: pd.DataFrame, params: dict, window: int = 720, repeat: int = 5) -> dict:
+    """
+    Seconds for the causal volatility threshold (`quantiles.causal_quantile`)
+    against pandas' expanding/rolling quantile on the same rolling-std series.
+    """
+    vol = data["Close"].rolling(params["volatility_window"]).std()
+    values, q = vol.to_numpy(), params["volatility_quantile"]
+    return {
+        "quantile[expanding]": _result(
+            _best_time(lambda: causal_quantile(values, q, "expanding"), repeat), "s", False),
+        "quantile[pandas_expanding]": _result(
+            _best_time(lambda: vol.expanding().quantile(q), repeat), "s", False),
+        "quantile[rolling]": _result(
+            _best_time(lambda: causal_quantile(values, q, "rolling", window), repeat), "s", False),
+        "quantile[pandas_rolling]": _result(
+            _best_time(lambda: vol.rolling(window).quantile(q), repeat), "s", False),
+    }
+
+
+def bench_optimizer(data: pd.DataFrame, n_trials: int = 20, seed: int = 42,
+                    metric: str = "Calmar") -> dict:
+    """
+    Trials per minute of a fixed-seed, single-threaded Optuna study.
+    """
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    config = OptunaOpt(n_trials=n_trials, n_jobs=1, show_progress_bar=False, seed=seed)
+    indicator_cache.clear()
+    start = time.perf_counter()
+    optimize_hyperparams(data, BacktestingCapCOM(), config, metric)
+    seconds = time.perf_counter() - start
+    return {"optimizer[trials/min]": _result(n_trials / seconds * 60, "trials/min", True)}
+
+
+def _fresh_python(*args: str) -> subprocess.CompletedProcess:
+    """
+    Runs a fresh interpreter in the project folder with this process' import path.
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+    return subprocess.run([sys.executable, *args], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          env=env, capture_output=True, text=True, check=True)
+
+
+def import_report(module: str) -> pd.DataFrame:
+    """
+    Import times of `import module` in a fresh interpreter (`python -X importtime`).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per imported module: self and cumulative time (microseconds),
+        slowest cumulative first.
+    """
+    rows = []
+    for line in _fresh_python("-X", "importtime", "-c", f"import {module}").stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "self_us": int(self_us),
+                     "cumulative_us": int(cumulative_us)})
+    return pd.DataFrame(rows).sort_values("cumulative_us", ascending=False, ignore_index=True)
+
+
+def heavy_imports(module: str) -> list[str]:
+    """
+    `heavy_modules` loaded by `import module` in a fresh interpreter.
+    """
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {heavy_modules!r} if m in sys.modules))")
+    return [m for m in _fresh_python("-c", code).stdout.strip().split(",") if m]
+
+
+def bench_imports(modules: list = compute_modules, repeat: int = 5) -> dict:
+    """
+    Seconds to import each module in a fresh interpreter (best of `repeat`).
+    """
+    results = {}
+    for module in modules:
+        seconds = min(
+            import_report(module).set_index("module").loc[module, "cumulative_us"]
+            for _ in range(repeat)) / 1e6
+        results[f"import[{module}]"] = _result(float(seconds), "s", False)
+    return results
+
+
+def run_benchmarks(bars: list = (10_000, 100_000, 1_000_000), engines: list = ("numpy",),
+                   trial_bars: int = 10_000, n_trials: int = 20, repeat: int = 5,
+                   seed: int = 0) -> dict:
+    """
+    Runs the whole suite.
+
+    Parameters
+    ----------
+    bars : list of int
+        Series lengths for the backtest, indicator and metrics benchmarks.
+    engines : list of str
+        Backtest engines to time ('numpy', 'loop').
+    trial_bars : int
+        Series length of the optimizer benchmark (0 skips it).
+    n_trials : int
+        Trials of the optimizer benchmark.
+    repeat : int
+        Timed runs per measurement (the best one is kept).
+    seed : int
+        Seed of the price series and of the Optuna sampler.
+
+    Returns
+    -------
+    dict
+        'meta' (environment) and 'results' (name -> value, unit, higher_is_better).
+    """
+    params = default_params()
+    results = {}
+    for n_bars in bars:
+        data = make_prices(n_bars, seed)
+        suite = {**bench_backtest(data, params, engines, repeat),
+                 **bench_indicators(data, params, repeat),
+                 **bench_kernels(data, repeat),
+                 **bench_metrics(data, repeat),
+                 **bench_quantile(data, params, repeat=repeat)}
+        results.update({f"{name}@{n_bars}": value for name, value in suite.items()})
+
+    results.update(bench_imports(repeat=repeat))
+
+    if trial_bars:
+        suite = bench_optimizer(make_prices(trial_bars, seed), n_trials, seed)
+        results.update({f"{name}@{trial_bars}": value for name, value in suite.items()})
+
+    meta = {"python": platform.python_version(), "numpy": np.__version__,
+            "pandas": pd.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat, "seed": seed}
+    return {"meta": meta, "results": results}
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.10) -> pd.DataFrame:
+    """
+    Compares two benchmark runs.
+
+    Parameters
+    ----------
+    current, baseline : dict
+        Outputs of `run_benchmarks`.
+    threshold : float
+        Relative slowdown tolerated before a benchmark is flagged (0.10 = 10%).
+
+    Returns
+    -------
+    pd.DataFrame
+        Baseline and current values, relative change (positive = faster) and a
+        'regression' flag, for every benchmark present in both runs.
+    """
+    rows = {}
+    for name, base in baseline["results"].items():
+        if name not in current["results"]:
+            continue
+        value = current["results"][name]["value"]
+        if base["higher_is_better"]:
+            change = value / base["value"] - 1
+        else:
+            change = base["value"] / value - 1
+        rows[name] = {"unit": base["unit"], "baseline": base["value"], "current": value,
+                      "change": change, "regression": change < -threshold}
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["run", "compare", "imports"])
+    parser.add_argument("--bars", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--engines", nargs="+", default=["numpy"])
+    parser.add_argument("--trial-bars", type=int, default=10_000)
+    parser.add_argument("--n-trials", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=default_baseline,
+                        help="where 'run' writes its results")
+    parser.add_argument("--baseline", default=default_baseline,
+                        help="baseline JSON for 'compare'")
+    parser.add_argument("--current", default=None,
+                        help="compare a saved run instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    if args.mode == "imports":
+        failed = False
+        for module in compute_modules:
+            report = import_report(module)
+            heavy = heavy_imports(module)
+            total = report.set_index("module").loc[module, "cumulative_us"] / 1e3
+            print(f"\n--- import {module}: {total:.0f} ms ---")
+            print(report.head(10).to_string(index=False))
+            if heavy:
+                print(f"Heavy imports on the compute path: {', '.join(heavy)}")
+                failed = True
+        return 1 if failed else 0
+
+    if args.mode == "compare" and args.current is not None:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_benchmarks(args.bars, args.engines, args.trial_bars,
+                                 args.n_trials, args.repeat, args.seed)
+
+    if args.mode == "run":
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+        print(pd.DataFrame.from_dict(current["results"], orient="index"))
+        print(f"Saved to {args.out}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    table = compare(current, baseline, args.threshold)
+    print(table.to_string(formatters={"change": "{:+.1%}".format}))
+    regressions = table.index[table["regression"]].tolist()
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
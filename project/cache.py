@@ -0,0 +1,172 @@
+from libraries import *
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def fingerprint(close) -> str:
+    """
+    Returns a short hash identifying a price series by its values.
+
+    Parameters
+    ----------
+    close : pd.Series or np.ndarray
+        Close prices.
+
+    Returns
+    -------
+    str
+        Hex digest of the float64 values (length is included in the digest).
+    """
+    values = np.ascontiguousarray(np.asarray(close, dtype=float))
+    digest = hashlib.blake2b(values, digest_size=16)  # hashes the buffer, no bytes copy
+    digest.update(str(len(values)).encode())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """
+    In-process LRU cache of raw indicator series keyed by
+    (dataset fingerprint, indicator, window).
+
+    Cached arrays are read-only so they can be shared between trials.
+    Precomputed grids (see `precompute.IndicatorGrid`) can be attached and are
+    looked up before the LRU. `hits` and `misses` count lookups to check that
+    reuse actually happens.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of series kept in memory (0 disables caching).
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._grids = {}
+        self._lock = threading.Lock()
+
+    def attach(self, grid) -> None:
+        """
+        Serves lookups for the grid's dataset from its precomputed rows.
+
+        Parameters
+        ----------
+        grid : precompute.IndicatorGrid
+            Grid exposing `fingerprint` and `get(indicator, window)`.
+        """
+        with self._lock:
+            self._grids[grid.fingerprint] = grid
+
+    @contextmanager
+    def attached(self, *grids):
+        """
+        Attaches grids for the duration of a `with` block only; on exit the grids
+        previously attached under the same fingerprints (if any) are restored.
+
+        Parameters
+        ----------
+        *grids
+            Objects exposing `fingerprint` and `get(indicator, window)`.
+        """
+        with self._lock:
+            previous = {grid.fingerprint: self._grids.get(grid.fingerprint) for grid in grids}
+            for grid in grids:
+                self._grids[grid.fingerprint] = grid
+        try:
+            yield self
+        finally:
+            with self._lock:
+                for key, grid in previous.items():
+                    if grid is None:
+                        self._grids.pop(key, None)
+                    else:
+                        self._grids[key] = grid
+
+    def get(self, close, indicator: str, window: int, compute) -> np.ndarray:
+        """
+        Returns the cached series for (close, indicator, window), computing it on a miss.
+
+        Parameters
+        ----------
+        close : pd.Series or np.ndarray
+            Close prices the indicator is computed on.
+        indicator : str
+            Indicator name (e.g., 'rsi', 'roc', 'std').
+        window : int
+            Lookback window.
+        compute : callable
+            Zero-argument function returning the indicator values.
+
+        Returns
+        -------
+        np.ndarray
+            Read-only indicator values.
+        """
+        key = (fingerprint(close), indicator, window)
+        grid = self._grids.get(key[0])
+        values = None if grid is None else grid.get(indicator, window)
+        with self._lock:
+            if values is not None:
+                self.hits += 1
+                return values
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+
+        values = np.array(compute(), dtype=float)
+        values.flags.writeable = False
+
+        with self._lock:
+            if self.maxsize > 0:
+                self._data[key] = values
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return values
+
+    def clear(self) -> None:
+        """
+        Removes all cached series and attached grids and resets the hit/miss counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self._grids.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self, since: dict = None) -> dict:
+        """
+        Returns cache statistics.
+
+        Parameters
+        ----------
+        since : dict, optional
+            An earlier `info()` snapshot; hits and misses are then counted from it
+            (e.g. the lookups of one study in a long-lived process).
+
+        Returns
+        -------
+        dict
+            hits, misses, hit_rate, size, maxsize and number of attached grids.
+        """
+        hits = self.hits - (since["hits"] if since else 0)
+        misses = self.misses - (since["misses"] if since else 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "grids": len(self._grids),
+        }
+
+
+indicator_cache = IndicatorCache()
@@ -1,8 +1,9 @@
+from __future__ import annotations
 from libraries import *
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """
     Represents a position in the portfolio.
@@ -39,9 +40,27 @@ class BacktestingCapCOM:
         Initial capital for backtesting (default: 1_000_000).
     COM : float
         Commission per trade in percentage (default: 0.125 / 100).
+    engine : str
+        Backtest engine, 'numpy' (array state machine) or 'loop' (row-by-row reference) (default: 'numpy').
+    volatility_mode : str
+        Volatility-filter quantile: 'full' (whole sample, look-ahead), 'expanding' or
+        'rolling' (causal) (default: 'full'). A 'volatility_mode' key in the params overrides it.
+    volatility_quantile_window : int
+        Bars of the 'rolling' quantile (default: 720, 30 days of hourly bars). Overridden
+        by a 'volatility_quantile_window' key in the params.
+    periods_per_year : float
+        Bars per year used to annualize the metrics (default: 365 * 24, hourly bars
+        traded 24/7). `metrics.infer_periods_per_year` derives it from the bar dates.
+        Pass it explicitly (this config's field for `optimize_hyperparams`, the
+        `periods_per_year` argument elsewhere): worker processes re-import this module,
+        so reassigning the class attribute does not reach them.
     """
     initial_capital: float = 1_000_000
     COM: float = 0.125 / 100
+    engine: str = 'numpy'
+    volatility_mode: str = 'full'
+    volatility_quantile_window: int = 720
+    periods_per_year: float = 365 * 24
 
 
 @dataclass
@@ -56,16 +75,183 @@ class OptunaOpt:
         Number of optimization trials.
     n_jobs : int
         Number of parallel jobs (-1 uses all cores).
+    executor : str
+        Run trials on 'thread's (Optuna n_jobs) or worker 'process'es sharing the data.
     n_splits : int
         Number of cross-validation splits.
     show_progress_bar : bool
         Show Optuna progress bar.
+    batch_size : int
+        Trials evaluated together with `backtest_batch` (1 = one trial per backtest).
+    precompute : bool
+        Precompute the indicator grid of each dataset split to a memory-mapped file.
+    precompute_dir : str
+        Folder for the precomputed grids (None uses ./precomputed).
+    pruner : str
+        Pruner for intermediate fold reports: 'median', 'percentile', 'hyperband' or 'none'.
+    pruner_startup_trials : int
+        Trials completed before pruning starts.
+    pruner_warmup_steps : int
+        Folds reported before a trial can be pruned.
+    seed : int
+        Seed of the TPE sampler for reproducible studies (None draws a random seed).
+    profile : bool
+        Record per-stage wall time and allocations of every trial (see `profiling`).
+    profile_memory : bool
+        Also trace peak memory per stage with `tracemalloc` (slower).
+    trade_ledger : str
+        Parquet file or directory receiving the trades of every trial (None disables
+        the ledger). The process executor needs a directory (created if missing) and
+        writes one part file per worker into it.
+    storage : str
+        Persistent study storage: a database URL (e.g. 'sqlite:///optuna.db') or a
+        journal file path (e.g. 'optuna.log'). None keeps the study in memory.
+    study_name : str
+        Name of the study in the storage; an existing study with that name is resumed
+        until it has `n_trials` finished trials.
+    seed_study : str
+        Name of a prior study in the same storage (e.g. an adjacent data window)
+        whose best trials are enqueued first when a new study is created.
+    seed_top_k : int
+        Number of trials taken from `seed_study`.
     """
     direction: str = 'maximize'
     n_trials: int = 50
     n_jobs: int = -1
+    executor: str = 'thread'
     n_splits: int = 5
     show_progress_bar: bool = True
+    batch_size: int = 1
+    precompute: bool = False
+    precompute_dir: str = None
+    pruner: str = 'median'
+    pruner_startup_trials: int = 5
+    pruner_warmup_steps: int = 1
+    seed: int = None
+    profile: bool = False
+    profile_memory: bool = False
+    trade_ledger: str = None
+    storage: str = None
+    study_name: str = None
+    seed_study: str = None
+    seed_top_k: int = 5
+
+
+def get_storage(storage: str):
+    """
+    Builds the Optuna storage of a storage setting.
+
+    Parameters:
+    storage : str
+        Database URL (contains '://', e.g. 'sqlite:///optuna.db') or journal file path.
+        None returns None (in-memory study).
+
+    Returns:
+    optuna.storages.BaseStorage or None
+        RDB storage for URLs, journal-file storage for paths.
+    """
+    if storage is None:
+        return None
+    if "://" in storage:
+        # Wait on SQLite locks instead of failing when several processes write
+        engine_kwargs = {"connect_args": {"timeout": 60}} if storage.startswith("sqlite") else {}
+        return optuna.storages.RDBStorage(storage, engine_kwargs=engine_kwargs)
+    from optuna.storages.journal import JournalFileBackend
+    return optuna.storages.JournalStorage(JournalFileBackend(storage))
+
+
+def get_pruner(config: OptunaOpt) -> optuna.pruners.BasePruner:
+    """
+    Builds the Optuna pruner selected in the optimization configuration.
+
+    Parameters:
+    config : OptunaOpt
+        Optuna optimization configuration.
+
+    Returns:
+    optuna.pruners.BasePruner
+        Pruner instance ('none' returns a NopPruner).
+    """
+    if config.pruner in (None, 'none'):
+        return optuna.pruners.NopPruner()
+    if config.pruner == 'median':
+        return optuna.pruners.MedianPruner(
+            n_startup_trials=config.pruner_startup_trials,
+            n_warmup_steps=config.pruner_warmup_steps)
+    if config.pruner == 'percentile':
+        return optuna.pruners.PercentilePruner(
+            25.0, n_startup_trials=config.pruner_startup_trials,
+            n_warmup_steps=config.pruner_warmup_steps)
+    if config.pruner == 'hyperband':
+        return optuna.pruners.HyperbandPruner(max_resource=config.n_splits)
+    raise ValueError(f"Unknown pruner: {config.pruner!r}")
+
+
+def open_study(config: OptunaOpt, storage: str = None,
+               warm_start: list[dict] = None) -> optuna.study.Study:
+    """
+    Creates the study of an optimization, or resumes it from persistent storage.
+
+    A study named `config.study_name` that already exists in the storage is loaded
+    (trials finished before a restart are kept). A new study is seeded by enqueueing
+    `warm_start` and the `config.seed_top_k` best trials of `config.seed_study`.
+
+    Parameters:
+    config : OptunaOpt
+        Optuna optimization configuration.
+    storage : str, optional
+        Storage setting (see `get_storage`); defaults to `config.storage`.
+    warm_start : list of dict, optional
+        Parameter sets enqueued as the first trials of a new study.
+
+    Returns:
+    optuna.study.Study
+        New or resumed study.
+    """
+    storage = get_storage(config.storage if storage is None else storage)
+    study = optuna.create_study(study_name=config.study_name, storage=storage,
+                                load_if_exists=True, direction=config.direction,
+                                sampler=optuna.samplers.TPESampler(seed=config.seed),
+                                pruner=get_pruner(config))
+    if not study.trials:
+        seeds = list(warm_start or [])
+        if config.seed_study is not None:
+            seeds += top_params(optuna.load_study(study_name=config.seed_study, storage=storage),
+                                config.seed_top_k)
+        for params in seeds:
+            study.enqueue_trial(params)
+    return study
+
+
+def remaining_trials(study: optuna.study.Study, n_trials: int) -> int:
+    """
+    Number of trials still to run for the study to reach `n_trials` finished
+    (complete or pruned) trials; failed and interrupted trials are run again.
+    """
+    finished = sum(t.state in (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+                   for t in study.trials)
+    return max(0, n_trials - finished)
+
+
+def top_params(study: optuna.study.Study, k: int = 3) -> list[dict]:
+    """
+    Returns the parameters of the best completed trials of a study.
+
+    Parameters:
+    study : optuna.study.Study
+        Finished study.
+    k : int
+        Number of trials to return.
+
+    Returns:
+    list of dict
+        Parameters of the top `k` trials, best first.
+    """
+    completed = [t for t in study.trials
+                 if t.state == optuna.trial.TrialState.COMPLETE]
+    reverse = study.direction == optuna.study.StudyDirection.MAXIMIZE
+    completed.sort(key=lambda t: t.value, reverse=reverse)
+    return [t.params for t in completed[:k]]
 
 
 def dateset_split(data: pd.DataFrame, train: float, test: float, validation: float) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -97,30 +283,183 @@ def dateset_split(data: pd.DataFrame, train: float, test: float, validation: flo
     return train_data, test_data, validation_data
 
 
-def get_portfolio_value(cash: float, long_ops: list[Position], short_ops: list[Position], current_price: float, n_shares: float) -> float:
+# Record layout of `PositionBook` (side: 1 long, -1 short; exit fields unset while open)
+position_dtype = np.dtype([
+    ("side", np.int8),
+    ("entry_bar", np.int64),
+    ("exit_bar", np.int64),
+    ("price", np.float64),
+    ("n_shares", np.float64),
+    ("sl", np.float64),
+    ("tp", np.float64),
+    ("exit_price", np.float64),
+    ("profit", np.float64),
+])
+
+
+class PositionBook:
+    """
+    Open and closed positions stored in preallocated NumPy structured arrays
+    (`position_dtype`) instead of lists of `Position` objects.
+
+    Open positions occupy the first `n_open` rows of `positions` and closed ones
+    the first `n_closed` rows of `closed`; both arrays double their capacity when
+    full. Stop-loss/take-profit checks and portfolio valuation are vectorized
+    over all open positions, so pyramiding strategies cost no per-position
+    Python loop.
+    """
+    __slots__ = ("positions", "n_open", "closed", "n_closed")
+
+    def __init__(self, capacity: int = 8):
+        """
+        Parameters:
+        capacity : int
+            Initial number of rows of the open and closed arrays.
+        """
+        self.positions = np.zeros(capacity, dtype=position_dtype)
+        self.n_open = 0
+        self.closed = np.zeros(capacity, dtype=position_dtype)
+        self.n_closed = 0
+
+    @staticmethod
+    def _reserve(array: np.ndarray, size: int) -> np.ndarray:
+        if size <= len(array):
+            return array
+        grown = np.zeros(max(size, 2 * len(array)), dtype=position_dtype)
+        grown[:len(array)] = array
+        return grown
+
+    @property
+    def open(self) -> np.ndarray:
+        """
+        View of the open positions.
+        """
+        return self.positions[:self.n_open]
+
+    @property
+    def closed_positions(self) -> np.ndarray:
+        """
+        View of the closed positions, in closing order.
+        """
+        return self.closed[:self.n_closed]
+
+    def count(self, side: int) -> int:
+        """
+        Number of open positions on one side (1 long, -1 short).
+        """
+        return int(np.count_nonzero(self.open["side"] == side))
+
+    def open_position(self, side: int, price: float, n_shares: float, sl: float, tp: float,
+                      bar: int = -1) -> None:
+        """
+        Adds an open position (opened on bar `bar`).
+        """
+        self.positions = self._reserve(self.positions, self.n_open + 1)
+        self.positions[self.n_open] = (side, bar, -1, price, n_shares, sl, tp, np.nan, np.nan)
+        self.n_open += 1
+
+    def record_closed(self, side: int, price: float, n_shares: float, sl: float, tp: float,
+                      exit_price: float, profit: float, entry_bar: int = -1,
+                      exit_bar: int = -1) -> None:
+        """
+        Appends an already closed position (for engines that track the open position themselves).
+        """
+        self.closed = self._reserve(self.closed, self.n_closed + 1)
+        self.closed[self.n_closed] = (side, entry_bar, exit_bar, price, n_shares, sl, tp,
+                                      exit_price, profit)
+        self.n_closed += 1
+
+    def exits(self, price: float) -> np.ndarray:
+        """
+        Boolean mask of the open positions whose stop-loss or take-profit is hit at `price`.
+        """
+        book = self.open
+        is_long = book["side"] == 1
+        hit_long = (price >= book["tp"]) | (price <= book["sl"])
+        hit_short = (price <= book["tp"]) | (price >= book["sl"])
+        return np.where(is_long, hit_long, hit_short)
+
+    def close(self, mask: np.ndarray, price: float, cash: float, COM: float,
+              bar: int = -1) -> float:
+        """
+        Closes the masked open positions at `price` (longs first, then shorts,
+        like the reference loop) and returns the updated cash.
+
+        Parameters:
+        mask : np.ndarray
+            Boolean mask over the open positions.
+        price : float
+            Exit price.
+        cash : float
+            Cash before closing.
+        COM : float
+            Commission rate.
+        bar : int
+            Index of the exit bar.
+
+        Returns:
+        float
+            Cash after closing.
+        """
+        book = self.open
+        order = np.concatenate([np.flatnonzero(mask & (book["side"] == 1)),
+                                np.flatnonzero(mask & (book["side"] == -1))])
+        if order.size == 0:
+            return cash
+        leaving = book[order]
+        is_long = leaving["side"] == 1
+        entry, n_shares = leaving["price"], leaving["n_shares"]
+
+        pnl_short = (entry - price) * n_shares * (1 - COM)
+        proceeds = np.where(is_long, price * n_shares * (1 - COM),
+                            (entry * n_shares) * (1 + COM) + pnl_short)
+        leaving["profit"] = np.where(is_long, (price - entry) * n_shares, pnl_short)
+        leaving["exit_price"] = price
+        leaving["exit_bar"] = bar
+
+        # Sequential additions, as the loop `cash += ...` per position
+        cash = float(np.concatenate(([cash], proceeds)).cumsum()[-1])
+
+        self.closed = self._reserve(self.closed, self.n_closed + order.size)
+        self.closed[self.n_closed:self.n_closed + order.size] = leaving
+        self.n_closed += order.size
+        remaining = book[~mask]
+        self.positions[:remaining.size] = remaining
+        self.n_open = remaining.size
+        return cash
+
+    def close_all(self, price: float, cash: float, COM: float, bar: int = -1) -> float:
+        """
+        Closes every open position at `price` and returns the updated cash.
+        """
+        return self.close(np.ones(self.n_open, dtype=bool), price, cash, COM, bar)
+
+
+def get_portfolio_value(cash: float, book: PositionBook, current_price: float) -> float:
     """
     Calculates the total portfolio value at a given moment.
 
     Parameters:
     cash : float
         Cash available in the portfolio.
-    long_ops : list[Position]
-        List of active long positions.
-    short_ops : list[Position]
-        List of active short positions.
+    book : PositionBook
+        Book holding the open long and short positions.
     current_price : float
         Current price of the asset.
-    n_shares : float
-        Number of shares per position.
 
     Returns:
     float
         Total portfolio value including long and short positions.
     """
-    value = cash
-    for pos in long_ops:
-        value += current_price * pos.n_shares
-    for pos in short_ops:
-        value += (pos.price * pos.n_shares) + \
-            (pos.price - current_price) * pos.n_shares
-    return value
+    if book.n_open == 0:
+        return cash
+    open_ = book.open
+    longs = open_[open_["side"] == 1]
+    shorts = open_[open_["side"] == -1]
+    values = np.concatenate([
+        current_price * longs["n_shares"],
+        (shorts["price"] * shorts["n_shares"]) +
+        (shorts["price"] - current_price) * shorts["n_shares"],
+    ])
+    # Sequential additions, as `value += ...` per position
+    return float(np.concatenate(([cash], values)).cumsum()[-1])
@@ -0,0 +1,391 @@
+from libraries import *
+import glob
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from backtesting import backtest_batch
+from cache import fingerprint
+from hyperparams import search_space
+from parallel import SharedFrame, worker_count
+from functions import BacktestingCapCOM
+
+# Metrics stored in the cube, one N-dimensional array each
+grid_metrics = ["Calmar", "Sharpe", "Sortino", "Maximum Drawdown", "Win Rate", "Total Return (%)"]
+
+default_dir = os.path.join(os.path.dirname(__file__), "grid")
+
+
+def make_lattice(spec: dict = None, default_points: int = 3) -> dict:
+    """
+    Values of every hyperparameter of the search space on the evaluation lattice.
+
+    Parameters
+    ----------
+    spec : dict, optional
+        Parameter name -> list of values (used as given) or number of evenly spaced
+        points over the parameter's range. Integer parameters are rounded and
+        deduplicated, so `spec={'rsi_window': 15}` covers every RSI window.
+    default_points : int
+        Points of the parameters not in `spec` (1 = the middle of the range).
+
+    Returns
+    -------
+    dict
+        Parameter name -> sorted list of values, in `search_space` order.
+    """
+    spec = spec or {}
+    unknown = set(spec) - set(search_space)
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters: {sorted(unknown)}")
+
+    lattice = {}
+    for name, (kind, low, high) in search_space.items():
+        points = spec.get(name, default_points)
+        if isinstance(points, (int, np.integer)):
+            values = np.linspace(low, high, points) if points > 1 else np.array([(low + high) / 2])
+        else:
+            values = np.asarray(points, dtype=float)
+        if kind == "int":
+            lattice[name] = sorted({int(v) for v in np.rint(values)})
+        else:
+            lattice[name] = sorted({round(float(v), 10) for v in values})
+    return lattice
+
+
+def lattice_params(lattice: dict, start: int, stop: int, base_params: dict = None) -> list[dict]:
+    """
+    Parameter dicts of the lattice points with flat (C-order) indices [start, stop).
+    """
+    names = list(lattice)
+    shape = tuple(len(lattice[name]) for name in names)
+    index = np.unravel_index(np.arange(start, stop), shape)
+    columns = {name: np.asarray(lattice[name])[idx].tolist() for name, idx in zip(names, index)}
+    return [{**(base_params or {}), **{name: columns[name][k] for name in names}}
+            for k in range(stop - start)]
+
+
+class SensitivityCube:
+    """
+    Metrics of every point of a parameter lattice, stored on disk as compressed
+    N-dimensional arrays (one axis per hyperparameter).
+
+    A cube is a directory with `meta.json` (axes, metrics, chunking and the data
+    fingerprint) and one compressed `chunk-<k>.npz` per evaluated block of lattice
+    points (flat C-order indices). Missing chunks read as NaN, so a partially
+    evaluated cube can already be queried; `consolidate` merges the chunks into
+    `cube.npz` once the grid is complete. Queries never run backtests.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Opens an existing cube.
+
+        Parameters
+        ----------
+        directory : str
+            Cube directory (written by `evaluate_grid`).
+        """
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.meta = meta
+        self.axes = {name: values for name, values in meta["axes"]}
+        self.metrics = meta["metrics"]
+        self.shape = tuple(len(values) for values in self.axes.values())
+        self.size = int(np.prod(self.shape))
+        self.chunk_size = meta["chunk_size"]
+        self.n_chunks = -(-self.size // self.chunk_size)
+        self._values = None
+
+    def chunk_path(self, k: int) -> str:
+        """
+        Path of the file holding chunk `k`.
+        """
+        return os.path.join(self.directory, f"chunk-{k:06d}.npz")
+
+    def done_chunks(self) -> set[int]:
+        """
+        Indices of the chunks already evaluated.
+        """
+        if os.path.exists(os.path.join(self.directory, "cube.npz")):
+            return set(range(self.n_chunks))
+        return {int(os.path.basename(path)[6:12])
+                for path in glob.glob(os.path.join(self.directory, "chunk-*.npz"))}
+
+    @property
+    def progress(self) -> float:
+        """
+        Fraction of lattice points evaluated.
+        """
+        done = self.done_chunks()
+        points = sum(min(self.chunk_size, self.size - k * self.chunk_size) for k in done)
+        return points / self.size if self.size else 1.0
+
+    def _load(self) -> dict:
+        """
+        Metric arrays of the cube (NaN where not evaluated yet), read once.
+        """
+        if self._values is not None:
+            return self._values
+        cube_path = os.path.join(self.directory, "cube.npz")
+        if os.path.exists(cube_path):
+            with np.load(cube_path) as cube:
+                values = {metric: cube[metric] for metric in self.metrics}
+        else:
+            flat = {metric: np.full(self.size, np.nan) for metric in self.metrics}
+            for k in sorted(self.done_chunks()):
+                start = k * self.chunk_size
+                with np.load(self.chunk_path(k)) as chunk:
+                    for metric in self.metrics:
+                        flat[metric][start:start + len(chunk[metric])] = chunk[metric]
+            values = {metric: flat[metric].reshape(self.shape) for metric in self.metrics}
+        if self.progress == 1.0:
+            self._values = values
+        return values
+
+    def values(self, metric: str) -> np.ndarray:
+        """
+        N-dimensional array of a metric (axes in `self.axes` order).
+        """
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown metric: {metric!r}")
+        return self._load()[metric]
+
+    def _select(self, metric: str, fixed: dict) -> tuple[np.ndarray, list]:
+        """
+        Sub-array of a metric with the `fixed` hyperparameters at their lattice
+        values, and the names of its free axes (single-value axes count as fixed).
+        """
+        unknown = set(fixed) - set(self.axes)
+        if unknown:
+            raise ValueError(f"Unknown hyperparameters: {sorted(unknown)}")
+        free = [name for name, values in self.axes.items()
+                if name not in fixed and len(values) > 1]
+        index = tuple(slice(None) if name in free
+                      else self._axis_index(name, fixed.get(name, self.axes[name][0]))
+                      for name in self.axes)
+        return self.values(metric)[index], free
+
+    def _axis_index(self, name: str, value) -> int:
+        matches = np.flatnonzero(np.isclose(self.axes[name], value))
+        if not len(matches):
+            raise ValueError(f"{name}={value!r} is not on the lattice {self.axes[name]}")
+        return int(matches[0])
+
+    def slice(self, metric: str, **fixed) -> pd.Series:
+        """
+        Metric over the free hyperparameters with the others fixed to lattice values.
+
+        Parameters
+        ----------
+        metric : str
+            Metric name (e.g. 'Calmar').
+        **fixed
+            Hyperparameter name -> lattice value.
+
+        Returns
+        -------
+        pd.Series
+            Metric values indexed by the free hyperparameters with more than one
+            lattice value (MultiIndex; use `unstack` for a 2-D surface).
+        """
+        values, free = self._select(metric, fixed)
+        if not free:
+            return pd.Series([float(values)], name=metric)
+        levels = pd.MultiIndex.from_product([self.axes[name] for name in free], names=free)
+        return pd.Series(values.ravel(), index=levels, name=metric)
+
+    def marginal(self, metric: str, param: str, reduce: str = "mean", **fixed) -> pd.Series:
+        """
+        Sensitivity curve of a metric to one hyperparameter.
+
+        Parameters
+        ----------
+        metric : str
+            Metric name.
+        param : str
+            Hyperparameter on the x axis.
+        reduce : str
+            How the other free hyperparameters are aggregated: 'mean', 'median',
+            'max', 'min' or 'std' (NaN-aware).
+        **fixed
+            Hyperparameters held at a lattice value instead of aggregated.
+
+        Returns
+        -------
+        pd.Series
+            One value per lattice value of `param`.
+        """
+        reducers = {"mean": np.nanmean, "median": np.nanmedian, "max": np.nanmax,
+                    "min": np.nanmin, "std": np.nanstd}
+        if reduce not in reducers:
+            raise ValueError(f"Unknown reduction: {reduce!r}")
+        values, free = self._select(metric, fixed)
+        if param not in free:
+            raise ValueError(f"{param!r} is not a free hyperparameter of the cube")
+        other = tuple(k for k, name in enumerate(free) if name != param)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            curve = reducers[reduce](values, axis=other) if other else values
+        return pd.Series(curve, index=pd.Index(self.axes[param], name=param), name=metric)
+
+    def best(self, metric: str, k: int = 5, minimize: bool = False) -> pd.DataFrame:
+        """
+        The `k` best lattice points for a metric (NaN points are ignored).
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per point: its hyperparameters and all metrics.
+        """
+        values = self.values(metric).ravel()
+        order = np.argsort(values if minimize else -values, kind="stable")
+        order = order[~np.isnan(values[order])][:k]
+        points = np.unravel_index(order, self.shape)
+        rows = {name: np.asarray(self.axes[name])[idx] for name, idx in zip(self.axes, points)}
+        rows.update({m: self.values(m).ravel()[order] for m in self.metrics})
+        return pd.DataFrame(rows)
+
+    def consolidate(self) -> str:
+        """
+        Merges the chunks of a complete cube into one compressed `cube.npz`
+        and removes them.
+
+        Returns
+        -------
+        str
+            Path of `cube.npz`.
+        """
+        cube_path = os.path.join(self.directory, "cube.npz")
+        if os.path.exists(cube_path):
+            return cube_path
+        if self.progress < 1.0:
+            raise RuntimeError(f"Cube is incomplete ({self.progress:.1%} evaluated)")
+        values = self._load()
+        _write_npz(cube_path, values)
+        for path in glob.glob(os.path.join(self.directory, "chunk-*.npz")):
+            os.remove(path)
+        return cube_path
+
+
+def _write_npz(path: str, arrays: dict) -> None:
+    """
+    Writes compressed arrays atomically (temporary file, then rename).
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _evaluate_chunk(data: pd.DataFrame, lattice: dict, start: int, stop: int,
+                    base_params: dict, cash: float, periods_per_year: float) -> dict:
+    """
+    Metrics of the lattice points [start, stop) with `backtest_batch`.
+    """
+    results = backtest_batch(data, lattice_params(lattice, start, stop, base_params), cash,
+                             periods_per_year)
+    return {metric: np.array([metrics_dict[metric] for _, metrics_dict, _ in results], dtype=float)
+            for metric in grid_metrics}
+
+
+def _grid_worker(spec: dict, lattice: dict, start: int, stop: int,
+                 base_params: dict, cash: float, periods_per_year: float) -> dict:
+    """
+    Worker process: attaches the shared frame and evaluates one chunk of the lattice.
+    """
+    data, shm = SharedFrame.attach(spec)
+    try:
+        return _evaluate_chunk(data, lattice, start, stop, base_params, cash, periods_per_year)
+    finally:
+        del data
+        shm.close()
+
+
+def evaluate_grid(data: pd.DataFrame, directory: str = None, lattice: dict = None,
+                  base_params: dict = None, initial_cash: float = None,
+                  n_workers: int = 1, chunk_size: int = 256,
+                  consolidate: bool = True, periods_per_year: float = None) -> SensitivityCube:
+    """
+    Exhaustive evaluation of a parameter lattice, as an alternative to the Optuna
+    search of `optimize_hyperparams`.
+
+    Lattice points are enumerated in C order (the first hyperparameter varies
+    slowest, so consecutive points share their indicator windows and hit
+    `indicator_cache`) and evaluated in chunks of `chunk_size` with
+    `backtest_batch`, on a process pool reading the data from shared memory when
+    `n_workers > 1`. Every finished chunk is written to the cube directory at
+    once, so an interrupted run resumes from the missing chunks when called again
+    with the same data and lattice.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Price data containing a 'Close' column (e.g. the training split).
+    directory : str, optional
+        Cube directory (default: ./grid/<data fingerprint>).
+    lattice : dict, optional
+        Parameter name -> values (`make_lattice`; default: `make_lattice()`).
+    base_params : dict, optional
+        Extra strategy keys shared by all points (e.g. 'volatility_mode').
+    initial_cash : float, optional
+        Starting cash (default: `BacktestingCapCOM.initial_capital`).
+    n_workers : int
+        Worker processes (-1 uses all cores, 1 runs in-process).
+    chunk_size : int
+        Lattice points per chunk (and per `backtest_batch` call).
+    consolidate : bool
+        Merge the chunks into one `cube.npz` when the grid is complete.
+    periods_per_year : float, optional
+        Bars per year used to annualize the metrics (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    SensitivityCube
+        The evaluated cube.
+    """
+    lattice = make_lattice() if lattice is None else {
+        name: np.asarray(values).tolist() for name, values in lattice.items()}
+    cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
+    periods_per_year = BacktestingCapCOM.periods_per_year \
+        if periods_per_year is None else periods_per_year
+    data_fingerprint = fingerprint(data["Close"])
+    directory = os.path.join(default_dir, data_fingerprint) if directory is None else directory
+    os.makedirs(directory, exist_ok=True)
+
+    meta = {"fingerprint": data_fingerprint,
+            "axes": [[name, list(values)] for name, values in lattice.items()],
+            "metrics": grid_metrics, "chunk_size": chunk_size,
+            "base_params": base_params or {}, "initial_cash": cash,
+            "periods_per_year": periods_per_year}
+    meta_path = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            existing = json.load(f)
+        if existing != meta:
+            raise ValueError(f"{directory} holds a cube of another dataset, lattice or setting")
+    else:
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    cube = SensitivityCube(directory)
+    pending = [k for k in range(cube.n_chunks) if k not in cube.done_chunks()]
+    bounds = {k: (k * chunk_size, min((k + 1) * chunk_size, cube.size)) for k in pending}
+
+    n_workers = min(worker_count(n_workers), max(len(pending), 1))
+    if n_workers == 1:
+        for k in pending:
+            values = _evaluate_chunk(data, lattice, *bounds[k], base_params, cash,
+                                     periods_per_year)
+            _write_npz(cube.chunk_path(k), values)
+    else:
+        with SharedFrame(data.reset_index(drop=True)) as shared, \
+                ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = {pool.submit(_grid_worker, shared.spec, lattice, *bounds[k],
+                                   base_params, cash, periods_per_year): k for k in pending}
+            for future in as_completed(futures):
+                _write_npz(cube.chunk_path(futures[future]), future.result())
+
+    if consolidate:
+        cube.consolidate()
+    return cube
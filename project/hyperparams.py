@@ -5,6 +5,28 @@ from libraries import *
 # -- Momentum: Measures the speed of price change
 # -- Volatility: Measures price variation over time
 
+# Search space: name -> (type, low, high)
+search_space = {
+    # --- RSI ---
+    "rsi_window": ("int", 11, 25),
+    "rsi_lower": ("int", 25, 35),
+    "rsi_upper": ("int", 60, 80),
+
+    # --- Momentum ---
+    "momentum_window": ("int", 10, 22),
+    "momentum_threshold": ("float", 0.02, 0.1),
+
+    # --- Volatility filter ---
+    "volatility_window": ("int", 25, 35),
+    "volatility_quantile": ("float", 0.6, 0.70),
+
+    # --- Risk management ---
+    "stop_loss": ("float", 0.02, 0.03),
+    "take_profit": ("float", 0.05, 0.10),
+    "capital_pct_exp": ("float", 0.05, 0.20),
+}
+
+
 def hyperparams(trial) -> dict:
     """
     Define the hyperparameter search space for the backtesting strategy (updated for volatility filter).
@@ -16,21 +38,23 @@ def hyperparams(trial) -> dict:
         dict: Dictionary containing hyperparameters and their suggested values.
     """
     return {
-        # --- RSI ---
-        "rsi_window": trial.suggest_int("rsi_window", 11, 25),
-        "rsi_lower": trial.suggest_int("rsi_lower", 25, 35),
-        "rsi_upper": trial.suggest_int("rsi_upper", 60, 80),
-
-        # --- Momentum ---
-        "momentum_window": trial.suggest_int("momentum_window", 10, 22),
-        "momentum_threshold": trial.suggest_float("momentum_threshold", 0.02, 0.1),
-
-        # --- Volatility filter ---
-        "volatility_window": trial.suggest_int("volatility_window", 25, 35),  
-        "volatility_quantile": trial.suggest_float("volatility_quantile", 0.6, 0.70),  
-
-        # --- Risk management ---
-        "stop_loss": trial.suggest_float("stop_loss", 0.02, 0.03),
-        "take_profit": trial.suggest_float("take_profit", 0.05, 0.10),
-        "capital_pct_exp": trial.suggest_float("capital_pct_exp", 0.05, 0.20),
+        name: trial.suggest_int(name, low, high) if kind == "int"
+        else trial.suggest_float(name, low, high)
+        for name, (kind, low, high) in search_space.items()
     }
+
+
+def window_range(name: str) -> range:
+    """
+    Returns every value of an integer hyperparameter in the search space.
+
+    Args:
+        name (str): Hyperparameter name (e.g., 'rsi_window').
+
+    Returns:
+        range: Values from low to high (inclusive).
+    """
+    kind, low, high = search_space[name]
+    if kind != "int":
+        raise ValueError(f"{name} is not an integer hyperparameter")
+    return range(low, high + 1)
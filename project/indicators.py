@@ -1,4 +1,7 @@
 from libraries import *
+from cache import indicator_cache
+import kernels
+from quantiles import causal_quantile
 from dataclasses import dataclass
 
 
@@ -6,9 +9,86 @@ from dataclasses import dataclass
 class Indicadores:
     """
     Class containing static methods for technical indicators used in backtesting.
-    Each method returns buy and sell signals based on the indicator.
+    The `get_*` methods return buy and sell signals based on the indicator;
+    `rsi`, `momentum` and `volatility` return the raw indicator series,
+    memoized per (dataset, window) in `cache.indicator_cache`.
     """
 
+    @staticmethod
+    def compute(indicator: str, close: pd.Series, window: int) -> pd.Series:
+        """
+        Compute a raw indicator series directly, without going through the cache.
+        RSI and ROC come from the NumPy kernels in `kernels` (same values as `ta`).
+
+        Args:
+            indicator (str): 'rsi', 'roc' (momentum) or 'std' (volatility).
+            close (pd.Series): Close prices.
+            window (int): Lookback period.
+
+        Returns:
+            pd.Series: Indicator values (NaN during the warm-up period).
+        """
+        if indicator == 'rsi':
+            return pd.Series(kernels.rsi(close, window)[0], index=close.index, name='rsi')
+        if indicator == 'roc':
+            return pd.Series(kernels.roc(close, window)[0], index=close.index, name='roc')
+        if indicator == 'std':
+            return close.rolling(window).std()
+        raise ValueError(f"Unknown indicator: {indicator!r}")
+
+    @staticmethod
+    def rsi(data: pd.DataFrame, windows: int) -> pd.Series:
+        """
+        Calculate the raw RSI series.
+
+        Args:
+            data (pd.DataFrame): DataFrame containing 'Close' prices.
+            windows (int): Lookback period for RSI calculation.
+
+        Returns:
+            pd.Series: RSI values (NaN during the warm-up period).
+        """
+        windows = min(windows, len(data)-1)
+        values = indicator_cache.get(
+            data['Close'], 'rsi', windows,
+            lambda: Indicadores.compute('rsi', data['Close'], windows))
+        return pd.Series(values, index=data.index, name='rsi')
+
+    @staticmethod
+    def momentum(data: pd.DataFrame, windows: int) -> pd.Series:
+        """
+        Calculate the raw momentum (Rate of Change) series.
+
+        Args:
+            data (pd.DataFrame): DataFrame containing 'Close' prices.
+            windows (int): Lookback period for momentum calculation.
+
+        Returns:
+            pd.Series: Rate of Change values (NaN during the warm-up period).
+        """
+        windows = min(windows, len(data)-1)
+        values = indicator_cache.get(
+            data['Close'], 'roc', windows,
+            lambda: Indicadores.compute('roc', data['Close'], windows))
+        return pd.Series(values, index=data.index, name='roc')
+
+    @staticmethod
+    def volatility(data: pd.DataFrame, vol_window: int) -> pd.Series:
+        """
+        Calculate the raw rolling volatility (standard deviation of 'Close').
+
+        Args:
+            data (pd.DataFrame): DataFrame containing a 'Close' column.
+            vol_window (int): Rolling window size for volatility calculation.
+
+        Returns:
+            pd.Series: Rolling standard deviation (NaN during the warm-up period).
+        """
+        values = indicator_cache.get(
+            data['Close'], 'std', vol_window,
+            lambda: Indicadores.compute('std', data['Close'], vol_window))
+        return pd.Series(values, index=data.index, name='Close')
+
     @staticmethod
     def get_rsi(data: pd.DataFrame, windows: int, rsi_upper: int, rsi_lower: int)-> tuple[pd.Series, pd.Series]:
         """
@@ -23,11 +103,9 @@ class Indicadores:
         Returns:
             tuple(pd.Series, pd.Series): Buy and sell signals (1 = signal, 0 = no signal).
         """
-        windows = min(windows, len(data)-1)
-        data['RSI'] = ta.momentum.RSIIndicator(
-            data['Close'], window=windows).rsi()
-        buy_signal = ((data['RSI'] < rsi_lower)).astype(int).fillna(0)
-        sell_signal = ((data['RSI'] > rsi_upper)).astype(int).fillna(0)
+        rsi = Indicadores.rsi(data, windows)
+        buy_signal = ((rsi < rsi_lower)).astype(int).fillna(0)
+        sell_signal = ((rsi > rsi_upper)).astype(int).fillna(0)
         return buy_signal, sell_signal
 
     @staticmethod
@@ -43,15 +121,14 @@ class Indicadores:
         Returns:
             tuple(pd.Series, pd.Series): Buy and sell signals (1 = signal, 0 = no signal).
         """
-        windows = min(windows, len(data)-1)
-        data['Momentum'] = ta.momentum.ROCIndicator(
-            data['Close'], window=windows).roc()
-        buy_signal = ((data['Momentum'] > threshold)).astype(int).fillna(0)
-        sell_signal = ((data['Momentum'] < -threshold)).astype(int).fillna(0)
+        momentum = Indicadores.momentum(data, windows)
+        buy_signal = ((momentum > threshold)).astype(int).fillna(0)
+        sell_signal = ((momentum < -threshold)).astype(int).fillna(0)
         return buy_signal, sell_signal
 
     @staticmethod
-    def get_volatility(data: pd.DataFrame, vol_window: int, quantile: float) -> pd.Series:
+    def get_volatility(data: pd.DataFrame, vol_window: int, quantile: float,
+                       mode: str = 'full', quantile_window: int = None) -> pd.Series:
         """
         Calculates rolling volatility and returns a low-volatility filter (True = low volatility).
 
@@ -59,11 +136,20 @@ class Indicadores:
             data (pd.DataFrame): DataFrame containing a 'Close' column.
             vol_window (int): Rolling window size for volatility calculation.
             quantile (float): Quantile used to define low-volatility threshold.
+            mode (str): How the threshold is computed: 'full' (quantile of the whole
+                series, look-ahead), 'expanding' (quantile of all volatility values up
+                to each bar) or 'rolling' (quantile of the last `quantile_window` values).
+            quantile_window (int): Window of the 'rolling' mode.
 
         Returns:
-            pd.Series: Boolean series where True indicates low volatility.
+            pd.Series: Boolean series where True indicates low volatility
+                (False while a causal threshold is not available yet).
         """
-        vol = data['Close'].rolling(vol_window).std()
-        threshold = vol.quantile(quantile)
+        vol = Indicadores.volatility(data, vol_window)
+        if mode == 'full':
+            threshold = vol.quantile(quantile)
+        else:
+            threshold = causal_quantile(
+                vol.to_numpy(), quantile, mode, quantile_window)
         low_vol = vol < threshold
-        return low_vol
\ No newline at end of file
+        return low_vol
@@ -0,0 +1,95 @@
+from libraries import *
+
+
+def _windows(windows) -> np.ndarray:
+    """
+    Window list as a 1-D integer array (a single int gives one window).
+    """
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    if windows.ndim != 1 or (windows < 1).any():
+        raise ValueError(f"Windows must be positive integers, got {windows!r}")
+    return windows
+
+
+def rsi(close, windows) -> np.ndarray:
+    """
+    Wilder RSI of a price series for several windows at once.
+
+    The price changes and their up/down parts are computed once and shared by every
+    window; each window then runs the Wilder smoothing (`ewm(alpha=1/w, adjust=False)`)
+    of both and writes its RSI row in place into one (windows x bars) array. The
+    arithmetic is the one of `ta.momentum.RSIIndicator`, so the values are the same
+    as `ta`'s. A 2-D `close` holds one price path per row; every path is smoothed in
+    the same `ewm` call.
+
+    Parameters
+    ----------
+    close : np.ndarray or pd.Series
+        Close prices, shape (bars,) or (paths x bars).
+    windows : int or sequence of int
+        Lookback periods.
+
+    Returns
+    -------
+    np.ndarray
+        (windows x bars) or (windows x paths x bars) RSI values (NaN during the
+        first `w - 1` bars of each row).
+    """
+    close = np.asarray(close, dtype=float)
+    windows = _windows(windows)
+
+    diff = np.empty(close.shape)
+    diff[..., :1] = np.nan
+    np.subtract(close[..., 1:], close[..., :-1], out=diff[..., 1:])
+    # Bars along the rows, as pandas smooths each column
+    up = pd.DataFrame(np.where(diff > 0, diff, 0.0).T)
+    down = pd.DataFrame(-np.where(diff < 0, diff, 0.0).T)
+
+    values = np.empty((len(windows),) + close.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k, window in enumerate(windows):
+            smoothing = dict(alpha=1 / window, min_periods=window, adjust=False)
+            ema_up = up.ewm(**smoothing).mean().to_numpy().T.reshape(close.shape)
+            ema_down = down.ewm(**smoothing).mean().to_numpy().T.reshape(close.shape)
+            row = values[k]
+            np.divide(ema_up, ema_down, out=row)        # relative strength
+            row += 1
+            np.divide(100, row, out=row)
+            np.subtract(100, row, out=row)
+            row[ema_down == 0] = 100
+    return values
+
+
+def roc(close, windows) -> np.ndarray:
+    """
+    Rate of Change (in %) of a price series for several windows at once.
+
+    Same arithmetic as `ta.momentum.ROCIndicator`: `(close - close[t-w]) / close[t-w] * 100`.
+
+    Parameters
+    ----------
+    close : np.ndarray or pd.Series
+        Close prices, shape (bars,) or (paths x bars).
+    windows : int or sequence of int
+        Lookback periods.
+
+    Returns
+    -------
+    np.ndarray
+        (windows x bars) or (windows x paths x bars) ROC values (NaN during the
+        first `w` bars of each row).
+    """
+    close = np.asarray(close, dtype=float)
+    windows = _windows(windows)
+    n = close.shape[-1]
+
+    values = np.full((len(windows),) + close.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k, window in enumerate(windows):
+            if window < n:
+                previous = close[..., :n - window]
+                row = values[k, ..., window:]
+                np.subtract(close[..., window:], previous, out=row)
+                row /= previous
+                row *= 100
+    return values
@@ -0,0 +1,136 @@
+from libraries import *
+import threading
+import uuid
+
+# Columns of the ledger, in order (tag columns are appended after them)
+ledger_columns = ["entry_bar", "exit_bar", "entry_time", "exit_time", "side",
+                  "entry_price", "exit_price", "n_shares", "commission", "gross_pnl", "pnl"]
+
+
+class TradeLedger:
+    """
+    Columnar log of closed trades.
+
+    `backtest(..., ledger=...)` appends the closed positions of a run as one
+    block of NumPy columns (no per-trade Python objects), so the ledger can stay
+    on during optimizations. Blocks are concatenated only when the ledger is
+    exported, and the export to Parquet/Arrow is a single bulk write.
+
+    Constant `tags` (e.g. the trial number) are added as extra columns to every
+    block, which keeps the trades of many runs in one table.
+    """
+
+    def __init__(self, tags: dict = None):
+        """
+        Parameters
+        ----------
+        tags : dict, optional
+            Column name -> constant value added to every appended trade.
+        """
+        self.tags = dict(tags or {})
+        self._blocks = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(block["pnl"]) for block in self._blocks)
+
+    def append(self, closed: np.ndarray, COM: float, bars: np.ndarray = None,
+               dates: np.ndarray = None) -> None:
+        """
+        Adds the closed positions of one backtest.
+
+        Parameters
+        ----------
+        closed : np.ndarray
+            Closed positions (`functions.position_dtype`), bars relative to the traded rows.
+        COM : float
+            Commission rate of the backtest.
+        bars : np.ndarray, optional
+            Maps traded-row positions to bar positions of the input data (e.g. the
+            rows kept after dropping the indicator warm-up). Identity when None.
+        dates : np.ndarray, optional
+            Timestamp of every bar of the input data.
+        """
+        entry_bar, exit_bar = closed["entry_bar"], closed["exit_bar"]
+        if bars is not None:
+            entry_bar, exit_bar = bars[entry_bar], bars[exit_bar]
+
+        side = closed["side"]
+        entry, exit_, n_shares = closed["price"], closed["exit_price"], closed["n_shares"]
+        gross = side * (exit_ - entry) * n_shares
+        # Net cash effect of the round trip as booked by the engines:
+        # longs pay COM on both legs, shorts get (1 - COM) of the price move
+        pnl = np.where(side == 1, gross - (entry + exit_) * n_shares * COM, closed["profit"])
+
+        block = {
+            "entry_bar": np.asarray(entry_bar, dtype=np.int64),
+            "exit_bar": np.asarray(exit_bar, dtype=np.int64),
+            "entry_time": None if dates is None else np.asarray(dates)[entry_bar],
+            "exit_time": None if dates is None else np.asarray(dates)[exit_bar],
+            "side": np.where(side == 1, "long", "short"),
+            "entry_price": entry.copy(),
+            "exit_price": exit_.copy(),
+            "n_shares": n_shares.copy(),
+            "commission": gross - pnl,
+            "gross_pnl": gross,
+            "pnl": pnl,
+        }
+        for name, value in self.tags.items():
+            block[name] = np.full(len(pnl), value)
+        with self._lock:
+            self._blocks.append(block)
+
+    def extend(self, other: "TradeLedger") -> None:
+        """
+        Adds the blocks of another ledger (e.g. the per-trial ledger of a study).
+        """
+        with self._lock:
+            self._blocks.extend(other._blocks)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        All trades as a DataFrame (one concatenation per column).
+        """
+        with self._lock:
+            blocks = list(self._blocks)
+        names = ledger_columns + [c for c in dict.fromkeys(
+            k for block in blocks for k in block) if c not in ledger_columns]
+        columns = {}
+        for name in names:
+            parts = [block.get(name) for block in blocks]
+            if all(part is None for part in parts):
+                continue
+            parts = [np.full(len(block["pnl"]), None) if part is None else part
+                     for block, part in zip(blocks, parts)]
+            columns[name] = np.concatenate(parts) if parts else np.array([])
+        return pd.DataFrame(columns)
+
+    def to_arrow(self):
+        """
+        All trades as a `pyarrow.Table`.
+        """
+        import pyarrow as pa
+        return pa.Table.from_pandas(self.to_frame(), preserve_index=False)
+
+    def write_parquet(self, path: str, compression: str = "zstd") -> str:
+        """
+        Writes the ledger in one bulk Parquet write.
+
+        Parameters
+        ----------
+        path : str
+            Destination file, or an existing directory (a unique part file is
+            created in it, so several processes can write to one dataset).
+        compression : str
+            Parquet compression codec.
+
+        Returns
+        -------
+        str
+            Path of the written file.
+        """
+        import pyarrow.parquet as pq
+        if os.path.isdir(path):
+            path = os.path.join(path, f"part-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(self.to_arrow(), path, compression=compression)
+        return path
@@ -0,0 +1,404 @@
+from libraries import *
+from collections import deque
+from dataclasses import dataclass, field
+from backtesting import build_metrics_dict, volatility_mode
+from hyperparams import hyperparams
+from indicators import Indicadores
+from metrics import StreamingMetrics
+from quantiles import ExpandingQuantile, RollingQuantile
+from functions import Position, BacktestingCapCOM
+
+
+class IncrementalRSI:
+    """
+    Wilder RSI updated one close at a time, reproducing `ta.momentum.RSIIndicator`
+    (pandas `ewm(alpha=1/window, adjust=False, min_periods=window)` of the up/down moves).
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.alpha = 1 / window
+        self.prev_close = None
+        self.n = 0
+        self.up = self.down = None
+
+    def _smooth(self, prev: float, value: float) -> float:
+        # Same operations as pandas' ewm kernel with adjust=False
+        if prev != value:
+            old_wt = 1. * (1. - self.alpha)
+            prev = (old_wt * prev + self.alpha * value) / (old_wt + self.alpha)
+        return prev
+
+    def update(self, close: float) -> float:
+        """
+        Adds a close and returns the RSI (NaN during the warm-up).
+        """
+        diff = np.nan if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else -0.0
+        if self.n == 0:
+            self.up, self.down = up, down
+        else:
+            self.up = self._smooth(self.up, up)
+            self.down = self._smooth(self.down, down)
+        self.n += 1
+
+        if self.n < self.window:
+            return np.nan
+        if self.down == 0:
+            return 100.0
+        return 100 - (100 / (1 + self.up / self.down))
+
+
+class IncrementalROC:
+    """
+    Rate of change over `window` closes, as `ta.momentum.ROCIndicator`.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.closes = deque(maxlen=window + 1)
+
+    def update(self, close: float) -> float:
+        """
+        Adds a close and returns the ROC in percent (NaN during the warm-up).
+        """
+        self.closes.append(close)
+        if len(self.closes) <= self.window:
+            return np.nan
+        past = self.closes[0]
+        return ((close - past) / past) * 100
+
+
+class IncrementalStd:
+    """
+    Rolling sample standard deviation, reproducing pandas `rolling(window).std()`
+    (Welford updates with Kahan-compensated means for adds and removes).
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.mean = self.ssqdm = 0.0
+        self.comp_add = self.comp_remove = 0.0
+        self.prev_value = None
+        self.n_same = 0
+
+    def _add(self, value: float) -> None:
+        self.nobs += 1
+        if value == self.prev_value:
+            self.n_same += 1
+        else:
+            self.n_same = 1
+        self.prev_value = value
+
+        prev_mean = self.mean - self.comp_add
+        y = value - self.comp_add
+        t = y - self.mean
+        self.comp_add = t + self.mean - y
+        self.mean = self.mean + t / self.nobs
+        self.ssqdm = self.ssqdm + (value - prev_mean) * (value - self.mean)
+
+    def _remove(self, value: float) -> None:
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean - self.comp_remove
+            y = value - self.comp_remove
+            t = y - self.mean
+            self.comp_remove = t + self.mean - y
+            self.mean = self.mean - t / self.nobs
+            self.ssqdm = self.ssqdm - (value - prev_mean) * (value - self.mean)
+        else:
+            self.mean = self.ssqdm = 0.0
+
+    def update(self, close: float) -> float:
+        """
+        Adds a close and returns the rolling std (NaN during the warm-up).
+        """
+        if self.prev_value is None:
+            self.prev_value = close
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(close)
+        self._add(close)
+
+        if self.nobs < self.window or self.nobs < 2:
+            return np.nan
+        if self.n_same >= self.nobs:
+            return 0.0
+        variance = self.ssqdm / (self.nobs - 1)
+        return np.sqrt(variance) if variance >= 0 else 0.0
+
+
+@dataclass
+class LiveBar:
+    """
+    Output of `LiveStrategy.update` for one bar.
+
+    Attributes:
+    bar : int
+        Index of the bar since the strategy started.
+    close : float
+        Close price of the bar.
+    rsi, momentum, volatility : float
+        Indicator values (NaN during the warm-up).
+    ready : bool
+        True once RSI and Momentum are warmed up (the bars `backtest` keeps after `dropna`).
+    buy, sell : bool
+        Entry signals of the bar.
+    fills : list of dict
+        Orders executed on the bar ('action', 'side', 'price', 'n_shares', and 'profit' on closes).
+    value : float
+        Portfolio value after the bar.
+    date : object, optional
+        Timestamp passed with the bar.
+    """
+    bar: int
+    close: float
+    rsi: float
+    momentum: float
+    volatility: float
+    ready: bool
+    buy: bool
+    sell: bool
+    fills: list = field(default_factory=list)
+    value: float = None
+    date: object = None
+
+
+class LiveStrategy:
+    """
+    Stateful version of `backtest` for bars arriving one at a time.
+
+    Keeps the RSI, ROC and rolling-std state, the open `Position`, cash and
+    streaming metrics, so each `update` is O(1) regardless of the history
+    length. The trading rules and arithmetic are the ones of the 'numpy'
+    backtest engine, so replaying a dataset (see `replay`) reproduces `backtest`.
+
+    With the 'full' volatility mode the filter compares each bar against a
+    fixed `vol_threshold`: `backtest` uses the quantile of the whole sample,
+    which is not known while trading live, so it is calibrated beforehand
+    (e.g. on past data with `calibrate_threshold`). The causal 'expanding' and
+    'rolling' modes update their quantile with every bar instead.
+    """
+
+    def __init__(self, trial_or_params, vol_threshold: float = None, initial_cash: float = None,
+                 periods_per_year: float = None):
+        """
+        Parameters
+        ----------
+        trial_or_params : optuna.trial.Trial or dict
+            Optuna trial or hyperparameter dict.
+        vol_threshold : float, optional
+            Rolling-std level below which the market counts as low volatility
+            (required by the 'full' volatility mode, ignored by the causal modes).
+        initial_cash : float, optional
+            Starting cash (default: `BacktestingCapCOM.initial_capital`).
+        periods_per_year : float, optional
+            Bars per year used to annualize the metrics (default:
+            `BacktestingCapCOM.periods_per_year`).
+        """
+        self.params = trial_or_params if isinstance(
+            trial_or_params, dict) else hyperparams(trial_or_params)
+        self.vol_threshold = vol_threshold
+        self.cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
+
+        self._rsi = IncrementalRSI(self.params["rsi_window"])
+        self._roc = IncrementalROC(self.params["momentum_window"])
+        self._std = IncrementalStd(self.params["volatility_window"])
+
+        mode, quantile_window = volatility_mode(self.params)
+        q = self.params["volatility_quantile"]
+        if mode == "full":
+            if vol_threshold is None:
+                raise ValueError("The 'full' volatility mode needs a vol_threshold")
+            self._quantile = None
+        elif mode == "expanding":
+            self._quantile = ExpandingQuantile(q)
+        elif mode == "rolling":
+            self._quantile = RollingQuantile(q, quantile_window)
+        else:
+            raise ValueError(f"Unknown quantile mode: {mode!r}")
+
+        self.side = 0                  # 0 flat, 1 long, -1 short
+        self.position = None           # open Position
+        self.closed_positions = []
+        self.n_bars = 0
+        self.last_price = None
+        self.value = self.cash
+        self.stream = StreamingMetrics(periods_per_year=periods_per_year)
+        self.stream.update(self.cash)
+
+    @staticmethod
+    def calibrate_threshold(data: pd.DataFrame, trial_or_params) -> float:
+        """
+        Volatility threshold `backtest` would use on `data` (quantile of its rolling std).
+        """
+        params = trial_or_params if isinstance(
+            trial_or_params, dict) else hyperparams(trial_or_params)
+        vol = Indicadores.volatility(data.reset_index(drop=True), params["volatility_window"])
+        return vol.quantile(params["volatility_quantile"])
+
+    def warmup(self, closes) -> None:
+        """
+        Feeds past closes to the indicators without trading.
+        """
+        for close in closes:
+            close = float(close)
+            self._rsi.update(close)
+            self._roc.update(close)
+            self._update_threshold(self._std.update(close))
+
+    def _update_threshold(self, vol: float) -> float:
+        """
+        Feeds the volatility to the causal quantile (if any) and returns the current threshold.
+        """
+        if self._quantile is not None:
+            self.vol_threshold = self._quantile.update(vol)
+        return self.vol_threshold
+
+    def update(self, close: float, date=None) -> LiveBar:
+        """
+        Processes one closed bar: updates the indicators, applies SL/TP exits
+        and entries, and returns the signals, fills and portfolio value.
+        """
+        price = float(close)
+        rsi = self._rsi.update(price)
+        momentum = self._roc.update(price)
+        vol = self._std.update(price)
+        vol_threshold = self._update_threshold(vol)
+        bar = LiveBar(bar=self.n_bars, close=price, rsi=rsi, momentum=momentum,
+                      volatility=vol, ready=not (np.isnan(rsi) or np.isnan(momentum)),
+                      buy=False, sell=False, date=date)
+        self.n_bars += 1
+
+        if not bar.ready:
+            bar.value = self.value
+            return bar
+
+        # --- Signals (2/3 + low-vol filter) ---
+        p = self.params
+        low_vol = vol < vol_threshold
+        bar.buy = bool(((rsi < p["rsi_lower"]) + 2 * (momentum > p["momentum_threshold"]) >= 2)
+                       and low_vol)
+        bar.sell = bool(((rsi > p["rsi_upper"]) + 2 * (momentum < -p["momentum_threshold"]) >= 2)
+                        and low_vol)
+
+        COM = BacktestingCapCOM.COM
+        n_shares = (self.cash * p["capital_pct_exp"]) / price
+
+        # --- Close position on SL/TP ---
+        pos = self.position
+        if self.side == 1 and (price >= pos.tp or price <= pos.sl):
+            self.cash += price * pos.n_shares * (1 - COM)
+            self._close(bar, price, (price - pos.price) * pos.n_shares)
+        elif self.side == -1 and (price <= pos.tp or price >= pos.sl):
+            pnl = (pos.price - price) * pos.n_shares * (1 - COM)
+            self.cash += (pos.price * pos.n_shares) * (1 + COM) + pnl
+            self._close(bar, price, pnl)
+
+        # --- Open position ---
+        if self.side == 0 and (bar.buy or bar.sell) and self.cash > price * n_shares * (1 + COM):
+            self.cash -= price * n_shares * (1 + COM)
+            if bar.buy:
+                self.side = 1
+                sl, tp = price * (1 - p["stop_loss"]), price * (1 + p["take_profit"])
+            else:
+                self.side = -1
+                sl, tp = price * (1 + p["stop_loss"]), price * (1 - p["take_profit"])
+            self.position = Position(n_shares=n_shares, price=price, sl=sl, tp=tp)
+            bar.fills.append({"action": "open", "side": "long" if self.side == 1 else "short",
+                              "price": price, "n_shares": n_shares})
+
+        # --- Portfolio value ---
+        self.value = self._mark(price)
+        self.last_price = price
+        self.stream.update(self.value)
+        bar.value = self.value
+        return bar
+
+    def _mark(self, price: float) -> float:
+        """
+        Portfolio value at `price`, as computed by the backtest engines.
+        """
+        pos = self.position
+        if self.side == 1:
+            return self.cash + price * pos.n_shares
+        if self.side == -1:
+            return self.cash + ((pos.price * pos.n_shares) + (pos.price - price) * pos.n_shares)
+        return self.cash
+
+    def _close(self, bar: LiveBar, price: float, profit: float) -> None:
+        pos = self.position
+        pos.profit, pos.exit_price = profit, price
+        self.closed_positions.append(pos)
+        self.stream.add_trade(profit)
+        bar.fills.append({"action": "close", "side": "long" if self.side == 1 else "short",
+                          "price": price, "n_shares": pos.n_shares, "profit": profit})
+        self.side, self.position = 0, None
+
+    def close_all(self) -> float:
+        """
+        Closes the open position at the last price (as `backtest` does at the end) and returns the cash.
+        """
+        if self.side == 0:
+            return self.cash
+        COM = BacktestingCapCOM.COM
+        price, pos = self.last_price, self.position
+        bar = LiveBar(bar=self.n_bars - 1, close=price, rsi=np.nan, momentum=np.nan,
+                      volatility=np.nan, ready=True, buy=False, sell=False)
+        if self.side == 1:
+            self.cash += price * pos.n_shares * (1 - COM)
+            self._close(bar, price, (price - pos.price) * pos.n_shares)
+        else:
+            pnl = (pos.price - price) * pos.n_shares * (1 - COM)
+            self.cash += (pos.price * pos.n_shares) * (1 + COM) + pnl
+            self._close(bar, price, pnl)
+        return self.cash
+
+    def metrics(self) -> dict:
+        """
+        Metrics of the bars processed so far, in the format of `backtest`.
+        """
+        return build_metrics_dict(self.stream, self.stream.initial_value,
+                                  self.stream.final_value, self.stream.win_rate, self.cash)
+
+
+def replay(data: pd.DataFrame, trial_or_params, initial_cash: float = None,
+           periods_per_year: float = None) -> tuple[list, dict, float]:
+    """
+    Feeds a dataset bar by bar to a `LiveStrategy` (in the 'full' volatility
+    mode with the threshold calibrated on the same data) and closes the last
+    position, for comparison with `backtest`.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Price data containing a 'Close' column.
+    trial_or_params : optuna.trial.Trial or dict
+        Optuna trial or hyperparameter dict.
+    initial_cash : float, optional
+        Starting cash (default: `BacktestingCapCOM.initial_capital`).
+    periods_per_year : float, optional
+        Bars per year used to annualize the metrics (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    tuple
+        port_value, metrics_dict, cash, in the format of `backtest`.
+    """
+    params = trial_or_params if isinstance(
+        trial_or_params, dict) else hyperparams(trial_or_params)
+    vol_threshold = None
+    if volatility_mode(params)[0] == "full":
+        vol_threshold = LiveStrategy.calibrate_threshold(data, params)
+    strategy = LiveStrategy(params, vol_threshold, initial_cash, periods_per_year)
+    port_value = [strategy.cash]
+    for close in data["Close"].to_numpy(dtype=float):
+        bar = strategy.update(close)
+        if bar.ready:
+            port_value.append(bar.value)
+    strategy.close_all()
+    return port_value, strategy.metrics(), strategy.cash
@@ -0,0 +1,144 @@
+from libraries import *
+import json
+import time
+
+
+def _cache_dir(file_path: str) -> str:
+    """
+    Folder holding the columnar cache of a CSV file (next to the file).
+    """
+    return os.path.splitext(file_path)[0] + ".cache"
+
+
+def _source_stamp(file_path: str) -> dict:
+    """
+    Size and modification time of the source file, used to invalidate the cache.
+    """
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_prices_csv(file_path: str) -> pd.DataFrame:
+    """
+    Reads the Binance CSV the way `main.py` always has: drop missing values,
+    reverse to chronological order and reset the index.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the CSV file.
+
+    Returns
+    -------
+    pd.DataFrame
+        Chronologically ordered price data.
+    """
+    data = pd.read_csv(file_path).dropna()
+    return data.iloc[::-1].reset_index(drop=True)
+
+
+def build_cache(file_path: str, cache_dir: str = None) -> str:
+    """
+    Converts the CSV once into typed `.npy` columns ('Date' parsed to datetime64)
+    plus a `meta.json` describing the columns and the source file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the CSV file.
+    cache_dir : str, optional
+        Destination folder (default: `<csv name>.cache` next to the file).
+
+    Returns
+    -------
+    str
+        The cache folder.
+    """
+    cache_dir = _cache_dir(file_path) if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+
+    data = read_prices_csv(file_path)
+    if "Date" in data.columns:
+        data["Date"] = pd.to_datetime(data["Date"], format="mixed")
+
+    columns = []
+    for k, column in enumerate(data.columns):
+        values = data[column].to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        np.save(os.path.join(cache_dir, f"{k}.npy"), values)
+        columns.append(column)
+
+    # meta.json is written last: a cache without it is treated as missing
+    meta = {"source": _source_stamp(file_path), "columns": columns}
+    with open(os.path.join(cache_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return cache_dir
+
+
+def load_prices(file_path: str, cache_dir: str = None) -> pd.DataFrame:
+    """
+    Loads chronologically ordered price data, memory-mapping the columnar cache.
+
+    The cache is (re)built from the CSV when it is missing or when the CSV's
+    size or modification time changed since it was written.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the CSV file.
+    cache_dir : str, optional
+        Cache folder (default: `<csv name>.cache` next to the file).
+
+    Returns
+    -------
+    pd.DataFrame
+        Price data; numeric and datetime columns are read-only memmaps.
+    """
+    cache_dir = _cache_dir(file_path) if cache_dir is None else cache_dir
+    meta_path = os.path.join(cache_dir, "meta.json")
+
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if meta is None or meta["source"] != _source_stamp(file_path):
+        build_cache(file_path, cache_dir)
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    columns = {column: np.load(os.path.join(cache_dir, f"{k}.npy"), mmap_mode="r")
+               for k, column in enumerate(meta["columns"])}
+    return pd.DataFrame(columns, copy=False)
+
+
+def compare_load_times(file_path: str, repeat: int = 3) -> dict:
+    """
+    Reports the best load time of the CSV path against the columnar cache.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the CSV file.
+    repeat : int
+        Timed runs per path.
+
+    Returns
+    -------
+    dict
+        csv_seconds, cache_seconds and speedup.
+    """
+    load_prices(file_path)  # make sure the cache exists
+
+    def best(load) -> float:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            load(file_path)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    csv_seconds = best(read_prices_csv)
+    cache_seconds = best(load_prices)
+    return {"csv_seconds": csv_seconds, "cache_seconds": cache_seconds,
+            "speedup": csv_seconds / cache_seconds}
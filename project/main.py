@@ -8,9 +8,16 @@ custom backtesting logic.
 Modules imported:
     - libraries: common dependencies (pandas, numpy, etc.)
     - backtesting: core backtest function
+    - cache: price-series fingerprint used to name the persisted study
+    - hyperparams: hyperparameter search space
     - optimizer: Optuna optimization handler
-    - functions: dataset splitting and helper classes
-    - plot: visualization and reporting utilities
+    - functions: dataset splitting and configuration classes
+    - precompute: optional memory-mapped indicator grids
+    - loader: cached CSV price loading
+    - report: headless report images
+    - robustness: Monte Carlo confidence intervals of the metrics
+    - metrics: bar frequency used to annualize the metrics
+    - visualization: interactive plots, tables and printed results
 
 The process includes:
     1. Loading and preprocessing market data.
@@ -18,54 +25,127 @@ The process includes:
     3. Hyperparameter optimization on the training set.
     4. Backtesting on train, test, and validation datasets.
     5. Generating metrics, tables, and plots for analysis.
+    6. Optional Monte Carlo robustness of the best parameters on the test set (--robustness).
 """
 
 from libraries import *
+import argparse
+import hashlib
+import json
+from dataclasses import asdict
 from backtesting import backtest
+from cache import fingerprint
+from hyperparams import search_space
 from optimizer import optimize_hyperparams
 from functions import dateset_split, BacktestingCapCOM, OptunaOpt
-from visualization import (plot_portfolio, plot_test_validation,
-                           print_best_hyperparams, print_metricas, tables)
+from precompute import precompute_indicators
+from loader import load_prices
+from report import render_report
+from robustness import robustness_analysis
+from metrics import infer_periods_per_year
+from visualization import (plot_portfolio, plot_test_validation, print_best_hyperparams,
+                           print_metricas, print_robustness, tables)
 
-# --- Load Data ---
 base_dir = os.path.dirname(__file__)
 file_path = os.path.join(base_dir, "Binance_BTCUSDT_1h.csv")
 
-# Read CSV, drop missing values, reverse to chronological order
-data = pd.read_csv(file_path).copy().dropna()
-data = data.iloc[::-1].reset_index(drop=True)
+# Optimization metric to guide Optuna
+optimization_metric = "Calmar"  # Options: 'Sharpe', 'Sortino', 'Calmar'
 
-# --- Dataset Split ---
-train, test, validation = dateset_split(data, 0.6, 0.2, 0.2)
+# Report images go to an untracked folder (plot/ holds the README figures)
+report_dir = os.path.join(base_dir, "report")
 
-train_dates = train["Date"].reset_index(drop=True)
-test_dates = test["Date"].reset_index(drop=True)
-valid_dates = validation["Date"].reset_index(drop=True)
+# Matplotlib backends that only write files: plt.show() would do nothing
+non_interactive_backends = {"agg", "cairo", "pdf", "pgf", "ps", "svg", "template"}
 
-# Concatenar TEST + VALIDATION para tablas y plots combinados
-test_val_dates_aligned = pd.concat(
-    [test_dates, valid_dates]).reset_index(drop=True)
 
-# Optimization metric to guide Optuna
-optimization_metric = "Calmar"  # Options: 'Sharpe', 'Sortino', 'Calmar'
+def load_splits(file_path: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.Series, float]:
+    """
+    Loads the price data and splits it into train, test and validation sets.
+
+    Returns:
+        tuple: train, test and validation DataFrames, the combined TEST + VALIDATION dates
+        and the bars per year of the data (to annualize the metrics).
+    """
+    # Read CSV (cached as typed columns), drop missing values, chronological order
+    data = load_prices(file_path)
+
+    # Annualize metrics with the bar frequency of the data (hourly, 24/7)
+    periods_per_year = infer_periods_per_year(data["Date"])
+
+    # --- Dataset Split ---
+    train, test, validation = dateset_split(data, 0.6, 0.2, 0.2)
+
+    test_dates = test["Date"].reset_index(drop=True)
+    valid_dates = validation["Date"].reset_index(drop=True)
+
+    # Concatenar TEST + VALIDATION para tablas y plots combinados
+    test_val_dates_aligned = pd.concat(
+        [test_dates, valid_dates]).reset_index(drop=True)
+
+    return train, test, validation, test_val_dates_aligned, periods_per_year
 
 
-def main():
+def train_study_name(train: pd.DataFrame, metric: str, backtest_config: BacktestingCapCOM,
+                     optuna_config: OptunaOpt) -> str:
+    """
+    Name of the persisted training study, derived from what its trial values depend on.
+
+    The name hashes the training prices, the search space, the backtest settings and the
+    cross-validation splits, so a rerun on the same inputs resumes its study while new
+    data or a changed search space starts a fresh one instead of reusing stale trials.
+
+    Returns:
+        str: '<metric>-train-<data fingerprint>-<settings hash>'.
+    """
+    settings = {"search_space": search_space,
+                "backtest": asdict(backtest_config),
+                "n_splits": optuna_config.n_splits}
+    digest = hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(), digest_size=4)
+    return f"{metric}-train-{fingerprint(train['Close'])[:12]}-{digest.hexdigest()}"
+
+
+def main(headless: bool = None, robustness_paths: int = 0):
     """
     Executes the full trading strategy pipeline:
     optimization, backtesting, and performance visualization.
 
+    Parameters:
+        headless (bool, optional): Skip the interactive plots and tables and only write the
+            report images to `report_dir`. None detects it from the Matplotlib backend.
+        robustness_paths (int, optional): Monte Carlo paths of the robustness analysis on the
+            test set (0 skips it; it backtests every path, e.g. 1000 for stable intervals).
+
     Steps:
+        0. Load the data and split it into train, test and validation sets.
         1. Configure backtesting and optimization parameters.
         2. Run Optuna optimization on the training dataset.
         3. Retrieve and print the best hyperparameters.
         4. Execute backtests on train, test, and validation splits.
         5. Generate performance metrics, portfolio plots, and result tables.
+        6. Optionally, confidence intervals of the metrics over bootstrapped prices,
+           shuffled trades and perturbed parameters on the test set.
     """
 
+    if headless is None:
+        headless = plt.get_backend().lower() in non_interactive_backends
+
+    # --- DATA (loaded here, not at import, so importing main stays cheap) ---
+    train, test, validation, test_val_dates_aligned, periods_per_year = load_splits(file_path)
+
     # --- CONFIG ---
-    backtest_config = BacktestingCapCOM()
-    optimizacion_config = OptunaOpt()
+    # The bar frequency travels in the config (and from there to the worker processes)
+    backtest_config = BacktestingCapCOM(periods_per_year=periods_per_year)
+    # Trials persist in a journal file: rerunning on the same data and search space resumes
+    # the study instead of starting over
+    optimizacion_config = OptunaOpt(storage=os.path.join(base_dir, "optuna.log"))
+    optimizacion_config.study_name = train_study_name(train, optimization_metric,
+                                                      backtest_config, optimizacion_config)
+
+    # --- PRECOMPUTE INDICATORS (optional) ---
+    if optimizacion_config.precompute:
+        for split in (train, test, validation):
+            precompute_indicators(split, optimizacion_config.precompute_dir)
 
     # --- OPTUNA TRAIN ---
     study = optimize_hyperparams(
@@ -78,31 +158,60 @@ def main():
 
     # --- BACKTEST TRAIN ---
     port_value_train, metrics_train, final_cash_train = backtest(
-        train, best_params)
+        train, best_params, periods_per_year=periods_per_year)
     print_metricas(metrics_train, name="TRAIN")
-    plot_portfolio(port_value_train, final_cash_train, name="TRAIN")
+    if not headless:
+        plot_portfolio(port_value_train, final_cash_train, name="TRAIN")
 
     # --- BACKTEST TEST ---
     port_value_test, metrics_test, final_cash_test = backtest(
-        test, best_params)
+        test, best_params, periods_per_year=periods_per_year)
     print_metricas(metrics_test, name="TEST")
-    plot_portfolio(port_value_test, final_cash_test, name="TEST")
+    if not headless:
+        plot_portfolio(port_value_test, final_cash_test, name="TEST")
 
     # --- BACKTEST VALIDATION ---
     port_value_val, metrics_val, final_cash_val = backtest(
-        validation, best_params, initial_cash=final_cash_test
+        validation, best_params, initial_cash=final_cash_test,
+        periods_per_year=periods_per_year
     )
     print_metricas(metrics_val, name="VALIDATION")
-    plot_portfolio(port_value_val, final_cash_val, name="VALIDATION")
+    if not headless:
+        plot_portfolio(port_value_val, final_cash_val, name="VALIDATION")
+
+    # --- ROBUSTNESS (optional Monte Carlo scenarios on the test set) ---
+    if robustness_paths:
+        robustness = robustness_analysis(test, best_params, n_paths=robustness_paths,
+                                         n_workers=-1, periods_per_year=periods_per_year)
+        print_robustness(robustness.intervals, name="TEST")
 
     # --- TABLES ---
     monthly_df, quarterly_df, annual_df = tables(
-        port_value_test, port_value_val, test_val_dates_aligned, name="TEST+VALIDATION"
+        port_value_test, port_value_val, test_val_dates_aligned, name="TEST+VALIDATION",
+        show=not headless
     )
 
     # --- TEST + VALIDATION PLOT ---
-    plot_test_validation(port_value_test, port_value_val)
+    if not headless:
+        plot_test_validation(port_value_test, port_value_val)
+
+    # --- HEADLESS REPORT (image files in report/) ---
+    render_report(
+        report_dir,
+        curves={"TRAIN": (port_value_train, final_cash_train),
+                "TEST": (port_value_test, final_cash_test),
+                "VALIDATION": (port_value_val, final_cash_val)},
+        test_validation=(port_value_test, port_value_val),
+        period_tables={"Monthly": monthly_df, "Quarterly": quarterly_df, "Annual": annual_df},
+        n_workers=-1,
+    )
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Optimize, backtest and report the strategy.")
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="skip the interactive plots and only write the report images")
+    parser.add_argument("--robustness", type=int, default=0, metavar="N_PATHS",
+                        help="run the Monte Carlo robustness analysis with N_PATHS paths")
+    args = parser.parse_args()
+    main(headless=args.headless, robustness_paths=args.robustness)
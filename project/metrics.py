@@ -1,12 +1,61 @@
 from libraries import *
+from functions import BacktestingCapCOM
+
+# Sessions per year of exchange calendars (NYSE-like)
+trading_days_per_year = 252
+
+
+def infer_periods_per_year(dates, calendar: str = "auto") -> float:
+    """
+    Infers the number of bars per year from the bar timestamps.
+
+    Parameters
+    ----------
+    dates : array-like
+        Bar timestamps (e.g. the 'Date' column).
+    calendar : str
+        '24/7' (continuous trading, e.g. crypto: one year = 365 days of the median
+        bar spacing), 'exchange' (sessions only: `trading_days_per_year` times the
+        median number of bars per session) or 'auto' (24/7 when there are weekend
+        bars, exchange otherwise).
+
+    Returns
+    -------
+    float
+        Bars per year (8760 for hourly 24/7 bars, 252 for daily sessions,
+        19656 for 5-minute bars of a 6.5-hour session).
+    """
+    dates = pd.Series(pd.to_datetime(np.asarray(dates))).dropna()
+    if len(dates) < 2:
+        raise ValueError("At least two timestamps are needed to infer the bar frequency")
+    step = dates.diff().median()
+    if step <= pd.Timedelta(0):
+        raise ValueError("Timestamps must be increasing to infer the bar frequency")
+
+    if calendar == "auto":
+        calendar = "24/7" if (dates.dt.dayofweek >= 5).any() else "exchange"
+    if calendar == "24/7":
+        return pd.Timedelta(days=365) / step
+    if calendar == "exchange":
+        if step >= pd.Timedelta(days=2):
+            # Weekly or monthly bars: calendar time per bar
+            return pd.Timedelta(days=365.25) / step
+        bars_per_session = dates.dt.normalize().value_counts().median()
+        return trading_days_per_year * float(bars_per_session)
+    raise ValueError(f"Unknown calendar: {calendar!r}")
 
 
 class Metrics:
-    def __init__(self, data: pd.Series):
+    def __init__(self, data: pd.Series, periods_per_year: float = None):
         """
         Initializes the Metrics class with historical data.
+
+        periods_per_year: bars per year used to annualize the ratios
+        (default: `BacktestingCapCOM.periods_per_year`, hourly 24/7 bars).
         """
         self.data = data
+        self.periods_per_year = BacktestingCapCOM.periods_per_year \
+            if periods_per_year is None else periods_per_year
         self.returns = data.pct_change(fill_method=None).dropna(
         ) if not data.empty else pd.Series(dtype=float)
 
@@ -21,10 +70,10 @@ class Metrics:
             return 0.0
         mean_ret = self.returns.mean()  # Average return per period
         std_ret = self.returns.std()    # Standard deviation per period
-        # Annualized mean (assuming hourly data)
-        annual_mean = mean_ret * (365 * 24)
+        # Annualized mean
+        annual_mean = mean_ret * self.periods_per_year
         # Annualized standard deviation
-        annual_std = std_ret * np.sqrt(365 * 24)
+        annual_std = std_ret * np.sqrt(self.periods_per_year)
         return annual_mean / annual_std if annual_std > 0 else 0.0
 
     @property
@@ -39,8 +88,8 @@ class Metrics:
         mean_ret = self.returns.mean()                     # Average return
         # Std deviation of negative returns
         downside_std = np.minimum(self.returns, 0).std()
-        annual_mean = mean_ret * (365 * 24)               # Annualized mean
-        annual_downside_std = downside_std * np.sqrt(365 * 24)
+        annual_mean = mean_ret * self.periods_per_year     # Annualized mean
+        annual_downside_std = downside_std * np.sqrt(self.periods_per_year)
         return annual_mean / annual_downside_std if annual_downside_std > 0 else 0.0
 
     @property
@@ -65,7 +114,7 @@ class Metrics:
         """
         if self.returns.empty:
             return 0.0
-        annual_mean = self.returns.mean() * (365 * 24)   # Annualized return
+        annual_mean = self.returns.mean() * self.periods_per_year   # Annualized return
         max_dd = self.max_drawdown                        # Maximum drawdown
         return annual_mean / max_dd if max_dd > 0 else 0.0
 
@@ -73,11 +122,254 @@ class Metrics:
     def win_rate(closed_positions) -> float:
         """
         Calculates the proportion of winning trades.
-        closed_positions: list of closed positions with a 'profit' attribute.
+        closed_positions: list of closed positions with a 'profit' attribute,
+        or a `PositionBook` structured array with a 'profit' field.
         """
-        if not closed_positions:
+        if len(closed_positions) == 0:
             return 0.0
+        if isinstance(closed_positions, np.ndarray):
+            return int(np.count_nonzero(closed_positions["profit"] > 0)) / len(closed_positions)
         n_wins = sum(
             1 for pos in closed_positions if pos.profit is not None and pos.profit > 0)
         # Percentage of profitable trades
         return n_wins / len(closed_positions)
+
+    @staticmethod
+    def batch(curves: np.ndarray, periods_per_year: float = None,
+              chunk_values: int = 2 ** 24) -> dict:
+        """
+        Sharpe, Sortino, Calmar and maximum drawdown of many equity curves at once.
+
+        Each row is treated like `Metrics(pd.Series(row).replace(0, np.nan).dropna())`:
+        NaN and zero values are skipped and returns are taken between consecutive
+        remaining values, so curves of different lengths can be NaN-padded into
+        one matrix. Rows are processed in blocks of about `chunk_values` values to
+        bound the temporaries. Results match `Metrics` up to floating-point
+        summation order.
+
+        Parameters
+        ----------
+        curves : np.ndarray
+            Portfolio values, shape (curves x bars) (a 1-D array is one curve).
+        periods_per_year : float, optional
+            Bars per year (default: `BacktestingCapCOM.periods_per_year`).
+        chunk_values : int
+            Approximate number of matrix values processed per block.
+
+        Returns
+        -------
+        dict
+            'Calmar', 'Sharpe', 'Sortino' and 'Maximum Drawdown' -> np.ndarray (one value per curve).
+        """
+        periods_per_year = BacktestingCapCOM.periods_per_year \
+            if periods_per_year is None else periods_per_year
+        curves = np.atleast_2d(np.asarray(curves, dtype=float))
+        n_curves, n_bars = curves.shape
+        out = {name: np.zeros(n_curves) for name in
+               ("Calmar", "Sharpe", "Sortino", "Maximum Drawdown")}
+        if n_bars == 0:
+            return out
+
+        step = max(1, chunk_values // n_bars)
+        positions = np.arange(n_bars)
+        with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for start in range(0, n_curves, step):
+                rows = slice(start, start + step)
+                x = curves[rows]
+                kept = (x != 0) & ~np.isnan(x)
+
+                # Previous kept value of every bar (pct_change over the kept values)
+                last = np.maximum.accumulate(np.where(kept, positions, -1), axis=1)
+                prev = np.empty_like(last)
+                prev[:, 0] = -1
+                prev[:, 1:] = last[:, :-1]
+                has_prev = kept & (prev >= 0)
+                prev_value = np.take_along_axis(x, np.maximum(prev, 0), axis=1)
+                returns = np.where(has_prev, x / prev_value - 1, np.nan)
+
+                n = has_prev.sum(axis=1)
+                annual_mean = np.nanmean(returns, axis=1) * periods_per_year
+                annual_std = np.nanstd(returns, axis=1, ddof=1) * np.sqrt(periods_per_year)
+                annual_down = np.nanstd(np.minimum(returns, 0), axis=1, ddof=1) \
+                    * np.sqrt(periods_per_year)
+
+                values = np.where(kept, x, np.nan)
+                peaks = np.fmax.accumulate(values, axis=1)
+                max_dd = np.abs(np.nanmin((values - peaks) / peaks, axis=1))
+                max_dd = np.where(np.isnan(max_dd), 0.0, max_dd)
+
+                has_returns = n > 0
+                out["Sharpe"][rows] = np.where(
+                    has_returns & (annual_std > 0), annual_mean / annual_std, 0.0)
+                out["Sortino"][rows] = np.where(
+                    has_returns & (annual_down > 0), annual_mean / annual_down, 0.0)
+                out["Calmar"][rows] = np.where(
+                    has_returns & (max_dd > 0), annual_mean / max_dd, 0.0)
+                out["Maximum Drawdown"][rows] = max_dd
+        return out
+
+
+class StreamingMetrics:
+    """
+    Online version of `Metrics`: accumulates the portfolio value curve in chunks
+    (or bar by bar) without keeping it in memory.
+
+    Keeps running mean/variance of returns and of downside returns (Welford,
+    merged per chunk), the running peak and maximum drawdown, and trade win
+    counts. Zero values are skipped the same way `backtest` drops them before
+    building `Metrics`. Retaining the full curve is opt-in (`keep_curve`).
+    """
+
+    def __init__(self, keep_curve: bool = False, chunk_size: int = 4096, on_update=None,
+                 periods_per_year: float = None):
+        """
+        Parameters
+        ----------
+        keep_curve : bool
+            Keep every value in `self.curve` (default: False).
+        chunk_size : int
+            Number of values callers should buffer before calling `update`.
+        on_update : callable, optional
+            Called with the accumulator after every `update` (e.g., to report
+            intermediate values to Optuna).
+        periods_per_year : float, optional
+            Bars per year used to annualize the ratios (default:
+            `BacktestingCapCOM.periods_per_year`).
+        """
+        self.periods_per_year = BacktestingCapCOM.periods_per_year \
+            if periods_per_year is None else periods_per_year
+        self.chunk_size = chunk_size
+        self.on_update = on_update
+        self.n_updates = 0
+        self.curve = [] if keep_curve else None
+        self.n_values = 0
+        self.initial_value = None
+        self.final_value = None
+        self.last = None                 # last non-zero value
+        self.peak = -np.inf
+        self.max_dd = 0.0
+        self.n = 0                       # number of returns
+        self.mean, self._m2 = 0.0, 0.0
+        self.down_mean, self._down_m2 = 0.0, 0.0
+        self.n_trades, self.n_wins = 0, 0
+
+    def update(self, values) -> None:
+        """
+        Adds one value or a chunk of consecutive portfolio values.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size == 0:
+            return
+        if self.curve is not None:
+            self.curve.extend(values.tolist())
+        if self.initial_value is None:
+            self.initial_value = float(values[0])
+        self.final_value = float(values[-1])
+        self.n_values += values.size
+
+        kept = values[(values != 0) & ~np.isnan(values)]
+        if kept.size == 0:
+            return
+
+        # --- Returns (pct_change between consecutive kept values) ---
+        prev = kept if self.last is None else np.concatenate(([self.last], kept))
+        returns = prev[1:] / prev[:-1] - 1
+        if returns.size:
+            n_new = self.n + returns.size
+            self.mean, self._m2 = self._merge(
+                self.n, self.mean, self._m2, returns)
+            self.down_mean, self._down_m2 = self._merge(
+                self.n, self.down_mean, self._down_m2, np.minimum(returns, 0))
+            self.n = n_new
+        self.last = float(kept[-1])
+
+        # --- Drawdown from running peak ---
+        peaks = np.maximum(np.maximum.accumulate(kept), self.peak)
+        self.peak = float(peaks[-1])
+        self.max_dd = max(self.max_dd, float(abs(((kept - peaks) / peaks).min())))
+
+        self.n_updates += 1
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def get(self, metric: str) -> float:
+        """
+        Returns a metric by its `backtest` metrics_dict name (e.g., 'Calmar').
+        """
+        return {
+            "Calmar": self.calmar,
+            "Sharpe": self.sharpe,
+            "Sortino": self.sortino,
+            "Maximum Drawdown": self.max_drawdown,
+            "Win Rate": self.win_rate,
+        }.get(metric, 0.0)
+
+    def add_trade(self, profit: float) -> None:
+        """
+        Records a closed trade for the win rate.
+        """
+        self.n_trades += 1
+        self.n_wins += profit is not None and profit > 0
+
+    @staticmethod
+    def _merge(n: int, mean: float, m2: float, x: np.ndarray) -> tuple[float, float]:
+        """
+        Merges a chunk into running (mean, sum of squared deviations) (Chan et al.).
+        """
+        n_x = x.size
+        mean_x = x.mean()
+        m2_x = ((x - mean_x) ** 2).sum()
+        total = n + n_x
+        delta = mean_x - mean
+        return (mean + delta * n_x / total,
+                m2 + m2_x + delta ** 2 * n * n_x / total)
+
+    def _std(self, m2: float) -> float:
+        return np.sqrt(m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    @property
+    def sharpe(self) -> float:
+        """
+        Annualized Sharpe ratio, as in `Metrics.sharpe`.
+        """
+        if self.n == 0:
+            return 0.0
+        annual_mean = self.mean * self.periods_per_year
+        annual_std = self._std(self._m2) * np.sqrt(self.periods_per_year)
+        return annual_mean / annual_std if annual_std > 0 else 0.0
+
+    @property
+    def sortino(self) -> float:
+        """
+        Annualized Sortino ratio, as in `Metrics.sortino`.
+        """
+        if self.n == 0:
+            return 0.0
+        annual_mean = self.mean * self.periods_per_year
+        annual_downside_std = self._std(self._down_m2) * np.sqrt(self.periods_per_year)
+        return annual_mean / annual_downside_std if annual_downside_std > 0 else 0.0
+
+    @property
+    def max_drawdown(self) -> float:
+        """
+        Maximum drawdown from peak to trough, as in `Metrics.max_drawdown`.
+        """
+        return self.max_dd
+
+    @property
+    def calmar(self) -> float:
+        """
+        Calmar ratio, as in `Metrics.calmar`.
+        """
+        if self.n == 0:
+            return 0.0
+        annual_mean = self.mean * self.periods_per_year
+        return annual_mean / self.max_dd if self.max_dd > 0 else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        """
+        Proportion of winning trades, as in `Metrics.win_rate`.
+        """
+        return self.n_wins / self.n_trades if self.n_trades else 0.0
@@ -0,0 +1,96 @@
+from libraries import *
+from backtesting import backtest
+from metrics import StreamingMetrics
+from profiling import Profiler, stage
+from ledger import TradeLedger
+from functions import OptunaOpt
+
+
+def report_step(trial, value: float, step: int) -> None:
+    """
+    Reports an intermediate score to Optuna and abandons the trial if the pruner says so.
+
+    Parameters
+    ----------
+    trial : optuna.trial.Trial or dict
+        Trial being evaluated (fixed parameter dicts and frozen trials are ignored).
+    value : float
+        Intermediate score (e.g., mean metric of the folds evaluated so far).
+    step : int
+        Step index of the score.
+
+    Raises
+    ------
+    optuna.TrialPruned
+        If the study's pruner decides to stop the trial.
+    """
+    if not isinstance(trial, optuna.trial.Trial):
+        return
+    trial.report(value, step)
+    if trial.should_prune():
+        raise optuna.TrialPruned()
+
+
+def make_objective(data: pd.DataFrame, metric: str, optuna_config: OptunaOpt,
+                   periods_per_year: float = None):
+    """
+    Builds the Optuna objective: one full backtest of `data` per trial.
+
+    When the config enables a pruner, the running value of `metric` is reported
+    every `len(data) // n_splits` bars while the backtest runs (through
+    `StreamingMetrics`), so clearly bad trials stop early. The final value is
+    the same as without pruning.
+
+    With `optuna_config.profile` each trial is profiled ('trial' plus the
+    backtest stages) and the summary is stored in its user attr 'profile',
+    pruned trials included.
+
+    With `optuna_config.trade_ledger` the trades of every completed trial are
+    collected (tagged with the trial number) in `objective.ledger`; the caller
+    writes it once the study ends.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Training dataset.
+    metric : str
+        Metric to optimize (e.g., 'Calmar').
+    optuna_config : OptunaOpt
+        Optuna configuration (pruner, n_splits).
+    periods_per_year : float, optional
+        Bars per year used to annualize the metrics (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    callable
+        Objective taking an Optuna trial and returning the metric.
+    """
+    pruning = optuna_config.pruner not in (None, "none")
+    chunk_size = max(1, len(data) // optuna_config.n_splits)
+
+    ledger = TradeLedger() if optuna_config.trade_ledger is not None else None
+
+    def objective(trial) -> float:
+        profiler = Profiler(optuna_config.profile_memory) if optuna_config.profile else None
+        trial_ledger = None
+        if ledger is not None:
+            trial_ledger = TradeLedger({"trial": getattr(trial, "number", -1)})
+        stream = None
+        if pruning:
+            stream = StreamingMetrics(
+                chunk_size=chunk_size, periods_per_year=periods_per_year,
+                on_update=lambda acc: report_step(trial, acc.get(metric), acc.n_updates - 1))
+        try:
+            with stage(profiler, "trial"):
+                _, metrics_dict, _ = backtest(
+                    data, trial, keep_curve=False, stream=stream, profiler=profiler,
+                    ledger=trial_ledger, periods_per_year=periods_per_year)
+        finally:
+            if profiler is not None and isinstance(trial, optuna.trial.Trial):
+                trial.set_user_attr("profile", profiler.summary())
+        if trial_ledger is not None:
+            ledger.extend(trial_ledger)
+        return metrics_dict.get(metric, 0.0)
+
+    objective.ledger = ledger
+    return objective
@@ -0,0 +1,234 @@
+from libraries import *
+import time
+import tempfile
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from cache import indicator_cache
+from objective import make_objective
+from functions import OptunaOpt, get_pruner, get_storage, open_study, remaining_trials
+from precompute import precompute_indicators
+
+
+class SharedFrame:
+    """
+    Numeric columns of a DataFrame copied once into `multiprocessing.shared_memory`.
+
+    The parent process creates the block and passes the small `spec` dict to the
+    workers, which rebuild a DataFrame view over the same memory with `attach`
+    instead of receiving a pickled copy of the frame. Columns are stored as float64;
+    non-numeric columns (e.g. 'Date') are not shared.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        """
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Frame to share (its numeric columns).
+        """
+        numeric = data.select_dtypes("number")
+        values = numeric.to_numpy(dtype=float).T  # (columns x rows)
+
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(values.nbytes, 1))
+        shared = np.ndarray(values.shape, dtype=float, buffer=self._shm.buf)
+        shared[:] = values
+
+        self.spec = {"name": self._shm.name,
+                     "columns": list(numeric.columns),
+                     "shape": values.shape}
+
+    @staticmethod
+    def attach(spec: dict) -> tuple[pd.DataFrame, shared_memory.SharedMemory]:
+        """
+        Rebuilds the shared frame in a worker without copying the data.
+
+        Parameters
+        ----------
+        spec : dict
+            `SharedFrame.spec` of the parent.
+
+        Returns
+        -------
+        tuple
+            The DataFrame view and the SharedMemory handle (keep it alive while using the frame).
+        """
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        values = np.ndarray(spec["shape"], dtype=float, buffer=shm.buf)
+        data = pd.DataFrame(values.T, columns=spec["columns"], copy=False)
+        return data, shm
+
+    def close(self) -> None:
+        """
+        Releases and unlinks the shared memory block.
+        """
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def worker_count(n_jobs: int) -> int:
+    """
+    Maps Optuna-style `n_jobs` (-1 = all cores) to a number of worker processes.
+    """
+    return (os.cpu_count() or 1) if n_jobs == -1 else max(1, n_jobs)
+
+
+def _optimize_worker(spec: dict, study_name: str, storage: str, n_trials: int,
+                     metric: str, optuna_config: OptunaOpt, precompute_dir: str,
+                     worker: int, periods_per_year: float) -> dict:
+    """
+    Worker process: attaches the shared frame and the shared study and runs its share of trials.
+
+    A seeded configuration gives worker k the sampler seed `seed + k`, so the run is
+    reproducible without every worker proposing the same parameters.
+
+    Returns
+    -------
+    dict
+        Indicator cache statistics of the worker's own lookups (a forked worker
+        inherits the parent's counters, so they are counted from its start).
+    """
+    cache_start = indicator_cache.info()
+    data, shm = SharedFrame.attach(spec)
+    try:
+        if precompute_dir is not None:
+            precompute_indicators(data, precompute_dir)
+
+        seed = None if optuna_config.seed is None else optuna_config.seed + worker
+        study = optuna.load_study(study_name=study_name, storage=get_storage(storage),
+                                  sampler=optuna.samplers.TPESampler(seed=seed),
+                                  pruner=get_pruner(optuna_config))
+        objective = make_objective(data, metric, optuna_config, periods_per_year)
+        study.optimize(objective, n_trials=n_trials)
+        if objective.ledger is not None:
+            objective.ledger.write_parquet(optuna_config.trade_ledger)
+        return indicator_cache.info(since=cache_start)
+    finally:
+        del data
+        shm.close()
+
+
+def optimize_processes(data: pd.DataFrame, optuna_config: OptunaOpt, metric: str,
+                       n_workers: int = None, warm_start: list[dict] = None,
+                       periods_per_year: float = None) -> optuna.study.Study:
+    """
+    Runs the Optuna search on worker processes that share one study storage
+    (`optuna_config.storage`, or a temporary journal file) and read the price data
+    from shared memory.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Training dataset.
+    optuna_config : OptunaOpt
+        Optuna configuration; `n_jobs` sets the number of processes (-1 uses all cores).
+    metric : str
+        Metric to optimize (e.g., 'Calmar').
+    n_workers : int, optional
+        Overrides the number of processes derived from `optuna_config.n_jobs`.
+    warm_start : list of dict, optional
+        Parameter sets enqueued as the first trials of a new study.
+    periods_per_year : float, optional
+        Bars per year used to annualize the metrics, sent to every worker (default:
+        `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    optuna.study.Study
+        Study with the trials of all workers (the persistent study itself when
+        `optuna_config.storage` is set).
+
+    Raises
+    ------
+    ValueError
+        If `optuna_config.trade_ledger` is an existing file: every worker writes its
+        own part file, so the ledger must be a directory (created if missing).
+    """
+    if optuna_config.trade_ledger is not None:
+        if os.path.isfile(optuna_config.trade_ledger):
+            raise ValueError(f"trade_ledger must be a directory with the process executor "
+                             f"(one part file per worker), got the file "
+                             f"{optuna_config.trade_ledger!r}")
+        os.makedirs(optuna_config.trade_ledger, exist_ok=True)
+
+    precompute_dir = None
+    if optuna_config.precompute:
+        grid = precompute_indicators(data, optuna_config.precompute_dir)
+        precompute_dir = os.path.dirname(grid.path)
+
+    # Without persistent storage the workers share a temporary journal file
+    persistent = optuna_config.storage is not None
+    with nullcontext() if persistent else tempfile.TemporaryDirectory() as tmp_dir:
+        storage = optuna_config.storage if persistent else os.path.join(tmp_dir, "study.log")
+        study = open_study(optuna_config, storage, warm_start)
+
+        n_trials = remaining_trials(study, optuna_config.n_trials)
+        n_workers = worker_count(optuna_config.n_jobs) if n_workers is None else n_workers
+        n_workers = min(n_workers, n_trials)
+        shares = [n_trials // n_workers + (1 if k < n_trials % n_workers else 0)
+                  for k in range(n_workers)]
+
+        with SharedFrame(data.reset_index(drop=True)) as shared, \
+                ProcessPoolExecutor(max_workers=max(n_workers, 1)) as pool:
+            futures = [pool.submit(_optimize_worker, shared.spec, study.study_name,
+                                   storage, share, metric, optuna_config,
+                                   precompute_dir, worker, periods_per_year)
+                       for worker, share in enumerate(shares)]
+            caches = [f.result() for f in futures]
+
+        if persistent:
+            result = study
+        else:
+            # Copy the finished study into memory before the journal file is removed
+            result = optuna.create_study(direction=optuna_config.direction)
+            result.add_trials(study.trials)
+
+    hits = sum(c["hits"] for c in caches)
+    misses = sum(c["misses"] for c in caches)
+    result.set_user_attr("indicator_cache", {
+        "hits": hits, "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    })
+    return result
+
+
+def scaling_benchmark(data: pd.DataFrame, worker_counts: list[int] = (1, 2, 4, 8),
+                      n_trials: int = 32, metric: str = "Calmar") -> pd.DataFrame:
+    """
+    Measures the process executor's throughput for several worker counts.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Training dataset.
+    worker_counts : list of int
+        Numbers of worker processes to test.
+    n_trials : int
+        Trials per run.
+    metric : str
+        Metric to optimize.
+
+    Returns
+    -------
+    pd.DataFrame
+        Seconds, trials per minute and speedup over the first worker count.
+    """
+    rows = []
+    for n_workers in worker_counts:
+        config = OptunaOpt(n_trials=n_trials, show_progress_bar=False)
+        start = time.perf_counter()
+        optimize_processes(data, config, metric, n_workers=n_workers)
+        seconds = time.perf_counter() - start
+        rows.append({"workers": n_workers, "seconds": seconds,
+                     "trials_per_min": n_trials / seconds * 60})
+
+    table = pd.DataFrame(rows).set_index("workers")
+    table["speedup"] = table["seconds"].iloc[0] / table["seconds"]
+    return table
@@ -0,0 +1,156 @@
+from libraries import *
+import time
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from backtesting import backtest_panel
+from hyperparams import hyperparams
+from loader import load_prices
+from metrics import Metrics
+from parallel import SharedFrame, worker_count
+from functions import BacktestingCapCOM
+
+
+@dataclass
+class PortfolioResult:
+    """
+    Result of a multi-symbol backtest.
+
+    Attributes:
+    equity : pd.DataFrame
+        Portfolio value of each symbol per bar (held flat before its first and
+        after its last traded bar) plus a 'Total' column.
+    metrics : pd.DataFrame
+        Metrics of each symbol (one row per symbol) and of the total portfolio ('Total' row).
+    symbol_bars : int
+        Number of priced (symbol, bar) pairs evaluated.
+    seconds : float
+        Wall time of the backtests.
+    """
+    equity: pd.DataFrame
+    metrics: pd.DataFrame
+    symbol_bars: int
+    seconds: float
+
+    @property
+    def symbol_bars_per_sec(self) -> float:
+        """
+        Throughput in symbol-bars per second.
+        """
+        return self.symbol_bars / self.seconds if self.seconds > 0 else float("inf")
+
+
+def load_panel(file_paths: dict) -> pd.DataFrame:
+    """
+    Loads one Binance CSV per symbol and aligns their close prices on 'Date'.
+
+    Parameters
+    ----------
+    file_paths : dict
+        Symbol -> CSV path.
+
+    Returns
+    -------
+    pd.DataFrame
+        Close prices indexed by date, one column per symbol (NaN where a symbol has no bar).
+    """
+    closes = {symbol: load_prices(path).set_index("Date")["Close"]
+              for symbol, path in file_paths.items()}
+    return pd.DataFrame(closes).sort_index()
+
+
+def _panel_worker(spec: dict, columns: list, params: dict, cash: float,
+                  periods_per_year: float) -> tuple[np.ndarray, dict]:
+    """
+    Worker process: backtests a chunk of symbols of the shared panel.
+
+    Returns
+    -------
+    tuple
+        values (bars x symbols array) and the per-symbol results of `backtest_panel`.
+    """
+    panel, shm = SharedFrame.attach(spec)
+    try:
+        values, results = backtest_panel(panel[columns], params, initial_cash=cash,
+                                         periods_per_year=periods_per_year)
+        return values.to_numpy(), results
+    finally:
+        del panel
+        shm.close()
+
+
+def backtest_portfolio(panel: pd.DataFrame, trial_or_params, initial_cash: float = None,
+                       n_workers: int = 1, chunks_per_worker: int = 4,
+                       periods_per_year: float = None) -> PortfolioResult:
+    """
+    Runs the strategy on every symbol of a panel and aggregates the equity.
+
+    The capital is split equally between symbols. Symbols are backtested in
+    lockstep with `backtest_panel`; with several workers the panel is copied
+    once into shared memory and chunks of symbols are fanned out to a process
+    pool, so throughput grows with the number of cores.
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        Close prices, one column per symbol and one row per bar (see `load_panel`).
+    trial_or_params : optuna.trial.Trial or dict
+        Optuna trial or hyperparameter dict shared by all symbols.
+    initial_cash : float, optional
+        Total starting capital (default: `BacktestingCapCOM.initial_capital`).
+    n_workers : int
+        Worker processes (-1 uses all cores, 1 runs in-process).
+    chunks_per_worker : int
+        Symbol chunks submitted per worker, for load balancing.
+    periods_per_year : float, optional
+        Bars per year used to annualize the metrics (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    PortfolioResult
+        Per-symbol and total equity, metrics table and throughput.
+    """
+    params = trial_or_params if isinstance(
+        trial_or_params, dict) else hyperparams(trial_or_params)
+    total_cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
+    symbols = list(panel.columns)
+    cash = total_cash / len(symbols)
+
+    start = time.perf_counter()
+    n_workers = min(worker_count(n_workers), len(symbols))
+    if n_workers == 1:
+        values, results = backtest_panel(panel, params, initial_cash=cash,
+                                         periods_per_year=periods_per_year)
+    else:
+        chunks = [list(c) for c in np.array_split(symbols, n_workers * chunks_per_worker)
+                  if len(c)]
+        with SharedFrame(panel.reset_index(drop=True)) as shared, \
+                ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_panel_worker, shared.spec, chunk, params, cash,
+                                   periods_per_year)
+                       for chunk in chunks]
+            parts = [f.result() for f in futures]
+        values = pd.DataFrame(np.hstack([v for v, _ in parts]), index=panel.index,
+                              columns=[s for chunk in chunks for s in chunk])[symbols]
+        results = {s: r for _, part in parts for s, r in part.items()}
+    seconds = time.perf_counter() - start
+
+    # --- Aggregate equity (idle symbols hold their cash) ---
+    equity = values.ffill().fillna(cash)
+    equity["Total"] = equity[symbols].sum(axis=1)
+
+    # --- Metrics ---
+    rows = {symbol: results[symbol][1] for symbol in symbols}
+    total = equity["Total"].to_numpy()
+    final_cash = sum(results[symbol][2] for symbol in symbols)
+    metrics_obj = Metrics(pd.Series(np.concatenate([[total_cash], total])), periods_per_year)
+    rows["Total"] = {
+        "Calmar": metrics_obj.calmar,
+        "Sharpe": metrics_obj.sharpe,
+        "Sortino": metrics_obj.sortino,
+        "Maximum Drawdown": metrics_obj.max_drawdown,
+        "Total Return (%)": (final_cash - total_cash) / total_cash * 100,
+        "Final Capital ($)": f"${final_cash:,.2f}",
+    }
+    metrics = pd.DataFrame.from_dict(rows, orient="index")
+
+    return PortfolioResult(equity, metrics, int(panel.notna().to_numpy().sum()), seconds)
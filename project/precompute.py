@@ -0,0 +1,134 @@
+from libraries import *
+import json
+from cache import fingerprint, indicator_cache
+from hyperparams import window_range
+from indicators import Indicadores
+import kernels
+
+default_dir = os.path.join(os.path.dirname(__file__), "precomputed")
+
+# Indicators computed for all their windows in one call
+multi_window_kernels = {"rsi": kernels.rsi, "roc": kernels.roc}
+
+# Indicator name (as used by the cache) -> window hyperparameter
+grid_indicators = {
+    "rsi": "rsi_window",
+    "roc": "momentum_window",
+    "std": "volatility_window",
+}
+
+
+class IndicatorGrid:
+    """
+    Memory-mapped (rows x bars) tensor holding the RSI, ROC and rolling-std series
+    of one dataset for every window of the search space.
+
+    The tensor is stored as a single `.npy` file with a `.json` sidecar mapping
+    (indicator, window) to a row. Rows are read-only views of the memmap, so any
+    number of trials or worker processes share one physical copy of the data.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens an existing grid.
+
+        Parameters
+        ----------
+        path : str
+            Path of the `.npy` tensor.
+        """
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        self.path = path
+        self.fingerprint = meta["fingerprint"]
+        self.rows = {(indicator, window): row
+                     for indicator, window, row in meta["rows"]}
+        self.values = np.load(path, mmap_mode="r")
+
+    def get(self, indicator: str, window: int):
+        """
+        Returns the row for (indicator, window) as a zero-copy view, or None if not in the grid.
+        """
+        row = self.rows.get((indicator, window))
+        return None if row is None else self.values[row]
+
+    @classmethod
+    def build(cls, data: pd.DataFrame, path: str) -> "IndicatorGrid":
+        """
+        Computes every indicator series of the search space and writes the grid to disk.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Dataset split containing a 'Close' column.
+        path : str
+            Destination `.npy` path.
+
+        Returns
+        -------
+        IndicatorGrid
+            The grid opened in read-only memmap mode.
+        """
+        data = data.reset_index(drop=True)
+        n = len(data)
+
+        # Windows are keyed the way `Indicadores` clamps them
+        rows = []
+        for indicator, param in grid_indicators.items():
+            windows = window_range(param)
+            if indicator != "std":
+                windows = sorted({min(w, n - 1) for w in windows})
+            rows.extend((indicator, w) for w in windows)
+
+        tmp_path = path + ".tmp.npy"
+        tensor = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=float, shape=(len(rows), n))
+        close = data["Close"].to_numpy(dtype=float)
+        for indicator in grid_indicators:
+            idx = [row for row, (name, _) in enumerate(rows) if name == indicator]
+            if indicator in multi_window_kernels:
+                windows = [rows[row][1] for row in idx]
+                tensor[idx[0]:idx[-1] + 1] = multi_window_kernels[indicator](close, windows)
+            else:
+                for row in idx:
+                    tensor[row] = Indicadores.compute(
+                        indicator, data["Close"], rows[row][1]).to_numpy()
+        tensor.flush()
+        del tensor
+
+        meta = {"fingerprint": fingerprint(data["Close"]),
+                "rows": [[indicator, window, row] for row, (indicator, window) in enumerate(rows)]}
+        with open(path + ".json", "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+
+def precompute_indicators(data: pd.DataFrame, directory: str = None) -> IndicatorGrid:
+    """
+    Loads (or builds on first use) the indicator grid of a dataset split and attaches
+    it to `indicator_cache`, so `Indicadores` reads its series from the memmap.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Dataset split containing a 'Close' column.
+    directory : str, optional
+        Folder holding the grids, one `<fingerprint>.npy` per split (default: ./precomputed).
+
+    Returns
+    -------
+    IndicatorGrid
+        The attached grid.
+    """
+    directory = default_dir if directory is None else directory
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{fingerprint(data['Close'])}.npy")
+
+    if os.path.exists(path) and os.path.exists(path + ".json"):
+        grid = IndicatorGrid(path)
+    else:
+        grid = IndicatorGrid.build(data, path)
+
+    indicator_cache.attach(grid)
+    return grid
@@ -0,0 +1,144 @@
+from __future__ import annotations
+from libraries import *
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_disabled = nullcontext()
+
+
+class Profiler:
+    """
+    Collects wall time and allocations per named stage of a backtest or trial.
+
+    Each stage records its number of calls, wall time, net change in allocated
+    memory blocks (`sys.getallocatedblocks`) and, with `trace_memory=True`, the
+    peak of traced memory above the stage's starting point (`tracemalloc`).
+    Stages may be nested; their times then overlap.
+
+    One profiler is meant to be used by a single trial (thread). `tracemalloc`
+    is process wide, so peaks include allocations of concurrent threads.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        """
+        Parameters
+        ----------
+        trace_memory : bool
+            Record peak traced memory per stage (starts `tracemalloc` if needed; slower).
+        """
+        self.trace_memory = trace_memory
+        self.records = {}
+        self._stack = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _record(self, name: str) -> dict:
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = {"calls": 0, "seconds": 0.0,
+                                           "blocks": 0, "peak_bytes": 0}
+        return record
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager timing one execution of stage `name`.
+        """
+        frame = {"peak": 0, "current": 0}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["current"] = frame["peak"] = current
+        self._stack.append(frame)
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            blocks = sys.getallocatedblocks() - blocks
+            self._stack.pop()
+
+            record = self._record(name)
+            record["calls"] += 1
+            record["seconds"] += seconds
+            record["blocks"] += blocks
+            if self.trace_memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                record["peak_bytes"] = max(record["peak_bytes"], peak - frame["current"])
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        """
+        Adds time measured by the caller (for hot per-bar code where a context manager is too costly).
+        """
+        record = self._record(name)
+        record["calls"] += calls
+        record["seconds"] += seconds
+
+    def summary(self) -> dict:
+        """
+        Stage -> {calls, seconds, blocks, peak_bytes}, JSON serializable (used as trial user attr).
+        """
+        return {name: dict(record) for name, record in self.records.items()}
+
+    def table(self) -> pd.DataFrame:
+        """
+        Per-stage table of this profiler.
+        """
+        return _stage_table([self.summary()])
+
+
+def stage(profiler: Profiler, name: str):
+    """
+    `profiler.stage(name)`, or a shared no-op context when profiling is disabled (profiler is None).
+    """
+    return _disabled if profiler is None else profiler.stage(name)
+
+
+def _stage_table(summaries: list[dict]) -> pd.DataFrame:
+    """
+    Aggregates per-trial stage summaries into one row per stage.
+    """
+    rows = {}
+    for summary in summaries:
+        for name, record in summary.items():
+            row = rows.setdefault(name, {"trials": 0, "calls": 0, "seconds": 0.0,
+                                         "blocks": 0, "peak_bytes": 0})
+            row["trials"] += 1
+            row["calls"] += record["calls"]
+            row["seconds"] += record["seconds"]
+            row["blocks"] += record["blocks"]
+            row["peak_bytes"] = max(row["peak_bytes"], record["peak_bytes"])
+
+    table = pd.DataFrame.from_dict(rows, orient="index",
+                                   columns=["trials", "calls", "seconds", "blocks", "peak_bytes"])
+    table["ms_per_trial"] = table["seconds"] / table["trials"] * 1000
+    if "trial" in table.index:
+        table["share_%"] = table["seconds"] / table.loc["trial", "seconds"] * 100
+    return table.sort_values("seconds", ascending=False)
+
+
+def profile_table(study: optuna.study.Study) -> pd.DataFrame:
+    """
+    Aggregates the stage profiles stored in the trials of a study.
+
+    Parameters
+    ----------
+    study : optuna.study.Study
+        Study optimized with `OptunaOpt(profile=True)`.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per stage: trials, calls, total seconds, net allocated blocks,
+        max peak bytes, milliseconds per trial and share of the trial time (%).
+    """
+    summaries = [t.user_attrs["profile"] for t in study.trials
+                 if "profile" in t.user_attrs]
+    return _stage_table(summaries)
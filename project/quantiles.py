@@ -0,0 +1,205 @@
+from libraries import *
+import heapq
+from collections import deque
+
+
+def _interpolate(q: float, nobs: int, low: float, high: float) -> float:
+    """
+    Linear interpolation between order statistics idx and idx + 1, with the same
+    operations as pandas' rolling/expanding `quantile`.
+    """
+    position = q * (nobs - 1)
+    idx = int(position)
+    if nobs == 1 or idx == position:
+        return low
+    return low + (high - low) * (position - idx)
+
+
+class ExpandingQuantile:
+    """
+    Causal quantile of all values seen so far, kept with two heaps.
+
+    The lower (max-)heap holds the `floor(q * (n - 1)) + 1` smallest values and the
+    upper (min-)heap the rest, so the two order statistics needed for the
+    interpolation are the heap tops. Each update is O(log n). NaN values are
+    skipped, as in `pd.Series.expanding().quantile`.
+    """
+
+    def __init__(self, q: float):
+        """
+        Parameters
+        ----------
+        q : float
+            Quantile in [0, 1].
+        """
+        self.q = q
+        self.lower = []   # negated values (max-heap)
+        self.upper = []
+        self.nobs = 0
+
+    def update(self, value: float) -> float:
+        """
+        Adds a value and returns the quantile of all non-NaN values so far (NaN before the first one).
+        """
+        if value == value:
+            if self.lower and value <= -self.lower[0]:
+                heapq.heappush(self.lower, -value)
+            else:
+                heapq.heappush(self.upper, value)
+            self.nobs += 1
+
+            size = int(self.q * (self.nobs - 1)) + 1
+            while len(self.lower) > size:
+                heapq.heappush(self.upper, -heapq.heappop(self.lower))
+            while len(self.lower) < size:
+                heapq.heappush(self.lower, -heapq.heappop(self.upper))
+
+        if self.nobs == 0:
+            return np.nan
+        return _interpolate(self.q, self.nobs, -self.lower[0],
+                           self.upper[0] if self.upper else -self.lower[0])
+
+
+class _LazyHeap:
+    """
+    Min-heap of floats with lazy deletion: removed values are counted and dropped
+    when they reach the top, and the heap is rebuilt once removed values make up
+    half of it, so its length stays within twice the live count.
+    """
+
+    def __init__(self, sign: float):
+        self.sign = sign          # -1 stores negated values (max-heap)
+        self.heap = []
+        self.removed = {}
+        self.size = 0             # live values
+
+    def top(self) -> float:
+        return self.sign * self.heap[0]
+
+    def push(self, value: float) -> None:
+        heapq.heappush(self.heap, self.sign * value)
+        self.size += 1
+
+    def pop(self) -> float:
+        value = self.sign * heapq.heappop(self.heap)
+        self.size -= 1
+        self._prune()
+        return value
+
+    def remove(self, value: float) -> None:
+        key = self.sign * value
+        self.removed[key] = self.removed.get(key, 0) + 1
+        self.size -= 1
+        if len(self.heap) > 2 * self.size + 16:
+            self._compact()
+        else:
+            self._prune()
+
+    def _prune(self) -> None:
+        heap, removed = self.heap, self.removed
+        while heap and removed.get(heap[0], 0):
+            removed[heap[0]] -= 1
+            heapq.heappop(heap)
+
+    def _compact(self) -> None:
+        kept = []
+        for key in self.heap:
+            if self.removed.get(key, 0):
+                self.removed[key] -= 1
+            else:
+                kept.append(key)
+        heapq.heapify(kept)
+        self.heap, self.removed = kept, {}
+
+
+class RollingQuantile:
+    """
+    Causal quantile of the last `window` values, kept with two lazy-deletion heaps.
+
+    As in `ExpandingQuantile`, the lower (max-)heap holds the `floor(q * (n - 1)) + 1`
+    smallest values of the window and the upper (min-)heap the rest. A value leaving
+    the window is marked as removed in its heap and discarded once it reaches the
+    top (each heap is rebuilt when removed values make up half of it), so an
+    update is O(log window) amortized and independent of the series length.
+    NaN values occupy their slot but are not counted, as in
+    `pd.Series.rolling(window).quantile`.
+    """
+
+    def __init__(self, q: float, window: int, min_periods: int = None):
+        """
+        Parameters
+        ----------
+        q : float
+            Quantile in [0, 1].
+        window : int
+            Number of most recent values.
+        min_periods : int, optional
+            Non-NaN values required for a result (default: `window`).
+        """
+        self.q = q
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.values = deque()
+        self.lower = _LazyHeap(-1.0)
+        self.upper = _LazyHeap(1.0)
+
+    def update(self, value: float) -> float:
+        """
+        Adds a value and returns the quantile of the current window (NaN until `min_periods` values).
+        """
+        lower, upper = self.lower, self.upper
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                # Every value below the lower top is in the lower heap
+                (lower if lower.size and old <= lower.top() else upper).remove(old)
+        self.values.append(value)
+        if value == value:
+            (lower if lower.size and value <= lower.top() else upper).push(value)
+
+        nobs = lower.size + upper.size
+        size = int(self.q * (nobs - 1)) + 1 if nobs else 0
+        while lower.size > size:
+            upper.push(lower.pop())
+        while lower.size < size:
+            lower.push(upper.pop())
+
+        if nobs < self.min_periods or nobs == 0:
+            return np.nan
+        return _interpolate(self.q, nobs, lower.top(),
+                           upper.top() if upper.size else lower.top())
+
+
+def causal_quantile(values: np.ndarray, q: float, mode: str = "expanding",
+                    window: int = None) -> np.ndarray:
+    """
+    Quantile of a series at every bar using only past and current values.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Input series (e.g. rolling volatility, NaN during its warm-up).
+    q : float
+        Quantile in [0, 1].
+    mode : str
+        'expanding' (all values so far) or 'rolling' (last `window` values).
+    window : int, optional
+        Window length for the 'rolling' mode.
+
+    Returns
+    -------
+    np.ndarray
+        Quantile per bar, equal to pandas' `expanding().quantile(q)` or
+        `rolling(window).quantile(q)`.
+    """
+    if mode == "expanding":
+        accumulator = ExpandingQuantile(q)
+    elif mode == "rolling":
+        if window is None:
+            raise ValueError("The 'rolling' quantile mode needs a window")
+        accumulator = RollingQuantile(q, window)
+    else:
+        raise ValueError(f"Unknown quantile mode: {mode!r}")
+
+    update = accumulator.update
+    return np.array([update(v) for v in np.asarray(values, dtype=float).tolist()])
@@ -0,0 +1,250 @@
+from __future__ import annotations
+from libraries import *
+from concurrent.futures import ProcessPoolExecutor
+from parallel import worker_count
+
+
+def minmax_decimate(values: np.ndarray, max_points: int = 2000) -> np.ndarray:
+    """
+    Indices of a min/max decimation of a curve.
+
+    The curve is split into `max_points // 2` equal buckets and the minimum and
+    maximum of every bucket are kept (in time order), plus the first and last
+    points, so peaks and drawdowns survive the downsampling.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Curve values (NaN allowed).
+    max_points : int
+        Approximate number of points kept.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted indices of the kept points (all indices if the curve is shorter).
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    n_buckets = max(1, max_points // 2)
+    if n <= max_points:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)                    # ceil
+    n_full = n // size
+    body = values[:n_full * size].reshape(n_full, size)
+    offsets = np.arange(n_full) * size
+    nan = np.isnan(body)
+    lows = offsets + np.argmin(np.where(nan, np.inf, body), axis=1)
+    highs = offsets + np.argmax(np.where(nan, -np.inf, body), axis=1)
+    keep = [[0], lows, highs, [n - 1]]
+    tail = values[n_full * size:]
+    if len(tail) and not np.isnan(tail).all():
+        keep.append(n_full * size + np.array([np.nanargmin(tail), np.nanargmax(tail)]))
+    return np.unique(np.concatenate(keep).astype(np.int64))
+
+
+def lttb(values: np.ndarray, n_out: int = 2000) -> np.ndarray:
+    """
+    Indices of a Largest-Triangle-Three-Buckets downsampling of a curve.
+
+    Keeps the first and last points and, from each of `n_out - 2` buckets, the point
+    forming the largest triangle with the previously kept point and the mean of the
+    next bucket. Each bucket is evaluated with NumPy, so the cost is O(n) with
+    `n_out` Python iterations.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Curve values (without NaN).
+    n_out : int
+        Number of points kept.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted indices of the kept points (all indices if the curve is shorter).
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = (edges[i + 1] + edges[i + 2] - 1) / 2
+            next_y = values[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = n - 1, values[-1]
+        x = np.arange(start, stop)
+        areas = np.abs((a - next_x) * (values[start:stop] - values[a])
+                       - (a - x) * (next_y - values[a]))
+        a = keep[i + 1] = start + int(np.argmax(areas))
+    return keep
+
+
+def downsample(values, max_points: int = 2000, method: str = "minmax") -> tuple[np.ndarray, np.ndarray]:
+    """
+    Downsamples a curve for plotting.
+
+    Parameters
+    ----------
+    values : list, np.ndarray or pd.Series
+        Curve values.
+    max_points : int
+        Approximate number of points kept.
+    method : str
+        'minmax' (`minmax_decimate`) or 'lttb' (`lttb`).
+
+    Returns
+    -------
+    tuple
+        (x positions in the original curve, values at those positions).
+    """
+    values = np.asarray(values, dtype=float)
+    if method == "minmax":
+        idx = minmax_decimate(values, max_points)
+    elif method == "lttb":
+        idx = lttb(values, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method!r}")
+    return idx, values[idx]
+
+
+def _equity_figure(x: np.ndarray, y: np.ndarray, name: str, final_cash: float) -> plt.Figure:
+    """
+    Same chart as `visualization.plot_portfolio`, on a pyplot-free figure.
+    """
+    fig = plt.Figure(figsize=(12, 5))
+    ax = fig.subplots()
+    ax.plot(x, y, color=colors[1], lw=2, label=f'{name}\nFinal: ${final_cash:,.2f}')
+    ax.set_title(name, fontsize=14)
+    ax.set_xlabel('Time step', fontsize=12)
+    ax.set_ylabel('Value ($)', fontsize=12)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+def _test_validation_figure(x_test: np.ndarray, y_test: np.ndarray,
+                            x_val: np.ndarray, y_val: np.ndarray) -> plt.Figure:
+    """
+    Same chart as `visualization.plot_test_validation`, on a pyplot-free figure.
+    """
+    fig = plt.Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(x_test, y_test, color=colors[0], linewidth=2, label="Test")
+    ax.plot(x_val, y_val, color=colors[1], linewidth=2, label="Validation")
+    ax.set_title("Test + Validation")
+    ax.set_xlabel("Timestep")
+    ax.set_ylabel("Portfolio Value")
+    ax.legend()
+    ax.grid(True)
+    return fig
+
+
+def _returns_figure(labels: list, returns: np.ndarray, title: str,
+                    max_labels: int = 60) -> plt.Figure:
+    """
+    Same chart as `visualization.plot_returns`, on a pyplot-free figure
+    (at most `max_labels` date labels, so long histories stay fast to draw).
+    """
+    fig = plt.Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    x = np.arange(len(returns))
+    ax.bar(x, returns * 100, color=np.where(returns >= 0, colors[0], colors[1]))
+    step = max(1, -(-len(x) // max_labels))
+    ax.set_xticks(x[::step], labels[::step])
+    ax.set_title(f"{title} Returns")
+    ax.set_ylabel("Return (%)")
+    ax.tick_params(axis="x", rotation=90, labelsize=8)
+    ax.tick_params(axis="y", labelsize=8)
+    ax.grid(alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+_figures = {"equity": _equity_figure, "test_validation": _test_validation_figure,
+            "returns": _returns_figure}
+
+
+def _render(kind: str, args: tuple, path: str, formats: tuple, dpi: int) -> list[str]:
+    """
+    Builds one figure and writes it in every format (runs in the worker processes).
+    """
+    fig = _figures[kind](*args)
+    paths = []
+    for fmt in formats:
+        file_path = f"{path}.{fmt}"
+        fig.savefig(file_path, format=fmt, dpi=dpi)
+        paths.append(file_path)
+    return paths
+
+
+def render_report(out_dir: str, curves: dict = None, test_validation: tuple = None,
+                  period_tables: dict = None, formats: tuple = ("png",), n_workers: int = 1,
+                  max_points: int = 2000, method: str = "minmax", dpi: int = 100) -> list[str]:
+    """
+    Renders the report charts to image files without a display.
+
+    Figures are built on `matplotlib.figure.Figure` with the Agg canvas (no pyplot
+    state, no `plt.show()`), curves are downsampled to about `max_points` points
+    before plotting, and independent figures render in a process pool.
+
+    Parameters
+    ----------
+    out_dir : str
+        Output directory (created if needed).
+    curves : dict, optional
+        Name -> `(port_value, final_cash)` (e.g. 'TRAIN', 'TEST', 'VALIDATION'),
+        one equity chart each (the `plot_portfolio` chart).
+    test_validation : tuple, optional
+        `(port_value_test, port_value_val)` for the combined chart ('TEST+VAL').
+    period_tables : dict, optional
+        Horizon -> DataFrame from `visualization.period_returns`; one bar chart of
+        the first column per horizon.
+    formats : tuple of str
+        File formats, e.g. ('png', 'svg').
+    n_workers : int
+        Worker processes (-1 = all cores, 1 = render in this process).
+    max_points : int
+        Points kept per plotted curve.
+    method : str
+        Downsampling method, 'minmax' or 'lttb'.
+    dpi : int
+        Resolution of raster formats.
+
+    Returns
+    -------
+    list of str
+        Paths of the written files.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = []
+    for name, (port_value, final_cash) in (curves or {}).items():
+        tasks.append(("equity", (*downsample(port_value, max_points, method), name, final_cash),
+                      name))
+    if test_validation is not None:
+        test, val = (np.asarray(v, dtype=float) for v in test_validation)
+        x_test, y_test = downsample(test, max_points, method)
+        x_val, y_val = downsample(val, max_points, method)
+        tasks.append(("test_validation", (x_test, y_test, x_val + len(test), y_val), "TEST+VAL"))
+    for horizon, table in (period_tables or {}).items():
+        series = table.iloc[:, 0].dropna()
+        tasks.append(("returns", (list(series.index.strftime('%Y-%m-%d')), series.to_numpy(),
+                                  horizon), horizon))
+
+    jobs = [(kind, args, os.path.join(out_dir, name), tuple(formats), dpi)
+            for kind, args, name in tasks]
+    n_workers = min(worker_count(n_workers), len(jobs))
+    if n_workers <= 1:
+        results = [_render(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_render, *zip(*jobs)))
+    return [path for paths in results for path in paths]
@@ -0,0 +1,350 @@
+from libraries import *
+import time
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from backtesting import backtest, backtest_batch, backtest_paths
+from hyperparams import hyperparams, search_space
+from ledger import TradeLedger
+from metrics import Metrics
+from parallel import SharedFrame, worker_count
+from functions import BacktestingCapCOM
+
+# Metrics summarized by `confidence_intervals`
+robustness_metrics = ["Calmar", "Sharpe", "Sortino", "Maximum Drawdown", "Total Return (%)"]
+
+# Scenario generators run by `robustness_analysis`
+robustness_methods = ("bootstrap", "shuffle", "perturb")
+
+
+@dataclass
+class RobustnessResult:
+    """
+    Result of a Monte Carlo robustness analysis.
+
+    Attributes:
+    scenarios : pd.DataFrame
+        One row per simulated path: 'method' and the metrics of the path.
+    intervals : pd.DataFrame
+        Confidence intervals per (method, metric) (see `confidence_intervals`).
+    baseline : dict
+        Metrics of the strategy on the original data (`backtest`).
+    seconds : float
+        Wall time of the simulations.
+    """
+    scenarios: pd.DataFrame
+    intervals: pd.DataFrame
+    baseline: dict
+    seconds: float
+
+    @property
+    def paths_per_sec(self) -> float:
+        """
+        Throughput in simulated paths per second.
+        """
+        return len(self.scenarios) / self.seconds if self.seconds > 0 else float("inf")
+
+
+def block_bootstrap(close: np.ndarray, n_paths: int, block_size: int = 24,
+                    rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Price paths rebuilt from circular block-bootstrapped log returns.
+
+    Blocks of `block_size` consecutive log returns are drawn with replacement
+    (wrapping around the end of the series) and chained from the first close, so
+    each path keeps the volatility clustering within a block.
+
+    Parameters
+    ----------
+    close : np.ndarray
+        Close prices (without NaN).
+    n_paths : int
+        Number of paths.
+    block_size : int
+        Bars per block (24 = one day of hourly bars).
+    rng : np.random.Generator, optional
+        Random generator (default: a new unseeded one).
+
+    Returns
+    -------
+    np.ndarray
+        (paths x bars) simulated close prices, each starting at `close[0]`.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    log_close = np.log(np.asarray(close, dtype=float))
+    returns = np.diff(log_close)
+    n_returns = len(returns)
+    block_size = max(1, min(block_size, n_returns))
+
+    n_blocks = -(-n_returns // block_size)                 # ceil
+    starts = rng.integers(0, n_returns, size=(n_paths, n_blocks, 1))
+    idx = ((starts + np.arange(block_size)) % n_returns).reshape(n_paths, -1)[:, :n_returns]
+
+    paths = np.empty((n_paths, n_returns + 1))
+    paths[:, 0] = log_close[0]
+    np.cumsum(returns[idx], axis=1, out=paths[:, 1:])
+    paths[:, 1:] += log_close[0]
+    return np.exp(paths, out=paths)
+
+
+def shuffle_trades(pnl: np.ndarray, cash: float, n_paths: int,
+                   rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Equity curves of the closed trades taken in random orders.
+
+    The strategy is flat between trades and sizes each trade from its current
+    cash, so every trade is replayed as its growth factor `1 + pnl / cash before
+    the trade`; a shuffle permutes those factors. The final capital is the same
+    on every path, while the drawdowns change with the order.
+
+    Parameters
+    ----------
+    pnl : np.ndarray
+        Net pnl of the closed trades in their original order (`TradeLedger` 'pnl').
+    cash : float
+        Starting cash.
+    n_paths : int
+        Number of paths.
+    rng : np.random.Generator, optional
+        Random generator (default: a new unseeded one).
+
+    Returns
+    -------
+    np.ndarray
+        (paths x trades + 1) equity after each trade, starting at `cash`.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    pnl = np.asarray(pnl, dtype=float)
+    cash_before = cash + np.concatenate([[0.0], np.cumsum(pnl)[:-1]])
+    growth = rng.permuted(np.tile(1 + pnl / cash_before, (n_paths, 1)), axis=1)
+
+    curves = np.empty((n_paths, len(pnl) + 1))
+    curves[:, 0] = cash
+    np.cumprod(growth, axis=1, out=curves[:, 1:])
+    curves[:, 1:] *= cash
+    return curves
+
+
+def perturb_params(params: dict, n_paths: int, scale: float = 0.1,
+                   rng: np.random.Generator = None) -> list[dict]:
+    """
+    Parameter sets scattered around `params` within the search space.
+
+    Each hyperparameter of `hyperparams.search_space` gets Gaussian noise with a
+    standard deviation of `scale` times its range, is clipped to the range and
+    rounded for integer parameters. Other keys are copied unchanged.
+
+    Parameters
+    ----------
+    params : dict
+        Center of the perturbations (e.g. the best trial's params).
+    n_paths : int
+        Number of parameter sets.
+    scale : float
+        Noise standard deviation as a fraction of each parameter's range.
+    rng : np.random.Generator, optional
+        Random generator (default: a new unseeded one).
+
+    Returns
+    -------
+    list of dict
+        Perturbed hyperparameter dicts.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    columns = {}
+    for name, (kind, low, high) in search_space.items():
+        values = np.clip(params[name] + rng.normal(0, scale * (high - low), n_paths), low, high)
+        columns[name] = np.rint(values).astype(int).tolist() if kind == "int" else values.tolist()
+    return [{**params, **{name: values[k] for name, values in columns.items()}}
+            for k in range(n_paths)]
+
+
+def confidence_intervals(scenarios: pd.DataFrame, level: float = 0.95,
+                         metrics: list = robustness_metrics) -> pd.DataFrame:
+    """
+    Percentile confidence intervals of the scenario metrics per method.
+
+    Non-finite values (e.g. an infinite Calmar on a path without drawdown) are ignored.
+
+    Parameters
+    ----------
+    scenarios : pd.DataFrame
+        'method' column plus one column per metric (`RobustnessResult.scenarios`).
+    level : float
+        Coverage of the interval (0.95 = 2.5% and 97.5% percentiles).
+    metrics : list of str
+        Metric columns to summarize.
+
+    Returns
+    -------
+    pd.DataFrame
+        Index (method, metric); columns 'mean', 'std', 'low', 'median', 'high' and 'n'.
+    """
+    tail = (1 - level) / 2
+    rows = {}
+    for method, group in scenarios.groupby("method", sort=False):
+        for metric in metrics:
+            values = group[metric].to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+            low, median, high = (np.quantile(values, [tail, 0.5, 1 - tail]) if len(values)
+                                 else (np.nan,) * 3)
+            rows[(method, metric)] = {
+                "mean": values.mean() if len(values) else np.nan,
+                "std": values.std(ddof=1) if len(values) > 1 else np.nan,
+                "low": low, "median": median, "high": high, "n": len(values)}
+    intervals = pd.DataFrame.from_dict(rows, orient="index")
+    intervals.index.names = ["method", "metric"]
+    return intervals
+
+
+def _bootstrap_paths(close: np.ndarray, params: dict, cash: float, n_paths: int,
+                     block_size: int, seed: np.random.SeedSequence,
+                     periods_per_year: float) -> pd.DataFrame:
+    """
+    Backtests one chunk of bootstrapped paths (`backtest_paths` metrics per path).
+    """
+    paths = block_bootstrap(close, n_paths, block_size, np.random.default_rng(seed))
+    return backtest_paths(paths, params, initial_cash=cash, periods_per_year=periods_per_year)
+
+
+def _perturbed_runs(data: pd.DataFrame, params_list: list, cash: float,
+                    periods_per_year: float) -> pd.DataFrame:
+    """
+    Backtests one chunk of perturbed parameter sets on the original data.
+    """
+    rows = [{**{name: metrics_dict[name] for name in
+                ("Calmar", "Sharpe", "Sortino", "Maximum Drawdown", "Win Rate",
+                 "Total Return (%)")}, "Final Capital": final_cash}
+            for _, metrics_dict, final_cash in backtest_batch(data, params_list, cash,
+                                                              periods_per_year)]
+    return pd.DataFrame(rows)
+
+
+def _robustness_worker(spec: dict, task: str, args: tuple) -> pd.DataFrame:
+    """
+    Worker process: attaches the shared frame and runs one bootstrap or perturbation chunk.
+    """
+    data, shm = SharedFrame.attach(spec)
+    try:
+        if task == "bootstrap":
+            return _bootstrap_paths(data["Close"].to_numpy(), *args)
+        return _perturbed_runs(data, *args)
+    finally:
+        del data
+        shm.close()
+
+
+def robustness_analysis(data: pd.DataFrame, trial_or_params, n_paths: int = 1000,
+                        methods: tuple = robustness_methods, block_size: int = 24,
+                        perturb_scale: float = 0.1, level: float = 0.95,
+                        initial_cash: float = None, n_workers: int = 1,
+                        chunk_size: int = 250, seed: int = 42,
+                        periods_per_year: float = None) -> RobustnessResult:
+    """
+    Monte Carlo robustness analysis of one parameter set.
+
+    Simulates `n_paths` scenarios per method and summarizes their metrics with
+    confidence intervals:
+
+    - 'bootstrap': the strategy on block-bootstrapped price paths (`block_bootstrap`),
+      backtested chunk by chunk in lockstep with `backtest_paths`.
+    - 'shuffle': the closed trades of the original backtest in random orders
+      (`shuffle_trades`); ratios are annualized with the number of trades per year.
+      Only the drawdown-based metrics vary, since the set of trade returns is fixed.
+    - 'perturb': the strategy with perturbed hyperparameters (`perturb_params`) on
+      the original data, backtested chunk by chunk with `backtest_batch`.
+
+    Bootstrap and perturbation chunks run on a process pool reading the data from
+    shared memory. Every chunk has its own seed, so results do not depend on
+    `n_workers`.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Price data containing a 'Close' column (e.g. the test split). Rows with a
+        missing close are dropped before any backtest.
+    trial_or_params : optuna.trial.Trial or dict
+        Strategy to analyze (e.g. `study.best_trial`).
+    n_paths : int
+        Scenarios per method.
+    methods : tuple of str
+        Subset of 'bootstrap', 'shuffle', 'perturb'.
+    block_size : int
+        Bars per bootstrap block.
+    perturb_scale : float
+        Perturbation standard deviation as a fraction of each parameter's range.
+    level : float
+        Coverage of the confidence intervals.
+    initial_cash : float, optional
+        Starting cash (default: `BacktestingCapCOM.initial_capital`).
+    n_workers : int
+        Worker processes (-1 uses all cores, 1 runs in-process).
+    chunk_size : int
+        Paths per chunk (bounds the memory of the lockstep matrices).
+    seed : int
+        Seed of all scenario generators.
+    periods_per_year : float, optional
+        Bars per year used to annualize the metrics (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    RobustnessResult
+        Scenario metrics, confidence intervals, baseline metrics and wall time.
+    """
+    unknown = set(methods) - set(robustness_methods)
+    if unknown:
+        raise ValueError(f"Unknown robustness methods: {sorted(unknown)}")
+    params = trial_or_params if isinstance(
+        trial_or_params, dict) else hyperparams(trial_or_params)
+    cash = BacktestingCapCOM.initial_capital if initial_cash is None else initial_cash
+    periods_per_year = BacktestingCapCOM.periods_per_year \
+        if periods_per_year is None else periods_per_year
+    bootstrap_seed, shuffle_seed, perturb_seed = np.random.SeedSequence(seed).spawn(3)
+
+    start = time.perf_counter()
+    # The baseline and every chunk, in-process or pooled, run on the same bars
+    clean = data.dropna(subset=["Close"]).reset_index(drop=True)
+    ledger = TradeLedger()
+    _, baseline, _ = backtest(clean, params, initial_cash=cash, ledger=ledger,
+                              periods_per_year=periods_per_year)
+
+    # --- Chunks: (method, worker task, arguments after the shared data) ---
+    sizes = [min(chunk_size, n_paths - k) for k in range(0, n_paths, chunk_size)]
+    chunks = []
+    if "bootstrap" in methods:
+        chunk_seeds = bootstrap_seed.spawn(len(sizes))
+        chunks += [("bootstrap", (params, cash, size, block_size, chunk_seed, periods_per_year))
+                   for size, chunk_seed in zip(sizes, chunk_seeds)]
+    if "perturb" in methods:
+        params_list = perturb_params(params, n_paths, perturb_scale,
+                                     np.random.default_rng(perturb_seed))
+        offsets = np.cumsum([0] + sizes)
+        chunks += [("perturb", (params_list[a:b], cash, periods_per_year))
+                   for a, b in zip(offsets[:-1], offsets[1:])]
+
+    n_workers = min(worker_count(n_workers), max(len(chunks), 1))
+    if n_workers == 1:
+        close = clean["Close"].to_numpy(dtype=float)
+        parts = [_bootstrap_paths(close, *args) if task == "bootstrap"
+                 else _perturbed_runs(clean, *args) for task, args in chunks]
+    else:
+        with SharedFrame(clean) as shared, \
+                ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_robustness_worker, shared.spec, task, args)
+                       for task, args in chunks]
+            parts = [f.result() for f in futures]
+    frames = [part.assign(method=task) for (task, _), part in zip(chunks, parts)]
+
+    if "shuffle" in methods:
+        pnl = ledger.to_frame()["pnl"].to_numpy(dtype=float)
+        curves = shuffle_trades(pnl, cash, n_paths, np.random.default_rng(shuffle_seed))
+        trades_per_year = len(pnl) * periods_per_year / max(len(clean), 1)
+        ratios = Metrics.batch(curves, periods_per_year=trades_per_year)
+        frames.append(pd.DataFrame({**ratios, "Win Rate": baseline["Win Rate"],
+                                    "Total Return (%)": (curves[:, -1] - cash) / cash * 100,
+                                    "Final Capital": curves[:, -1], "method": "shuffle"}))
+    seconds = time.perf_counter() - start
+
+    scenarios = pd.concat(frames, ignore_index=True)
+    scenarios = scenarios[["method"] + [c for c in scenarios.columns if c != "method"]]
+    return RobustnessResult(scenarios, confidence_intervals(scenarios, level),
+                            baseline, seconds)
@@ -0,0 +1,53 @@
+import os
+import sys
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# The modules import `libraries` and `optimizer`, stored as Libraries.py and
+# Optimizer.py; on case-sensitive file systems they are loaded by path.
+for name, file_name in (("libraries", "Libraries.py"), ("optimizer", "Optimizer.py")):
+    if importlib.util.find_spec(name) is None:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(project_dir, file_name))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+
+
+def gbm_prices(n_bars: int, seed: int, s0: float = 30_000.0, sigma: float = 0.01) -> pd.DataFrame:
+    """
+    Seeded geometric Brownian motion close prices.
+    """
+    rng = np.random.default_rng(seed)
+    close = s0 * np.exp(np.cumsum(rng.normal(0.0, sigma, n_bars)))
+    return pd.DataFrame({"Close": close})
+
+
+# Parameter sets that trade often on `gbm_prices` series
+strategy_params = [
+    {"rsi_window": 14, "rsi_lower": 45, "rsi_upper": 55, "momentum_window": 10,
+     "momentum_threshold": 0.02, "volatility_window": 30, "volatility_quantile": 0.7,
+     "stop_loss": 0.02, "take_profit": 0.05, "capital_pct_exp": 0.2},
+    {"rsi_window": 25, "rsi_lower": 40, "rsi_upper": 60, "momentum_window": 22,
+     "momentum_threshold": 0.05, "volatility_window": 25, "volatility_quantile": 0.65,
+     "stop_loss": 0.03, "take_profit": 0.10, "capital_pct_exp": 0.05},
+    {"rsi_window": 11, "rsi_lower": 35, "rsi_upper": 65, "momentum_window": 15,
+     "momentum_threshold": 0.03, "volatility_window": 35, "volatility_quantile": 0.6,
+     "stop_loss": 0.025, "take_profit": 0.07, "capital_pct_exp": 0.1},
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_indicator_cache():
+    """
+    Every test starts and ends with an empty indicator cache.
+    """
+    from cache import indicator_cache
+    indicator_cache.clear()
+    yield
+    indicator_cache.clear()
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from backtesting import backtest, backtest_batch
+from ledger import TradeLedger
+from conftest import gbm_prices, strategy_params
+
+ratio_keys = ["Calmar", "Sharpe", "Sortino", "Maximum Drawdown", "Win Rate", "Total Return (%)"]
+text_keys = ["Profit ($)", "Final Capital ($)"]
+
+
+def assert_same_run(result, reference, exact_ratios=True):
+    port_value, metrics_dict, cash = result
+    ref_value, ref_metrics, ref_cash = reference
+    assert port_value == ref_value
+    assert cash == ref_cash
+    assert metrics_dict.keys() == ref_metrics.keys()
+    for key in ratio_keys:
+        if exact_ratios:
+            assert metrics_dict[key] == ref_metrics[key], key
+        else:
+            assert np.isclose(metrics_dict[key], ref_metrics[key], rtol=1e-9, atol=1e-12), key
+    for key in text_keys:
+        assert metrics_dict[key] == ref_metrics[key], key
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("params", strategy_params)
+def test_numpy_engine_matches_loop(seed, params):
+    data = gbm_prices(1500, seed)
+    loop = backtest(data, params, engine="loop")
+    assert len(loop[0]) > 1
+    assert_same_run(backtest(data, params, engine="numpy"), loop)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batch_matches_loop(seed):
+    data = gbm_prices(1500, seed)
+    batch = backtest_batch(data, strategy_params)
+    for params, result in zip(strategy_params, batch):
+        assert_same_run(result, backtest(data, params, engine="loop"), exact_ratios=False)
+
+
+def test_parity_with_causal_volatility_modes():
+    data = gbm_prices(1500, 3)
+    for mode in ("expanding", "rolling"):
+        params = {**strategy_params[0], "volatility_mode": mode,
+                  "volatility_quantile_window": 300}
+        loop = backtest(data, params, engine="loop")
+        assert_same_run(backtest(data, params, engine="numpy"), loop)
+        assert_same_run(backtest_batch(data, [params])[0], loop, exact_ratios=False)
+
+
+@pytest.mark.parametrize("params", strategy_params)
+def test_parameter_sets_trade(params):
+    # Parity is only meaningful if the engines open and close positions
+    ledger = TradeLedger()
+    backtest(gbm_prices(1500, 0), params, ledger=ledger)
+    assert len(ledger) > 0
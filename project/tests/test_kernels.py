@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+import kernels
+from conftest import gbm_prices
+
+windows = [2, 5, 14, 30, 60]
+
+
+def ta_rsi(close: pd.Series, window: int) -> np.ndarray:
+    return ta.momentum.RSIIndicator(close, window=window).rsi().to_numpy()
+
+
+def ta_roc(close: pd.Series, window: int) -> np.ndarray:
+    return ta.momentum.ROCIndicator(close, window=window).roc().to_numpy()
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_rsi_matches_ta(seed):
+    close = gbm_prices(2000, seed)["Close"]
+    values = kernels.rsi(close, windows)
+    assert values.shape == (len(windows), len(close))
+    for row, window in zip(values, windows):
+        np.testing.assert_allclose(row, ta_rsi(close, window), rtol=1e-12, atol=1e-10)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_roc_matches_ta(seed):
+    close = gbm_prices(2000, seed)["Close"]
+    values = kernels.roc(close, windows)
+    assert values.shape == (len(windows), len(close))
+    for row, window in zip(values, windows):
+        np.testing.assert_allclose(row, ta_roc(close, window), rtol=1e-12, atol=1e-10)
+
+
+def test_flat_prices_give_rsi_100():
+    # No down moves: `ta` maps the zero-loss RSI to 100
+    close = pd.Series(np.r_[np.full(10, 100.0), np.linspace(100, 110, 40)])
+    np.testing.assert_allclose(kernels.rsi(close, 14)[0], ta_rsi(close, 14), atol=1e-10)
+
+
+@pytest.mark.parametrize("kernel, reference", [(kernels.rsi, ta_rsi), (kernels.roc, ta_roc)])
+def test_paths_match_single_series(kernel, reference):
+    paths = np.stack([gbm_prices(800, seed)["Close"].to_numpy() for seed in range(4)])
+    values = kernel(paths, windows)
+    assert values.shape == (len(windows),) + paths.shape
+    for k, window in enumerate(windows):
+        for p, path in enumerate(paths):
+            np.testing.assert_allclose(values[k, p], reference(pd.Series(path), window),
+                                       rtol=1e-12, atol=1e-10)
+
+
+def test_windows_must_be_positive():
+    with pytest.raises(ValueError):
+        kernels.rsi(np.ones(10), [0])
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from backtesting import backtest
+from live import replay
+from conftest import gbm_prices, strategy_params
+
+
+@pytest.mark.parametrize("mode", ["full", "expanding", "rolling"])
+@pytest.mark.parametrize("params", strategy_params)
+def test_replay_matches_backtest(mode, params):
+    data = gbm_prices(1500, 7)
+    params = {**params, "volatility_mode": mode, "volatility_quantile_window": 300}
+
+    port_value, metrics_dict, cash = replay(data, params)
+    ref_value, ref_metrics, ref_cash = backtest(data, params)
+
+    assert len(ref_value) > 1
+    assert port_value == ref_value
+    assert cash == ref_cash
+    # StreamingMetrics accumulates the ratios in chunks: equal up to rounding
+    for key in ("Calmar", "Sharpe", "Sortino", "Maximum Drawdown"):
+        assert np.isclose(metrics_dict[key], ref_metrics[key], rtol=1e-9, atol=1e-12), key
+    assert metrics_dict["Win Rate"] == ref_metrics["Win Rate"]
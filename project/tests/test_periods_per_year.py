@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from backtesting import backtest, backtest_batch
+from functions import BacktestingCapCOM, OptunaOpt
+from optimizer import optimize_hyperparams
+from conftest import gbm_prices, strategy_params
+
+daily = 252
+
+
+def test_backtest_annualizes_with_the_argument():
+    data = gbm_prices(2000, 4)
+    _, hourly, _ = backtest(data, strategy_params[0])
+    _, metrics, _ = backtest(data, strategy_params[0], periods_per_year=daily)
+    (_, batch, _), = backtest_batch(data, strategy_params[:1], periods_per_year=daily)
+
+    assert BacktestingCapCOM.periods_per_year == 365 * 24
+    assert metrics["Sharpe"] == pytest.approx(hourly["Sharpe"] * np.sqrt(daily / (365 * 24)))
+    assert batch["Calmar"] == pytest.approx(metrics["Calmar"], rel=1e-9)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_study_scores_with_the_config_frequency(executor):
+    data = gbm_prices(2000, 5)
+    config = OptunaOpt(n_trials=4, n_jobs=2, executor=executor, seed=0,
+                       pruner="none", show_progress_bar=False)
+    study = optimize_hyperparams(data, BacktestingCapCOM(periods_per_year=daily),
+                                 config, "Sharpe")
+
+    for trial in study.trials:
+        _, metrics, _ = backtest(data, trial.params, periods_per_year=daily)
+        assert trial.value == pytest.approx(metrics["Sharpe"], rel=1e-9)
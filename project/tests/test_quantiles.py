@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantiles import RollingQuantile, causal_quantile
+
+
+def series(kind: str, n_bars: int = 1500, seed: int = 0) -> np.ndarray:
+    """
+    Test inputs: rolling-std-like warm-up NaNs, ties, a trend and scattered NaNs.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=n_bars)
+    if kind == "ties":
+        values = np.round(values, 1)
+    elif kind == "trend":
+        values = np.cumsum(np.abs(values))
+    elif kind == "gaps":
+        values[rng.random(n_bars) < 0.1] = np.nan
+    values[:30] = np.nan
+    return values
+
+
+kinds = ["normal", "ties", "trend", "gaps"]
+quantiles = [0.0, 0.3, 0.5, 0.7, 1.0]
+
+
+@pytest.mark.parametrize("kind", kinds)
+@pytest.mark.parametrize("q", quantiles)
+def test_expanding_matches_pandas(kind, q):
+    values = series(kind)
+    expected = pd.Series(values).expanding().quantile(q).to_numpy()
+    np.testing.assert_array_equal(causal_quantile(values, q, "expanding"), expected)
+
+
+@pytest.mark.parametrize("kind", kinds)
+@pytest.mark.parametrize("q", quantiles)
+@pytest.mark.parametrize("window", [1, 7, 100])
+def test_rolling_matches_pandas(kind, q, window):
+    values = series(kind)
+    expected = pd.Series(values).rolling(window).quantile(q).to_numpy()
+    np.testing.assert_array_equal(causal_quantile(values, q, "rolling", window), expected)
+
+
+def test_rolling_heaps_stay_bounded_by_the_window():
+    window = 50
+    accumulator = RollingQuantile(0.7, window)
+    for value in range(10_000):   # removed values never reach the top of a trend
+        accumulator.update(float(value))
+    assert len(accumulator.lower.heap) + len(accumulator.upper.heap) <= 2 * window + 32
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        causal_quantile(np.ones(3), 0.5, "full")
+    with pytest.raises(ValueError):
+        causal_quantile(np.ones(3), 0.5, "rolling")
@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+
+from robustness import robustness_analysis
+from conftest import gbm_prices, strategy_params
+
+
+def test_scenarios_do_not_depend_on_workers():
+    data = gbm_prices(3000, 3)
+    data.loc[np.random.default_rng(3).choice(len(data), 60, replace=False), "Close"] = np.nan
+
+    results = [robustness_analysis(data, strategy_params[0], n_paths=40, chunk_size=10,
+                                   methods=("bootstrap", "perturb"), n_workers=n_workers)
+               for n_workers in (1, 2)]
+
+    pd.testing.assert_frame_equal(results[0].scenarios, results[1].scenarios)
+    assert results[0].baseline == results[1].baseline
@@ -0,0 +1,29 @@
+from backtesting import backtest
+from cache import indicator_cache
+from walkforward import HistoryView
+from conftest import gbm_prices, strategy_params
+
+
+def test_history_view_lookups_count_once():
+    data = gbm_prices(3000, 6)
+    window = data.iloc[1000:2000]
+    params = strategy_params[0]
+
+    start = indicator_cache.info()
+    backtest(window.reset_index(drop=True), params)
+    lookups = indicator_cache.info(since=start)
+    n_lookups = lookups["hits"] + lookups["misses"]
+    indicator_cache.clear()
+
+    view = HistoryView(data["Close"], 1000, 2000)
+    with indicator_cache.attached(view):
+        start = indicator_cache.info()
+        first = backtest(window, params)
+        second = backtest(window, params)
+        counts = indicator_cache.info(since=start)
+
+    assert counts["misses"] == 0
+    assert counts["hits"] == 2 * n_lookups
+    assert first == second
+    assert len(view.series) == n_lookups
+    assert indicator_cache.info()["size"] == 0
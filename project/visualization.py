@@ -135,25 +135,166 @@ def print_metricas(metrics, name: str = "Portfolio") -> None:
     print("-----------------------------------\n")
 
 
-def tables(port_value_test, port_value_val, test_val_dates, name="TEST + VALIDATION") -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def print_robustness(intervals: pd.DataFrame, name: str = "Portfolio") -> None:
+    """
+    Prints the confidence intervals of a robustness analysis as median [low, high].
+
+    Parameters
+    ----------
+    intervals : pd.DataFrame
+        Intervals indexed by (method, metric) (`RobustnessResult.intervals`).
+    name : str, optional
+        Name of the portfolio for labeling. Default is "Portfolio".
+    """
+    formats = {"Maximum Drawdown": "{:.2%}", "Total Return (%)": "{:.2f}%"}
+    print(f"\n--- Robustness {name} (median [low, high]) ---")
+    for method, group in intervals.groupby(level="method", sort=False):
+        print(f"{method}:")
+        for (_, metric), row in group.iterrows():
+            fmt = formats.get(metric, "{:.4f}")
+            print(f"  {metric}: {fmt.format(row['median'])} "
+                  f"[{fmt.format(row['low'])}, {fmt.format(row['high'])}]")
+    print("-----------------------------------\n")
+
+
+# Horizon name -> pandas period frequency (labels are the period end dates, as `resample('ME'/'QE'/'YE')`)
+period_freqs = {"Monthly": "M", "Quarterly": "Q", "Annual": "Y"}
+
+
+def period_returns(curves, dates, horizons=("Monthly", "Quarterly", "Annual")) -> dict:
+    """
+    Computes compounded returns per calendar period for one or many portfolio curves.
+
+    All horizons come from one cumulative sum of log returns: the return of a period
+    is `exp(L[last bar of the period] - L[last bar of the previous period]) - 1`, with the
+    group boundaries found from the period codes of the (sorted) dates. Missing values
+    (e.g. NaN padding of shorter curves) contribute no return, and periods without
+    bars get 0, as with `resample(...).apply(lambda x: (1 + x).prod() - 1)`.
+
+    Parameters
+    ----------
+    curves : list, np.ndarray, pd.Series or pd.DataFrame
+        Portfolio values. A 1-D array/list or Series is one curve; a 2-D array is
+        (strategies x bars); a DataFrame has one column per strategy.
+    dates : array-like
+        Bar dates; the last `n_bars` are used if it is longer than the curves.
+    horizons : tuple of str, optional
+        Keys of `period_freqs` to compute.
+
+    Returns
+    -------
+    dict
+        Horizon -> DataFrame of compounded returns indexed by period end date,
+        one column per strategy ('<Horizon>_Returns' for a single unnamed curve).
+    """
+    if isinstance(curves, pd.DataFrame):
+        names, values = list(curves.columns), curves.to_numpy(dtype=float).T
+    else:
+        values = np.asarray(curves, dtype=float)
+        if values.ndim == 1:
+            names = [curves.name] if isinstance(curves, pd.Series) and curves.name is not None else None
+            values = values[None, :]
+        else:
+            names = list(range(len(values)))
+    n_bars = values.shape[1]
+
+    # --- Align dates (use last N matching portfolio length) ---
+    dates = pd.DatetimeIndex(pd.to_datetime(np.asarray(dates)[-n_bars:]))
+
+    # --- Cumulative log return of every curve ---
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = np.diff(np.log(values), axis=1)
+    log_returns[~np.isfinite(log_returns)] = 0.0
+    cumulative = np.zeros_like(values)
+    np.cumsum(log_returns, axis=1, out=cumulative[:, 1:])
+
+    results = {}
+    for horizon in horizons:
+        periods = dates.to_period(period_freqs[horizon])
+        codes = periods.asi8
+        # Last bar of every period present in the data
+        ends = np.append(np.flatnonzero(codes[1:] != codes[:-1]), n_bars - 1)
+        at_ends = cumulative[:, ends]
+        returns = np.expm1(np.diff(at_ends, axis=1, prepend=0.0))
+
+        full = pd.period_range(periods[0], periods[-1], freq=period_freqs[horizon])
+        table = pd.DataFrame(0.0, index=full, columns=range(len(values)))
+        table.loc[periods[ends]] = returns.T
+        table.index = full.to_timestamp(how="end").normalize()
+        table.columns = [f"{horizon}_Returns"] if names is None else names
+        results[horizon] = table
+    return results
+
+
+def plot_returns(series: pd.Series, title: str):
+    """
+    Bar chart of period returns (colors[0] for positive, colors[1] for negative returns).
+
+    Parameters
+    ----------
+    series : pd.Series
+        Time-indexed return series (monthly, quarterly, or annual).
+    title : str
+        Title of the plot (e.g., "Monthly", "Quarterly", "Annual").
+
+    Returns
+    -------
+    matplotlib.figure.Figure
+        The figure (not shown, so it can be saved headless).
+    """
+    fig = plt.figure(figsize=(10, 4))
+    plt.bar(series.index.strftime('%Y-%m-%d'), series * 100,
+            color=[colors[0] if v >= 0 else colors[1] for v in series], alpha=1)
+    plt.title(f"{title} Returns")
+    plt.ylabel("Return (%)")
+    plt.xticks(rotation=90, fontsize=8)
+    plt.yticks(fontsize=8)
+    plt.grid(alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+def show_period_returns(returns: dict, name: str = "Portfolio") -> None:
+    """
+    Displays and plots the tables computed by `period_returns` (first strategy in the plots).
+
+    Parameters
+    ----------
+    returns : dict
+        Horizon -> DataFrame, as returned by `period_returns`.
+    name : str, optional
+        Name used in the display headers.
+    """
+    for horizon, table in returns.items():
+        print(f"\n--- {name} {horizon} Returns ---")
+        display(table)
+    for horizon, table in returns.items():
+        plot_returns(table.iloc[:, 0].dropna(), horizon)
+        plt.show()
+
+
+def tables(port_value_test, port_value_val, test_val_dates, name="TEST + VALIDATION",
+           show: bool = True) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Computes, displays, and visualizes compounded returns for combined TEST and VALIDATION portfolio values.
 
     This function concatenates portfolio values from the TEST and VALIDATION sets, aligns them with the 
-    provided date series, and calculates compounded returns at monthly, quarterly, and annual frequencies.
-    Each return series is displayed as a formatted DataFrame and plotted as a color-coded bar chart
-    (green for positive, red for negative returns).
+    provided date series, and calculates compounded returns at monthly, quarterly, and annual frequencies
+    with `period_returns`. With `show=True`, each return series is displayed as a formatted DataFrame and
+    plotted as a color-coded bar chart (green for positive, red for negative returns).
 
     Parameters
     ----------
-    port_value_test : list or pd.Series
+    port_value_test : list, np.ndarray or pd.Series
         Portfolio values for the TEST set.
-    port_value_val : list or pd.Series
+    port_value_val : list, np.ndarray or pd.Series
         Portfolio values for the VALIDATION set.
     test_val_dates : list or pd.Series
         Combined date range corresponding to both TEST and VALIDATION portfolios.
     name : str, optional
         Custom name for display headers and plot titles. Default is "TEST + VALIDATION".
+    show : bool, optional
+        Display the tables and plots (False for headless use). Default is True.
 
     Returns
     -------
@@ -169,71 +310,12 @@ def tables(port_value_test, port_value_val, test_val_dates, name="TEST + VALIDAT
     - Displayed tables and plots are meant for visual performance analysis.
     - Missing or mismatched date lengths are automatically adjusted from the end of the date series.
     """
-
     # --- Concatenate portfolio values ---
-    total_portfolio = port_value_test + port_value_val
-
-    # --- Align dates (use last N matching portfolio length) ---
-    dates_aligned = pd.Series(
-        test_val_dates).iloc[-len(total_portfolio):].reset_index(drop=True)
-
-    # --- Create DataFrame with datetime index ---
-    port_df = pd.DataFrame(
-        {"Portfolio_Value": total_portfolio}, index=pd.to_datetime(dates_aligned))
-
-    # --- Calculate daily returns ---
-    daily_returns = port_df['Portfolio_Value'].pct_change()
-
-    # --- Compute compounded returns ---
-    monthly_df = daily_returns.resample('ME').apply(
-        lambda x: (1 + x).prod() - 1).to_frame("Monthly_Returns")
-    quarterly_df = daily_returns.resample('QE').apply(
-        lambda x: (1 + x).prod() - 1).to_frame("Quarterly_Returns")
-    annual_df = daily_returns.resample('YE').apply(
-        lambda x: (1 + x).prod() - 1).to_frame("Annual_Returns")
-
-    # --- Display tables ---
-    print(f"\n--- {name} Monthly Returns ---")
-    display(monthly_df.tail(len(monthly_df)))
-    print(f"\n--- {name} Quarterly Returns ---")
-    display(quarterly_df.tail(len(quarterly_df)))
-    print(f"\n--- {name} Annual Returns ---")
-    display(annual_df.tail(len(annual_df)))
-
-    # --- Internal plot function ---
-    def plot_returns(series: pd.Series, title: str):
-        """
-        Plots a bar chart of returns with positive values in green and negative values in red.
-
-        Each bar represents a periods compounded return, labeled with its corresponding percentage value.
-
-        Parameters
-        ----------
-        series : pd.Series
-            Time-indexed return series to be plotted (monthly, quarterly, or annual).
-        title : str
-            Title of the plot (e.g., "Monthly", "Quarterly", "Annual").
-
-        Notes
-        -----
-        - Bars are color-coded: from libraries.py colors[0] for positive returns and colors[1] for negative returns.
-        - The function automatically formats x-axis labels and scales for readability.
-        - Designed for visual inspection of performance across time periods.
-        """
-        plt.figure(figsize=(10, 4))
-        bars = plt.bar(series.index.strftime('%Y-%m-%d'), series * 100,
-                       color=[colors[0] if v >= 0 else colors[1] for v in series], alpha=1)
-        plt.title(f"{title} Returns")
-        plt.ylabel("Return (%)")
-        plt.xticks(rotation=90, fontsize=8)
-        plt.yticks(fontsize=8)
-        plt.grid(alpha=0.3)
-        plt.tight_layout()
-        plt.show()
+    total_portfolio = np.concatenate([np.asarray(port_value_test, dtype=float),
+                                      np.asarray(port_value_val, dtype=float)])
 
-    # --- Plot ---
-    plot_returns(monthly_df['Monthly_Returns'], "Monthly")
-    plot_returns(quarterly_df['Quarterly_Returns'].dropna(), "Quarterly")
-    plot_returns(annual_df['Annual_Returns'].dropna(), "Annual")
+    returns = period_returns(total_portfolio, test_val_dates)
+    if show:
+        show_period_returns(returns, name)
 
-    return monthly_df, quarterly_df, annual_df
+    return returns["Monthly"], returns["Quarterly"], returns["Annual"]
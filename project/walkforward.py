@@ -0,0 +1,245 @@
+from libraries import *
+from dataclasses import dataclass, replace
+from concurrent.futures import ProcessPoolExecutor
+from backtesting import backtest
+from cache import fingerprint, indicator_cache
+from indicators import Indicadores
+from metrics import Metrics
+from optimizer import optimize_hyperparams, top_params
+from parallel import SharedFrame, worker_count
+from functions import BacktestingCapCOM, OptunaOpt
+
+
+class HistoryView:
+    """
+    Serves the indicator series of one window [start:stop] as slices of series
+    computed once on the full history.
+
+    Attached to `indicator_cache`, it makes every backtest on that window read
+    its RSI/ROC/std from the shared full-history series, so overlapping
+    walk-forward windows reuse the same indicator state instead of recomputing
+    it (and lose no warm-up bars at the start of each window). Indicators stay
+    causal: a value at bar t only uses prices up to t.
+
+    The full-history series are computed with `Indicadores.compute` and kept in
+    `series`, which views of the same history share; they do not go through
+    `indicator_cache`, so each lookup of a window counts once there (as a hit,
+    like a precomputed grid).
+    """
+
+    def __init__(self, close: pd.Series, start: int, stop: int, series: dict = None):
+        """
+        Parameters
+        ----------
+        close : pd.Series
+            Full-history close prices.
+        start, stop : int
+            Window bounds (positional, stop excluded).
+        series : dict, optional
+            (indicator, window) -> full-history values, shared between the views
+            of one history (default: a new dict).
+        """
+        self.close = close.reset_index(drop=True)
+        self.start, self.stop = start, stop
+        self.fingerprint = fingerprint(self.close.iloc[start:stop])
+        self.series = {} if series is None else series
+
+    def get(self, indicator: str, window: int) -> np.ndarray:
+        """
+        Returns the window slice of the full-history indicator series (zero copy).
+        """
+        key = (indicator, window)
+        values = self.series.get(key)
+        if values is None:
+            values = np.array(Indicadores.compute(indicator, self.close, window), dtype=float)
+            values.flags.writeable = False
+            values = self.series.setdefault(key, values)
+        return values[self.start:self.stop]
+
+
+@dataclass
+class WalkForwardResult:
+    """
+    Result of a walk-forward optimization.
+
+    Attributes:
+    steps : pd.DataFrame
+        One row per step with window bounds, in-sample best value, out-of-sample metric and best parameters.
+    port_value : list
+        Out-of-sample portfolio values of all test windows stitched together.
+    metrics : dict
+        Metrics of the stitched out-of-sample curve.
+    cash : float
+        Final cash after the last test window.
+    """
+    steps: pd.DataFrame
+    port_value: list
+    metrics: dict
+    cash: float
+
+
+def _windows(data: pd.DataFrame, n_splits: int, train_size: int, test_size: int) -> list[tuple]:
+    """
+    Train/test windows (train_start, train_stop, test_start, test_stop) from `TimeSeriesSplit`.
+    A `train_size` gives a rolling window, None an expanding one.
+    """
+    splits = TimeSeriesSplit(n_splits=n_splits, max_train_size=train_size,
+                             test_size=test_size)
+    return [(train_idx[0], train_idx[-1] + 1, test_idx[0], test_idx[-1] + 1)
+            for train_idx, test_idx in splits.split(data)]
+
+
+def _optimize_window(spec: dict, start: int, stop: int, backtest_config: BacktestingCapCOM,
+                     optuna_config: OptunaOpt, metric: str) -> tuple[dict, float]:
+    """
+    Worker process: optimizes one train window of the shared frame.
+
+    Returns
+    -------
+    tuple
+        best_params, best_value
+    """
+    data, shm = SharedFrame.attach(spec)
+    try:
+        with indicator_cache.attached(HistoryView(data["Close"], start, stop)):
+            study = optimize_hyperparams(data.iloc[start:stop], backtest_config,
+                                         optuna_config, metric)
+        return study.best_params, study.best_value
+    finally:
+        del data
+        shm.close()
+
+
+def _step_config(optuna_config: OptunaOpt, step: int) -> OptunaOpt:
+    """
+    Configuration of one walk-forward step: a named study gets one study per step
+    ('<study_name>-step<k>') so each window resumes its own trials.
+    """
+    if optuna_config.study_name is None:
+        return optuna_config
+    return replace(optuna_config, study_name=f"{optuna_config.study_name}-step{step}")
+
+
+def _walk(data: pd.DataFrame, windows: list[tuple], backtest_config: BacktestingCapCOM,
+          optuna_config: OptunaOpt, metric: str, warm_start: bool, n_warm: int,
+          n_workers: int) -> tuple[list, list, float]:
+    """
+    Optimizes every train window and backtests its test window (see `walk_forward`).
+
+    Returns
+    -------
+    tuple
+        stitched port_value, step rows, final cash
+    """
+    # --- Optimize each train window ---
+    n_workers = worker_count(n_workers)
+    if warm_start or n_workers == 1:
+        best, previous = [], None
+        for step, (train_start, train_stop, _, _) in enumerate(windows):
+            seeds = top_params(previous, n_warm) if warm_start and previous else None
+            previous = optimize_hyperparams(data.iloc[train_start:train_stop], backtest_config,
+                                            _step_config(optuna_config, step), metric,
+                                            warm_start=seeds)
+            best.append((previous.best_params, previous.best_value))
+    else:
+        worker_config = replace(optuna_config, executor="thread", n_jobs=1,
+                                show_progress_bar=False)
+        with SharedFrame(data) as shared, \
+                ProcessPoolExecutor(max_workers=min(n_workers, len(windows))) as pool:
+            futures = [pool.submit(_optimize_window, shared.spec, train_start, train_stop,
+                                   backtest_config, _step_config(worker_config, step), metric)
+                       for step, (train_start, train_stop, _, _) in enumerate(windows)]
+            best = [f.result() for f in futures]
+
+    # --- Out-of-sample backtests, stitched ---
+    cash = BacktestingCapCOM.initial_capital
+    port_value, rows = [cash], []
+    for step, ((train_start, train_stop, test_start, test_stop), (params, value)) \
+            in enumerate(zip(windows, best)):
+        test_values, metrics_dict, cash = backtest(
+            data.iloc[test_start:test_stop], params, initial_cash=cash,
+            periods_per_year=backtest_config.periods_per_year)
+        port_value.extend(test_values[1:])
+        rows.append({"step": step,
+                     "train_start": train_start, "train_stop": train_stop,
+                     "test_start": test_start, "test_stop": test_stop,
+                     f"train_{metric}": value,
+                     f"test_{metric}": metrics_dict.get(metric, 0.0),
+                     **params})
+
+    return port_value, rows, cash
+
+
+def walk_forward(data: pd.DataFrame, optuna_config: OptunaOpt, metric: str = "Calmar",
+                 n_splits: int = 5, train_size: int = None, test_size: int = None,
+                 warm_start: bool = True, n_warm: int = 3,
+                 n_workers: int = 1, periods_per_year: float = None) -> WalkForwardResult:
+    """
+    Walk-forward optimization: re-runs the Optuna search on each train window,
+    trades the best parameters on the following test window and stitches the
+    out-of-sample equity curves (each test window starts with the previous one's cash).
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Full price history with a 'Close' column.
+    optuna_config : OptunaOpt
+        Optuna configuration used at each step.
+    metric : str
+        Metric to optimize (e.g., 'Calmar').
+    n_splits : int
+        Number of walk-forward steps.
+    train_size : int, optional
+        Bars per train window (rolling); None uses an expanding window.
+    test_size : int, optional
+        Bars per test window (default: chosen by `TimeSeriesSplit`).
+    warm_start : bool
+        Enqueue the `n_warm` best trials of the previous step in each new study.
+        Steps then depend on each other and run sequentially.
+    n_warm : int
+        Number of previous best trials used for warm-starting.
+    n_workers : int
+        Processes used to optimize the steps when `warm_start` is False (-1 uses all cores).
+    periods_per_year : float, optional
+        Bars per year used to annualize the metrics (default: `BacktestingCapCOM.periods_per_year`).
+
+    Returns
+    -------
+    WalkForwardResult
+        Per-step table, stitched out-of-sample curve, its metrics and the final cash.
+
+    Notes
+    -----
+    The window views are attached to `indicator_cache` only while the walk-forward
+    runs, so later backtests of the same slices compute their own indicators.
+    `optuna_config.precompute` is rejected: a precomputed grid of a window would
+    replace its full-history view.
+    """
+    if optuna_config.precompute:
+        raise ValueError("walk_forward serves every window's indicators from the full history "
+                         "(HistoryView); use it with precompute=False")
+    backtest_config = BacktestingCapCOM() if periods_per_year is None \
+        else BacktestingCapCOM(periods_per_year=periods_per_year)
+    data = data.reset_index(drop=True)
+    windows = _windows(data, n_splits, train_size, test_size)
+
+    # Window indicators are slices of the full-history series, attached only for this run
+    series = {}
+    views = [HistoryView(data["Close"], start, stop, series)
+             for train_start, train_stop, test_start, test_stop in windows
+             for start, stop in ((train_start, train_stop), (test_start, test_stop))]
+    with indicator_cache.attached(*views):
+        port_value, rows, cash = _walk(data, windows, backtest_config, optuna_config, metric,
+                                       warm_start, n_warm, n_workers)
+
+    metrics_obj = Metrics(pd.Series(port_value).replace(0, np.nan).dropna(),
+                          backtest_config.periods_per_year)
+    metrics = {
+        "Calmar": metrics_obj.calmar,
+        "Sharpe": metrics_obj.sharpe,
+        "Sortino": metrics_obj.sortino,
+        "Maximum Drawdown": metrics_obj.max_drawdown,
+        "Total Return (%)": (port_value[-1] - port_value[0]) / port_value[0] * 100,
+        "Final Capital ($)": f"${cash:,.2f}",
+    }
+    return WalkForwardResult(pd.DataFrame(rows).set_index("step"), port_value, metrics, cash)